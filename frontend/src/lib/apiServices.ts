@@ -1,10 +1,63 @@
-import { apiJson, apiFormData, API_CONFIG } from './api';
+import { apiJson, apiFormData, apiRequest, API_CONFIG } from './api';
+
+// Cursor-paginated lists
+export interface Page<T> {
+    results: T[];
+    next_cursor: string | null;
+}
+export interface PageParams {
+    cursor?: string | null;
+    page_size?: number;
+}
+function appendPageParams(params: URLSearchParams, page: PageParams) {
+    if (page.cursor) params.append('cursor', page.cursor);
+    if (page.page_size) params.append('page_size', page.page_size.toString());
+}
+// Follow next_cursor until the list is exhausted (for small, user-scoped lists)
+export async function fetchAllPages<T>(fetchPage: (page: PageParams) => Promise<Page<T>>): Promise<T[]> {
+    const rows: T[] = [];
+    let cursor: string | null = null;
+    do {
+        const page: Page<T> = await fetchPage({ cursor });
+        rows.push(...page.results);
+        cursor = page.next_cursor;
+    } while (cursor);
+    return rows;
+}
+
+// Search results plus the rows still selected, so a bound <select> keeps its value
+export function withSelected<T extends { id: number }>(found: T[], current: T[], selected: (row: T) => boolean): T[] {
+    const kept = current.filter((row) => selected(row) && !found.some((other) => other.id === row.id));
+    return [...kept, ...found];
+}
 
 // User Management
 export const userApi = {
     // Get all users (Staff only)
-    getUsers: () => apiJson('/users/'),
-    getUsersByRole:(role:string) => apiJson(`/users/${role}/`),
+    // Paginated: { results, next_cursor }; search is a prefix match on name, email or phone
+    getUsers: (filters: { role?: string; active?: boolean; search?: string } & PageParams = {}): Promise<Page<any>> => {
+        const params = new URLSearchParams();
+        if (filters.role) params.append('role', filters.role);
+        if (filters.active !== undefined) params.append('active', String(filters.active));
+        if (filters.search) params.append('search', filters.search);
+        appendPageParams(params, filters);
+
+        const queryString = params.toString();
+        return apiJson(`/users/${queryString ? '?' + queryString : ''}`);
+    },
+    getUsersByRole: (role: string, filters: { search?: string } & PageParams = {}): Promise<Page<any>> => {
+        const params = new URLSearchParams();
+        if (filters.search) params.append('search', filters.search);
+        appendPageParams(params, filters);
+
+        const queryString = params.toString();
+        return apiJson(`/users/${role}/${queryString ? '?' + queryString : ''}`);
+    },
+    // Every active user of a role, for dropdowns of small roles (vet, staff); search clients instead
+    getAllUsersByRole: (role: string) => fetchAllPages((page) => userApi.getUsersByRole(role, { page_size: 200, ...page })),
+    // Typeahead: first page of active users of a role whose name, email or phone starts with `search`
+    searchUsersByRole: async (role: string, search = '', limit = 20): Promise<any[]> =>
+        (await userApi.getUsersByRole(role, { search: search.trim() || undefined, page_size: limit })).results,
     
     // Get current user profile
     getProfile: () => apiJson('/auth/profile/'),
@@ -29,6 +82,23 @@ export const userApi = {
     
     // Delete user (Staff only)
     deleteUser: (userId: number) => apiJson(`/users/${userId}/`, { method: 'DELETE' }),
+
+    // Import owners and pets from a CSV/JSONL file (Staff only). The response is NDJSON: one
+    // { row, errors } line per rejected row, then the summary. Re-uploading the same file resumes it.
+    importOwners: async (file: File, options: { checkpoint?: string; restart?: boolean } = {}) => {
+        const formData = new FormData();
+        formData.append('file', file);
+        if (options.checkpoint) formData.append('checkpoint', options.checkpoint);
+        if (options.restart) formData.append('restart', 'true');
+        const response = await fetch(`${API_CONFIG.BASE_URL}/users/import/`, {
+            method: 'POST',
+            credentials: 'include',
+            body: formData
+        });
+        if (!response.ok) throw await response.json();
+        const text = await response.text();
+        return text.trim().split('\n').map((line) => JSON.parse(line));
+    },
 };
 
 // Pet Management
@@ -76,13 +146,15 @@ export const vaccineApi = {
 // Vaccination Management
 export const vaccinationApi = {
     // Get vaccinations with optional filters
-    getVaccinations: (filters: { pet_id?: number; vaccine_id?: number; owner_id?: number; search?: string; date?: string } = {}) => {
+    // Returns one page: { results, next_cursor }. Pass next_cursor back as `cursor` for the next one.
+    getVaccinations: (filters: { pet_id?: number; vaccine_id?: number; owner_id?: number; search?: string; date?: string } & PageParams = {}): Promise<Page<any>> => {
         const params = new URLSearchParams();
         if (filters.pet_id) params.append('pet_id', filters.pet_id.toString());
         if (filters.vaccine_id) params.append('vaccine_id', filters.vaccine_id.toString());
         if (filters.owner_id) params.append('owner_id', filters.owner_id.toString());
         if (filters.search) params.append('search', filters.search);
         if (filters.date) params.append('date', filters.date);
+        appendPageParams(params, filters);
         
         const queryString = params.toString();
         return apiJson(`/vaccinations/${queryString ? '?' + queryString : ''}`);
@@ -93,6 +165,18 @@ export const vaccinationApi = {
         method: 'POST',
         body: JSON.stringify(vaccinationData)
     }),
+
+    // Create many records (Staff/Vet only). The response is NDJSON: one { row, errors } line
+    // per rejected record, then { rows, created, failed }.
+    createVaccinations: async (records: { pet: number; vaccine: number | string; date: string; remarks?: string }[]) => {
+        const response = await apiRequest('/vaccinations/bulk/', {
+            method: 'POST',
+            body: JSON.stringify({ records })
+        });
+        if (!response.ok) throw await response.json();
+        const text = await response.text();
+        return text.trim().split('\n').map((line) => JSON.parse(line));
+    },
     
     // Get specific vaccination
     getVaccinationDetail: (vaccinationId: number) => apiJson(`/vaccinations/${vaccinationId}/`),
@@ -123,7 +207,26 @@ export const serviceApi = {
 };
 
 export const appointmentApi = {
-    getAppointment: () => apiJson('/appointments/'),
+    // Returns one page: { results, next_cursor }. Pass next_cursor back as `cursor` for the next one.
+    getAppointment: (filters: { status?: string; date?: string } & PageParams = {}): Promise<Page<any>> => {
+        const params = new URLSearchParams();
+        if (filters.status) params.append('status', filters.status);
+        if (filters.date) params.append('date', filters.date);
+        appendPageParams(params, filters);
+
+        const queryString = params.toString();
+        return apiJson(`/appointments/${queryString ? '?' + queryString : ''}`);
+    },
+    // Free slots per vet between two days (YYYY-MM-DD, both inclusive, at most 31 days).
+    getAvailability: (filters: { vet?: number; from?: string; to?: string } = {}) => {
+        const params = new URLSearchParams();
+        if (filters.vet) params.append('vet', String(filters.vet));
+        if (filters.from) params.append('from', filters.from);
+        if (filters.to) params.append('to', filters.to);
+
+        const queryString = params.toString();
+        return apiJson(`/appointments/availability/${queryString ? '?' + queryString : ''}`);
+    },
     getAppointmentsByPet: (petId: number) => apiJson(`/pets/${petId}/appointments/`),
     bookAppointment: (appointmentData: any) => apiJson('/appointments/book/', {
         method: 'POST',
@@ -138,6 +241,21 @@ export const appointmentApi = {
         method: 'PUT',
         body: JSON.stringify(statusData)
     }),
+    // Confirm with the least-loaded free vet (Staff only)
+    autoAssign: (appointmentId: number) => apiJson(`/appointments/updatestatus/${appointmentId}/`, {
+        method: 'PUT',
+        body: JSON.stringify({ status: 'confirmed', auto_assign: true })
+    }),
+    // Batch: { appointments: [ids] } or { date: 'YYYY-MM-DD' }; returns { assigned, failed }
+    autoAssignMany: (selection: { appointments?: number[]; date?: string }) => apiJson('/appointments/auto-assign/', {
+        method: 'POST',
+        body: JSON.stringify(selection)
+    }),
+    // Many status changes in one transaction (Staff only); returns { updated, failed, results }
+    bulkUpdateStatus: (updates: { id: number; status: string; assigned_vet?: number }[]) => apiJson('/appointments/bulk-status/', {
+        method: 'POST',
+        body: JSON.stringify({ updates })
+    }),
     updateTreatment: (appointmentId: number, treatmentData:any) => apiJson(`/appointments/treatment/${appointmentId}/`, {
         method: 'POST',
         body: JSON.stringify(treatmentData)
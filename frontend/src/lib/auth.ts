@@ -14,6 +14,7 @@ export interface User {
     active?: boolean;
     created_at?: string;
     image_url?: string;
+    image_thumb_url?: string;
 }
 
 // Auth store
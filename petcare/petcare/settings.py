@@ -55,6 +55,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'reservation.middleware.RequestTimingMiddleware',
+    'reservation.middleware.UserServiceMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -113,6 +115,31 @@ LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'Asia/Bangkok'
 
+# Calendar days (reminders, day filters) are counted in the clinic's zone.
+CLINIC_TIME_ZONE = env('CLINIC_TIME_ZONE', default='Asia/Bangkok')
+
+# Working grid every vet is booked against (clinic time; Monday is 0).
+CLINIC_OPENING_HOUR = env.int('CLINIC_OPENING_HOUR', default=9)
+CLINIC_CLOSING_HOUR = env.int('CLINIC_CLOSING_HOUR', default=17)
+CLINIC_SLOT_MINUTES = env.int('CLINIC_SLOT_MINUTES', default=30)
+CLINIC_WORKING_DAYS = env.list('CLINIC_WORKING_DAYS', cast=int, default=[0, 1, 2, 3, 4, 5])
+# Vets auto-assignment tries before giving up when concurrent confirmations
+# keep taking the picked vet's slot.
+AUTO_ASSIGN_ATTEMPTS = env.int('AUTO_ASSIGN_ATTEMPTS', default=3)
+
+# Vaccination records validated and inserted per bulk_create by the bulk
+# endpoint and import_vaccinations.
+VACCINATION_IMPORT_CHUNK_SIZE = env.int('VACCINATION_IMPORT_CHUNK_SIZE', default=2000)
+
+# Owner and pet onboarding (import_onboarding and the staff API): rows per
+# transaction, password hashing processes (0: one per CPU), image upload
+# threads, and the server directory image paths from the API resolve in
+# (unset: the API accepts no images).
+ONBOARDING_CHUNK_SIZE = env.int('ONBOARDING_CHUNK_SIZE', default=500)
+ONBOARDING_HASH_WORKERS = env.int('ONBOARDING_HASH_WORKERS', default=0)
+ONBOARDING_UPLOAD_WORKERS = env.int('ONBOARDING_UPLOAD_WORKERS', default=8)
+ONBOARDING_IMAGE_ROOT = env('ONBOARDING_IMAGE_ROOT', default=None)
+
 USE_I18N = True
 
 USE_TZ = True
@@ -131,18 +158,45 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # CORS settings for Svelte frontend
 CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOW_ORIGIN', default=[])
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ['X-Query-Count', 'Server-Timing']
 
 # Simple REST Framework setup
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'reservation.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Request instrumentation: one JSON line per request, and the SQL of any
+# request running more than this many queries (0 disables).
+REQUEST_TIMING_LOG = env.bool('REQUEST_TIMING_LOG', default=False)
+SLOW_REQUEST_QUERY_THRESHOLD = env.int('SLOW_REQUEST_QUERY_THRESHOLD', default=0)
+
+# /api/metrics. Worker processes sharing METRICS_DIR (one file each) are
+# reported together; empty keeps metrics per process.
+METRICS_DIR = env('METRICS_DIR', default='')
+METRICS_FLUSH_SECONDS = env.float('METRICS_FLUSH_SECONDS', default=5.0)
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+# Cursor-paginated lists (appointments, vaccinations)
+API_PAGE_SIZE = env.int('API_PAGE_SIZE', default=50)
+API_MAX_PAGE_SIZE = env.int('API_MAX_PAGE_SIZE', default=200)
+
 # MinIO Configuration
 MINIO_ENDPOINT = env('MINIO_ENDPOINT', default='localhost:9000')
 MINIO_ACCESS_KEY = env('MINIO_ACCESS_KEY', default='minioadmin')
 MINIO_SECRET_KEY = env('MINIO_SECRET_KEY', default='minioadmin')
 MINIO_BUCKET_NAME = env('MINIO_BUCKET_NAME', default='petcare-images')
 MINIO_SECURE = env.bool('MINIO_SECURE', default=False)
+MINIO_URL_CACHE_SIZE = env.int('MINIO_URL_CACHE_SIZE', default=1024)
+MINIO_URL_MIN_VALID_DAYS = env.int('MINIO_URL_MIN_VALID_DAYS', default=1)
+# 'minio', or 'memory' / 'filesystem' to run without a MinIO server (tests,
+# benchmarks, CI). Fake presigned URLs point at STORAGE_FAKE_URL.
+STORAGE_BACKEND = env('STORAGE_BACKEND', default='minio')
+STORAGE_ROOT = env('STORAGE_ROOT', default=str(BASE_DIR / 'storage'))
+STORAGE_FAKE_URL = env('STORAGE_FAKE_URL', default='http://storage.invalid')
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -152,7 +206,21 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL')
+EMAIL_WORKERS = env.int('EMAIL_WORKERS', default=4)
+EMAIL_QUEUE_SIZE = env.int('EMAIL_QUEUE_SIZE', default=500)
+EMAIL_QUEUE_TIMEOUT = env.float('EMAIL_QUEUE_TIMEOUT', default=5.0)
+EMAIL_SHUTDOWN_TIMEOUT = env.float('EMAIL_SHUTDOWN_TIMEOUT', default=30.0)
+OUTBOX_BATCH_SIZE = env.int('OUTBOX_BATCH_SIZE', default=50)
+OUTBOX_MAX_ATTEMPTS = env.int('OUTBOX_MAX_ATTEMPTS', default=8)
+OUTBOX_RETRY_BASE_SECONDS = env.int('OUTBOX_RETRY_BASE_SECONDS', default=30)
+OUTBOX_RETRY_MAX_SECONDS = env.int('OUTBOX_RETRY_MAX_SECONDS', default=3600)
+OUTBOX_LEASE_SECONDS = env.int('OUTBOX_LEASE_SECONDS', default=300)
+REMINDER_CHUNK_SIZE = env.int('REMINDER_CHUNK_SIZE', default=200)
+REMINDER_SEND_CONCURRENCY = env.int('REMINDER_SEND_CONCURRENCY', default=2)
 
 # Django APScheduler Configuration
 SCHEDULER_DEFAULT = True
-SCHEDULER_AUTOSTART = True
+# Web processes start a scheduler; only the one holding the lease runs jobs.
+SCHEDULER_AUTOSTART = env.bool('SCHEDULER_AUTOSTART', default=True)
+SCHEDULER_LEASE_SECONDS = env.int('SCHEDULER_LEASE_SECONDS', default=60)
+SCHEDULER_HEARTBEAT_SECONDS = env.int('SCHEDULER_HEARTBEAT_SECONDS', default=15)
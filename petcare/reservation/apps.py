@@ -7,4 +7,5 @@ class ReservationConfig(AppConfig):
 
     def ready(self):
         from . import scheduler
-        scheduler.start()
+        if scheduler.should_autostart():
+            scheduler.start()
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from .slots import SlotUnavailable, clinic_day, slot_start, sync_slot
+
+
+def least_loaded_vet(when, exclude=()):
+    # The active vet with the fewest appointments on the clinic day of
+    # `when` whose slot at `when` is free, or None. One query that reads
+    # the VetDayLoad counters and the (vet, start) slot index, so its cost
+    # does not grow with the number of appointments. Ties go to the lowest id.
+    from .models import User, VetDayLoad
+    start = slot_start(when)
+    if start is None:
+        return None
+    load = VetDayLoad.objects.filter(vet=OuterRef('pk'), day=clinic_day(start)).values('appointments')[:1]
+    return (
+        User.objects.filter(role='vet', active=True)
+        .exclude(id__in=list(exclude))
+        .exclude(slots__start=start)
+        .annotate(load=Coalesce(Subquery(load), Value(0)))
+        .order_by('load', 'id')
+        .first()
+    )
+
+
+def auto_assign(appointment, attempts=None):
+    # Confirm `appointment` with the least-loaded free vet. Two concurrent
+    # confirmations can pick the same vet for the same slot; the slot
+    # constraint lets one of them in and the other moves on to the next
+    # vet, up to AUTO_ASSIGN_ATTEMPTS vets. Raises SlotUnavailable when
+    # nobody is free.
+    attempts = attempts or getattr(settings, 'AUTO_ASSIGN_ATTEMPTS', 3)
+    if slot_start(appointment.date) is None:
+        raise SlotUnavailable('The appointment is outside clinic hours.')
+    original = (appointment.status, appointment.assigned_vet)
+    tried = []
+    for _ in range(attempts):
+        vet = least_loaded_vet(appointment.date, exclude=tried)
+        if vet is None:
+            break
+        try:
+            with transaction.atomic():
+                appointment.status = 'confirmed'
+                appointment.assigned_vet = vet
+                appointment.save(update_fields=['status', 'assigned_vet', 'updated_at'])
+                sync_slot(appointment)
+            return vet
+        except SlotUnavailable:
+            appointment.status, appointment.assigned_vet = original
+            tried.append(vet.id)
+    raise SlotUnavailable(f"No veterinarian is free on {appointment.date.strftime('%B %d, %Y at %I:%M %p')}.")
+
+
+def auto_assign_many(appointments, on_assigned=None):
+    # Assign each booked appointment in date order, one transaction each so
+    # a full slot does not undo the others. on_assigned(appointment) runs
+    # inside the transaction, e.g. to queue the confirmation email.
+    assigned, failed = [], []
+    for appointment in sorted(appointments, key=lambda a: (a.date, a.id)):
+        if appointment.status != 'booked':
+            failed.append({'id': appointment.id, 'error': f'Appointment is {appointment.status}, not booked.'})
+            continue
+        try:
+            with transaction.atomic():
+                vet = auto_assign(appointment)
+                if on_assigned:
+                    on_assigned(appointment)
+        except SlotUnavailable as e:
+            failed.append({'id': appointment.id, 'error': str(e)})
+            continue
+        assigned.append({'id': appointment.id, 'assigned_vet': vet.id, 'vet_name': vet.full_name})
+    return assigned, failed
@@ -0,0 +1,248 @@
+import csv
+import json
+from datetime import date
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+from .outbox import queue_emails
+from .serializers import check_staff_status
+from .services import EmailService, clinic_today
+from .slots import ACTIVE_STATUSES, slot_start, sync_slots
+
+
+def _is_int(value):
+    # JSON true/false are ints to Python but never ids.
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _item_error(item, appointments, vets, seen):
+    # Why one {"id", "status", "assigned_vet"} item cannot be applied, or None.
+    from .models import Appointment
+    if not isinstance(item, dict) or not _is_int(item.get('id')):
+        return 'Each update needs an integer id.'
+    if item['id'] in seen:
+        return 'Appointment appears more than once.'
+    if item['id'] not in appointments:
+        return 'Appointment not found.'
+    if item.get('status') not in Appointment.AppointmentStatus.values:
+        return f"status must be one of {', '.join(Appointment.AppointmentStatus.values)}."
+    vet_id = item.get('assigned_vet')
+    if vet_id is not None and not _is_int(vet_id):
+        return 'assigned_vet must be an integer id or null.'
+    if vet_id is not None and vet_id not in vets:
+        return 'Assigned user is not a veterinarian.'
+    try:
+        check_staff_status(item['status'], vets.get(vet_id))
+    except serializers.ValidationError as e:
+        return str(e.detail[0])
+    return None
+
+
+def bulk_update_status(updates):
+    # Staff triage: apply many status changes at once. Items are validated
+    # in one pass against appointments and vets loaded up front, checked
+    # for slot clashes in order (with each other and with booked slots),
+    # and the valid ones are written with one bulk_update in one
+    # transaction, together with their slots and notifications. Returns a
+    # result per item, in order. A clash with a concurrent booking raises
+    # SlotUnavailable and nothing is applied.
+    from .models import Appointment, User, VetSlot
+    ids = [item['id'] for item in updates if isinstance(item, dict) and _is_int(item.get('id'))]
+    vet_ids = [item.get('assigned_vet') for item in updates if isinstance(item, dict)]
+    appointments = Appointment.objects.select_related('user', 'pet', 'assigned_vet').in_bulk(ids)
+    vets = User.objects.filter(role='vet', active=True).in_bulk([i for i in vet_ids if _is_int(i)])
+
+    results, staged, seen = [], [], set()
+    for item in updates:
+        error = _item_error(item, appointments, vets, seen)
+        if isinstance(item, dict) and _is_int(item.get('id')):
+            seen.add(item['id'])
+        if error:
+            results.append({'id': item.get('id') if isinstance(item, dict) else None, 'ok': False, 'error': error})
+            continue
+        appointment = appointments[item['id']]
+        vet = vets.get(item.get('assigned_vet')) or appointment.assigned_vet
+        results.append({'id': appointment.id, 'ok': True, 'status': item['status'], 'assigned_vet': vet.id if vet else None})
+        staged.append((len(results) - 1, appointment, item['status'], vet))
+
+    # Slots: who holds what now, then claim in item order.
+    wanted = {
+        appointment.id: slot_start(appointment.date) if vet and status in ACTIVE_STATUSES else None
+        for _, appointment, status, vet in staged
+    }
+    occupied = VetSlot.objects.filter(appointment_id__in=list(wanted))
+    starts = {start for start in wanted.values() if start is not None}
+    if starts:
+        staged_vets = {vet.id for _, _, _, vet in staged if vet}
+        occupied = occupied | VetSlot.objects.filter(vet_id__in=staged_vets, start__in=starts)
+    holders = {
+        (vet_id, start): appointment_id
+        for appointment_id, vet_id, start in occupied.values_list('appointment_id', 'vet_id', 'start')
+    }
+    held = {appointment_id: pair for pair, appointment_id in holders.items()}
+
+    changed = []
+    for index, appointment, status, vet in staged:
+        start = wanted[appointment.id]
+        pair = (vet.id, start) if start is not None else None
+        if pair and holders.get(pair, appointment.id) != appointment.id:
+            results[index] = {
+                'id': appointment.id, 'ok': False,
+                'error': f"The veterinarian is already booked at {start.strftime('%B %d, %Y at %I:%M %p')}.",
+            }
+            continue
+        if appointment.id in held:
+            holders.pop(held.pop(appointment.id), None)
+        if pair:
+            holders[pair] = appointment.id
+            held[appointment.id] = pair
+        changed.append((appointment, appointment.status))
+        appointment.status = status
+        appointment.assigned_vet = vet
+        appointment.updated_at = timezone.now()
+
+    if changed:
+        # Loaded once for every cancellation in the batch.
+        staff_users = None
+        if any(appointment.status == 'cancelled' for appointment, _ in changed):
+            staff_users = list(User.objects.filter(role='staff', active=True).only('email', 'full_name'))
+        email_service = EmailService()
+        with transaction.atomic():
+            Appointment.objects.bulk_update(
+                [appointment for appointment, _ in changed], ['status', 'assigned_vet', 'updated_at'], batch_size=500,
+            )
+            sync_slots([appointment for appointment, _ in changed])
+            queue_emails([
+                (email_service.send_appointment_status_update, appointment, old_status, staff_users)
+                for appointment, old_status in changed
+            ])
+    return results
+
+
+def read_records(f, fmt):
+    # Rows of a CSV file (header first) or JSONL file, one dict at a time.
+    # A JSONL line that is not JSON is passed on as text and rejected by
+    # the import like any other bad row.
+    if fmt == 'csv':
+        yield from csv.DictReader(f)
+        return
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield line.rstrip('\n')
+
+
+def _as_id(value):
+    # Ids arrive as JSON numbers or CSV strings.
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    return None
+
+
+class VaccinationImport:
+    # Loads vaccination records ({pet, vaccine, date, remarks}, the fields
+    # of VaccinatedSerializer) chunk by chunk: memory is bounded by the
+    # chunk size, not the input. Vaccines may be given by id or name and are
+    # resolved from maps built up front; pets are checked with one query
+    # per chunk. Valid rows of a chunk go in with one bulk_create; run()
+    # yields the rejected ones as they are found.
+    AMBIGUOUS = object()
+
+    def __init__(self, chunk_size=None, today=None):
+        self.chunk_size = chunk_size or getattr(settings, 'VACCINATION_IMPORT_CHUNK_SIZE', 2000)
+        self.today = today or clinic_today()
+        self.rows = self.created = self.failed = 0
+        self.vaccine_ids = self.vaccine_names = None
+
+    def summary(self):
+        return {'rows': self.rows, 'created': self.created, 'failed': self.failed}
+
+    def run(self, records):
+        # Yields {"row": n, "errors": {field: [message]}} for each rejected
+        # record; rows count from 1 in input order.
+        chunk = []
+        for record in records:
+            self.rows += 1
+            chunk.append((self.rows, record))
+            if len(chunk) >= self.chunk_size:
+                yield from self._load(chunk)
+                chunk = []
+        if chunk:
+            yield from self._load(chunk)
+
+    def _vaccine_maps(self):
+        # Ids and names are kept apart so a vaccine named "3" cannot shadow
+        # vaccine 3.
+        from .models import Vaccine
+        ids, names = set(), {}
+        for vaccine_id, name in Vaccine.objects.values_list('id', 'name'):
+            ids.add(vaccine_id)
+            key = name.strip().lower()
+            names[key] = self.AMBIGUOUS if key in names else vaccine_id
+        return ids, names
+
+    def _vaccine_id(self, vaccine):
+        # By id first when the value is numeric, otherwise (or if no such
+        # id) by name.
+        vaccine_id = _as_id(vaccine)
+        if vaccine_id in self.vaccine_ids:
+            return vaccine_id
+        return self.vaccine_names.get(str(vaccine).strip().lower())
+
+    def _parse(self, record, pets):
+        if not isinstance(record, dict):
+            return None, {'non_field_errors': ['Each record must be an object with pet, vaccine and date.']}
+        errors = {}
+        pet_id = _as_id(record.get('pet'))
+        if pet_id is None:
+            errors['pet'] = ['A pet id is required.']
+        elif pet_id not in pets:
+            errors['pet'] = [f'Pet {pet_id} does not exist.']
+
+        vaccine = record.get('vaccine')
+        vaccine_id = self._vaccine_id(vaccine) if vaccine not in (None, '') else None
+        if vaccine in (None, ''):
+            errors['vaccine'] = ['A vaccine id or name is required.']
+        elif vaccine_id is self.AMBIGUOUS:
+            errors['vaccine'] = [f'Several vaccines are called {vaccine!r}; use the id.']
+        elif vaccine_id is None:
+            errors['vaccine'] = [f'Vaccine {vaccine!r} does not exist.']
+
+        day = record.get('date')
+        try:
+            day = day if isinstance(day, date) else date.fromisoformat(str(day).strip())
+        except ValueError:
+            errors['date'] = ['Date must be YYYY-MM-DD.']
+        else:
+            if day > self.today:
+                errors['date'] = ['Vaccination date cannot be in the future.']
+
+        if errors:
+            return None, errors
+        from .models import Vaccinated
+        remarks = record.get('remarks')
+        remarks = str(remarks).strip() if remarks not in (None, '') else None
+        return Vaccinated(pet_id=pet_id, vaccine_id=vaccine_id, date=day, remarks=remarks or None), None
+
+    def _load(self, chunk):
+        from .models import Pet, Vaccinated
+        if self.vaccine_ids is None:
+            self.vaccine_ids, self.vaccine_names = self._vaccine_maps()
+        pet_ids = {_as_id(record.get('pet')) for _, record in chunk if isinstance(record, dict)}
+        pets = set(Pet.objects.filter(id__in=pet_ids - {None}).values_list('id', flat=True))
+        records = []
+        for row, record in chunk:
+            vaccination, errors = self._parse(record, pets)
+            if errors:
+                self.failed += 1
+                yield {'row': row, 'errors': errors}
+            else:
+                records.append(vaccination)
+        Vaccinated.objects.bulk_create(records, batch_size=self.chunk_size)
+        self.created += len(records)
@@ -0,0 +1,227 @@
+import atexit
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections
+from . import metrics
+
+_STOP = object()
+_worker_state = threading.local()
+
+
+class EmailWorkerPool:
+    # A fixed set of worker threads fed from a bounded queue. Each worker
+    # keeps one SMTP connection open between messages and closes it after
+    # `idle_timeout` seconds without work.
+    def __init__(self, workers=4, max_queue=500, put_timeout=5.0, idle_timeout=30.0):
+        self.workers = workers
+        self.put_timeout = put_timeout
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.submitted = 0
+        self.rejected = 0
+        self.sent = 0
+        self.failed = 0
+        self.send_seconds = 0.0
+        self.max_send_seconds = 0.0
+
+    def _start(self):
+        with self._lock:
+            if self._threads or self._closed:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'email-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, func, *args):
+        # Blocks for up to `put_timeout` seconds when the queue is full so a
+        # burst slows the caller down instead of piling up threads.
+        if self._closed:
+            print("Email pool is shut down, dropping message")
+            return False
+        self._start()
+        try:
+            self._queue.put((func, args), timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            metrics.registry.inc('petcare_email_queue_rejected_total')
+            print(f"Email queue full ({self._queue.maxsize}), dropping {getattr(func, '__name__', func)}")
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _run(self):
+        _worker_state.pool = self
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    _close_connection()
+                    continue
+                try:
+                    if item is _STOP:
+                        return
+                    func, args = item
+                    try:
+                        func(*args)
+                    except Exception as e:
+                        print(f"Email task {getattr(func, '__name__', func)} failed: {str(e)}")
+                    finally:
+                        close_old_connections()
+                finally:
+                    self._queue.task_done()
+        finally:
+            _close_connection()
+
+    def record_send(self, seconds, ok):
+        with self._lock:
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self.send_seconds += seconds
+            self.max_send_seconds = max(self.max_send_seconds, seconds)
+        metrics.registry.observe('petcare_email_send_duration_seconds', seconds, {'result': 'sent' if ok else 'failed'})
+
+    def stats(self):
+        with self._lock:
+            attempts = self.sent + self.failed
+            return {
+                'workers': len(self._threads),
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'sent': self.sent,
+                'failed': self.failed,
+                'avg_send_seconds': self.send_seconds / attempts if attempts else 0.0,
+                'max_send_seconds': self.max_send_seconds,
+            }
+
+    def shutdown(self, timeout=30.0):
+        # Stop accepting work, let the workers drain what is queued, then stop.
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+        deadline = time.monotonic() + timeout
+        for _ in threads:
+            try:
+                self._queue.put(_STOP, timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Full:
+                break
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        pending = self._queue.qsize()
+        if pending:
+            print(f"Email pool shut down with {pending} message(s) still queued")
+
+
+def _open_connection():
+    connection = getattr(_worker_state, 'connection', None)
+    if connection is None:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        _worker_state.connection = connection
+    return connection
+
+
+def _close_connection():
+    connection = getattr(_worker_state, 'connection', None)
+    _worker_state.connection = None
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+def _holds_connection():
+    return getattr(_worker_state, 'pool', None) is not None or getattr(_worker_state, 'depth', 0) > 0
+
+
+@contextmanager
+def mail_connection():
+    # Keeps one SMTP connection open for every send_email_message() call in
+    # the block. Pool workers already hold one, so this is a no-op there.
+    _worker_state.depth = getattr(_worker_state, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _worker_state.depth -= 1
+        if not _holds_connection():
+            _close_connection()
+
+
+def send_email_message(email):
+    # Inside a pool worker or a mail_connection() block the message goes out
+    # over the open connection; anywhere else one is opened for this message.
+    pool = getattr(_worker_state, 'pool', None)
+    recorder = pool or email_pool
+    started = time.perf_counter()
+    try:
+        if not _holds_connection():
+            email.send(fail_silently=False)
+        else:
+            try:
+                _open_connection().send_messages([email])
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # The server dropped the idle connection; reconnect once.
+                _close_connection()
+                _open_connection().send_messages([email])
+    except Exception:
+        recorder.record_send(time.perf_counter() - started, False)
+        raise
+    recorder.record_send(time.perf_counter() - started, True)
+
+
+def send_each(emails):
+    # Send every message over one connection, one send_messages() call per
+    # message, so a refused recipient only fails its own message. Returns
+    # the exception for each message, or None when it was sent.
+    errors = []
+    with mail_connection():
+        for email in emails:
+            try:
+                send_email_message(email)
+            except Exception as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+    return errors
+
+
+def build_email(subject, message, recipient_list, html_message=None, from_email=None):
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=recipient_list,
+    )
+    if html_message:
+        email.attach_alternative(html_message, 'text/html')
+    return email
+
+
+def deliver_mail(subject, message, recipient_list, html_message=None, from_email=None):
+    send_email_message(build_email(subject, message, recipient_list, html_message, from_email))
+
+
+email_pool = EmailWorkerPool(
+    workers=getattr(settings, 'EMAIL_WORKERS', 4),
+    max_queue=getattr(settings, 'EMAIL_QUEUE_SIZE', 500),
+    put_timeout=getattr(settings, 'EMAIL_QUEUE_TIMEOUT', 5.0),
+)
+atexit.register(email_pool.shutdown, getattr(settings, 'EMAIL_SHUTDOWN_TIMEOUT', 30.0))
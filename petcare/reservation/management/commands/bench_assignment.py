@@ -0,0 +1,108 @@
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test.utils import CaptureQueriesContext
+from reservation.assignment import least_loaded_vet
+from reservation.models import Appointment, Pet, User, VetDayLoad, VetSlot
+from reservation.services import clinic_today, day_range
+from reservation.slots import clinic_day, day_slots, rebuild_loads
+
+BENCH_DOMAIN = 'bench.petcare.test'
+
+
+def count_based_vet(when):
+    # What picking looks like without VetDayLoad: count each vet's
+    # confirmed appointments of the day on every call.
+    from reservation.slots import slot_start
+    start = slot_start(when)
+    day_start, day_end = day_range(clinic_day(start))
+    confirmed = Q(
+        vet_appointments__status='confirmed',
+        vet_appointments__date__gte=day_start,
+        vet_appointments__date__lt=day_end,
+    )
+    return (
+        User.objects.filter(role='vet', active=True)
+        .exclude(slots__start=start)
+        .annotate(load=Count('vet_appointments', filter=confirmed))
+        .order_by('load', 'id')
+        .first()
+    )
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Time least-loaded vet selection against growing numbers of vets and appointments; all data is rolled back.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vets', type=int, nargs='+', default=[5, 50, 200])
+        parser.add_argument('--appointments', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--days', type=int, default=30, help='Working days the appointments are spread over.')
+        parser.add_argument('--picks', type=int, default=200, help='Timed selections per run.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        results = []
+        for vets in options['vets']:
+            for appointments in options['appointments']:
+                self.random = random.Random(options['seed'])
+                try:
+                    with transaction.atomic():
+                        results.append(self.run(vets, appointments, options))
+                        raise Rollback()
+                except Rollback:
+                    pass
+        self.stdout.write(json.dumps({'database': connection.vendor, 'runs': results}, indent=2))
+
+    def working_slots(self, days):
+        slots, day = [], clinic_today() + timedelta(days=1)
+        while len(slots) < days:
+            if day_slots(day):
+                slots.append(day_slots(day))
+            day += timedelta(days=1)
+        return [slot for day_grid in slots for slot in day_grid]
+
+    def run(self, vet_count, appointment_count, options):
+        vets = User.objects.bulk_create([
+            User(email=f'vet{i}@{BENCH_DOMAIN}', full_name=f'Bench Vet {i}', role='vet') for i in range(vet_count)
+        ])
+        owner = User.objects.create(email=f'owner@{BENCH_DOMAIN}', full_name='Bench Owner')
+        pet = Pet.objects.create(user=owner, name='Bench', breed='Mixed', color='Brown', birth_date=date(2020, 1, 1))
+        grid = self.working_slots(options['days'])
+        # Appointments fill (vet, slot) pairs at random; more than fit are dropped.
+        pairs = self.random.sample(range(len(grid) * vet_count), min(appointment_count, len(grid) * vet_count))
+        rows = Appointment.objects.bulk_create([
+            Appointment(user=owner, pet=pet, purpose='Check-up', date=grid[pair // vet_count],
+                        status='confirmed', assigned_vet=vets[pair % vet_count])
+            for pair in pairs
+        ], batch_size=1000)
+        VetSlot.objects.bulk_create([
+            VetSlot(vet=row.assigned_vet, start=row.date, appointment=row) for row in rows
+        ], batch_size=1000)
+        rebuild_loads(VetSlot, VetDayLoad)
+
+        targets = [self.random.choice(grid) for _ in range(options['picks'])]
+        result = {'vets': vet_count, 'appointments': len(rows)}
+        for name, pick in (('day_load', least_loaded_vet), ('count', count_based_vet)):
+            with CaptureQueriesContext(connection) as queries:
+                pick(targets[0])
+            latencies = []
+            for when in targets:
+                started = time.perf_counter()
+                pick(when)
+                latencies.append((time.perf_counter() - started) * 1000)
+            latencies.sort()
+            result[name] = {
+                'p50_ms': round(statistics.median(latencies), 3),
+                'p95_ms': round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+                'queries': len(queries),
+            }
+        return result
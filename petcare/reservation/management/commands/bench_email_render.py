@@ -0,0 +1,257 @@
+import json
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from minio import Minio
+from reservation.services import EmailService, minio_service, render_email
+
+
+# The f-string renderers as they were before the templates, kept here so the
+# two paths can be compared. Note the pet thumbnail is looked up twice.
+def legacy_vet_assignment(vet, context):
+    html_message = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #b8860b; border-bottom: 2px solid #b8860b; padding-bottom: 10px;">
+                👨‍⚕️ Appointment Assignment
+            </h2>
+            
+            <p>Dear Dr. {vet.full_name},</p>
+            
+            <p>You have been assigned to an appointment that has been confirmed:</p>
+            
+            <div style="background: #f8f6f0; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                <h3 style="color: #b8860b; margin-top: 0;">Appointment Details</h3>
+                {f'<div style="text-align: center; margin-bottom: 15px;"><img src="{context["pet"].get_image_thumb_url()}" alt="{context["pet"].name}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; border: 2px solid #b8860b;"><br><small style="color: #666; font-style: italic;">{context["pet"].name}</small></div>' if context['pet'].get_image_thumb_url() else ''}
+                <p><strong>Pet Owner:</strong> {context['user'].full_name}</p>
+                <p><strong>Contact:</strong> {context['user'].email} {f"| {context['user'].phone_number}" if context['user'].phone_number else ""}</p>
+                <p><strong>Pet Name:</strong> {context['pet'].name}</p>
+                <p><strong>Pet Breed:</strong> {context['pet'].breed}</p>
+                <p><strong>Pet Gender:</strong> {context['pet'].gender}</p>
+                <p><strong>Date & Time:</strong> {context['appointment_date']}</p>
+                <p><strong>Purpose:</strong> {context['appointment'].purpose}</p>
+                <p><strong>Status:</strong> <span style="color: #28a745; font-weight: bold;">CONFIRMED</span></p>
+                {f"<p><strong>Remarks:</strong> {context['appointment'].remarks}</p>" if context['appointment'].remarks else ""}
+            </div>
+            
+            <div style="background: #d4edda; padding: 15px; border-left: 4px solid #28a745; margin: 20px 0;">
+                <p style="margin: 0;"><strong>Next Steps:</strong></p>
+                <p style="margin: 5px 0 0 0;">Please prepare for this appointment and update the status to "Completed" after the visit.</p>
+            </div>
+            
+            <p>Thank you for your commitment to providing excellent pet care.</p>
+            
+            <p>Best regards,<br>
+            <strong>PetCare System</strong></p>
+        </div>
+    </body>
+    </html>
+    """
+    
+    plain_message = f"""
+    Appointment Assignment
+    
+    Dear Dr. {vet.full_name},
+    
+    You have been assigned to an appointment that has been confirmed:
+    
+    Appointment Details:
+    - Pet Owner: {context['user'].full_name}
+    - Contact: {context['user'].email} {f"| {context['user'].phone_number}" if context['user'].phone_number else ""}
+    - Pet Name: {context['pet'].name}
+    - Pet Breed: {context['pet'].breed}
+    - Pet Gender: {context['pet'].gender}
+    - Date & Time: {context['appointment_date']}
+    - Purpose: {context['appointment'].purpose}
+    - Status: CONFIRMED
+    {f"- Remarks: {context['appointment'].remarks}" if context['appointment'].remarks else ""}
+    
+    Next Steps:
+    Please prepare for this appointment and update the status to "Completed" after the visit.
+    
+    Best regards,
+    PetCare System
+    """
+
+    return html_message, plain_message
+
+
+def legacy_appointment_reminder(appointment):
+    context = {
+        'appointment': appointment,
+        'pet': appointment.pet,
+        'user': appointment.user,
+        'appointment_date': appointment.date.strftime('%B %d, %Y at %I:%M %p'),
+        'days_until': 2
+    }
+    html_message = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #b8860b; border-bottom: 2px solid #b8860b; padding-bottom: 10px;">
+                ⏰ Appointment Reminder
+            </h2>
+            
+            <p>Dear {appointment.user.full_name},</p>
+            
+            <p>This is a friendly reminder that you have an upcoming appointment in <strong>2 days</strong>:</p>
+            
+            <div style="background: #e8f5e8; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #28a745;">
+                <h3 style="color: #28a745; margin-top: 0;">📅 Upcoming Appointment</h3>
+                {f'<div style="text-align: center; margin-bottom: 15px;"><img src="{appointment.pet.get_image_thumb_url()}" alt="{appointment.pet.name}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; border: 2px solid #b8860b;"></div>' if appointment.pet.get_image_thumb_url() else ''}
+                <p><strong>Pet:</strong> {appointment.pet.name}</p>
+                <p><strong>Breed:</strong> {appointment.pet.breed}</p>
+                <p><strong>Date & Time:</strong> {context['appointment_date']}</p>
+                <p><strong>Purpose:</strong> {appointment.purpose}</p>
+                <p><strong>Assigned Veterinarian:</strong> Dr. {appointment.assigned_vet.full_name if appointment.assigned_vet else 'TBA'}</p>
+                <p><strong>Status:</strong> <span style="color: #28a745; font-weight: bold;">CONFIRMED</span></p>
+                {f"<p><strong>Remarks:</strong> {appointment.remarks}</p>" if appointment.remarks else ""}
+            </div>
+            
+            <div style="background: #fff3cd; padding: 15px; border-left: 4px solid #daa520; margin: 20px 0;">
+                <p style="margin: 0;"><strong>📋 Pre-Appointment Checklist:</strong></p>
+                <ul style="margin: 10px 0 0 20px; padding: 0;">
+                    <li>Ensure your pet has fasted if required for the procedure</li>
+                    <li>Bring any previous medical records or test results</li>
+                    <li>Prepare a list of questions for the veterinarian</li>
+                    <li>Arrive 10-15 minutes early for check-in</li>
+                    <li>Bring your pet's favorite toy or blanket for comfort</li>
+                </ul>
+            </div>
+            
+            <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0;">
+                <p style="margin: 0;"><strong>📞 Need to make changes?</strong></p>
+                <p style="margin: 5px 0 0 0;">If you need to reschedule or cancel, please contact us at least 24 hours in advance to avoid cancellation fees.</p>
+            </div>
+            
+            <p>We look forward to seeing you and {appointment.pet.name} soon!</p>
+            
+            <p>Best regards,<br>
+            <strong>PetCare Team</strong></p>
+        </div>
+    </body>
+    </html>
+    """
+    
+    plain_message = f"""
+    Appointment Reminder
+    
+    Dear {appointment.user.full_name},
+    
+    This is a friendly reminder that you have an upcoming appointment in 2 days:
+    
+    Upcoming Appointment:
+    - Pet: {appointment.pet.name}
+    - Breed: {appointment.pet.breed}
+    - Date & Time: {context['appointment_date']}
+    - Purpose: {appointment.purpose}
+    - Assigned Veterinarian: Dr. {appointment.assigned_vet.full_name if appointment.assigned_vet else 'TBA'}
+    - Status: CONFIRMED
+    {f"- Remarks: {appointment.remarks}" if appointment.remarks else ""}
+    
+    Pre-Appointment Checklist:
+    - Ensure your pet has fasted if required for the procedure
+    - Bring any previous medical records or test results
+    - Prepare a list of questions for the veterinarian
+    - Arrive 10-15 minutes early for check-in
+    - Bring your pet's favorite toy or blanket for comfort
+    
+    Need to make changes?
+    If you need to reschedule or cancel, please contact us at least 24 hours in advance.
+    
+    We look forward to seeing you and {appointment.pet.name} soon!
+    
+    Best regards,
+    PetCare Team
+    """
+
+    return html_message, plain_message
+
+
+class FakePet(SimpleNamespace):
+    def get_image_thumb_url(self):
+        return minio_service.get_variant_url(self.image_key, 'thumb')
+
+
+def fake_appointment(i):
+    owner = SimpleNamespace(full_name='Somchai Jaidee', email='owner@example.com', phone_number='0812345678')
+    vet = SimpleNamespace(full_name='Dr. Napat', email='vet@example.com')
+    pet = FakePet(name='Mali', breed='Thai Bangkaew', gender='Female', image_key=f'pets/bench-{i}.jpg')
+    return SimpleNamespace(
+        id=i, user=owner, pet=pet, assigned_vet=vet,
+        purpose='Annual check-up', remarks='Nervous with strangers <3', vet_note=None,
+        date=datetime(2026, 1, 5, 10, 30),
+        get_status_display=lambda: 'Confirmed',
+    )
+
+
+def new_vet_assignment(appointment):
+    context = EmailService.build_context(appointment)
+    return render_email('vet_assignment', {**context, 'recipient_name': appointment.assigned_vet.full_name})
+
+
+def legacy_vet_assignment_path(appointment):
+    context = {
+        'appointment': appointment,
+        'pet': appointment.pet,
+        'user': appointment.user,
+        'appointment_date': appointment.date.strftime('%B %d, %Y at %I:%M %p'),
+        'status_display': appointment.get_status_display(),
+    }
+    return legacy_vet_assignment(appointment.assigned_vet, context)
+
+
+def new_appointment_reminder(appointment):
+    context = EmailService.build_context(appointment, days_until=2, recipient_name=appointment.user.full_name)
+    return render_email('appointment_reminder', context)
+
+
+PATHS = {
+    'vet_assignment': (legacy_vet_assignment_path, new_vet_assignment),
+    'appointment_reminder': (legacy_appointment_reminder, new_appointment_reminder),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare email render throughput of the old f-string bodies with the cached templates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=2000)
+        parser.add_argument('--cold-urls', action='store_true',
+                            help='Clear the presigned URL cache before every render.')
+
+    def handle(self, *args, **options):
+        # Sign with a client pinned to a region so presigning never has to
+        # ask the server for its location; no MinIO needs to be running.
+        client = Minio(
+            settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            secure=settings.MINIO_SECURE,
+            region='us-east-1',
+        )
+        renders = options['renders']
+        results = []
+        try:
+            with minio_service.use_client(client):
+                for name, (legacy, new) in PATHS.items():
+                    row = {'template': name, 'renders': renders}
+                    for label, render in (('legacy', legacy), ('template', new)):
+                        minio_service.url_cache.clear()
+                        render(fake_appointment(-1))
+                        started = time.perf_counter()
+                        for i in range(renders):
+                            if options['cold_urls']:
+                                minio_service.url_cache.clear()
+                            render(fake_appointment(i))
+                        seconds = time.perf_counter() - started
+                        row[f'{label}_seconds'] = round(seconds, 4)
+                        row[f'{label}_per_second'] = round(renders / seconds, 1)
+                    row['speedup'] = round(row['template_per_second'] / row['legacy_per_second'], 2)
+                    results.append(row)
+        finally:
+            minio_service.url_cache.clear()
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,132 @@
+import json
+import random
+import statistics
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from reservation.models import Appointment, Pet, User
+from reservation.services import minio_service
+from reservation.storage import MemoryStorage
+
+# name: (role to log in as, URL, or a format string filled with sampled ids)
+ENDPOINTS = {
+    'appointment_list': ('staff', '/api/appointments/'),
+    'appointment_list_vet': ('vet', '/api/appointments/'),
+    'appointment_list_client': ('client', '/api/appointments/'),
+    'appointment_detail': ('staff', '/api/appointments/{appointment}/'),
+    'pet_list': ('staff', '/api/pets/'),
+    'pet_list_client': ('client', '/api/pets/'),
+    'pet_detail': ('staff', '/api/pets/{pet}/'),
+    'vaccination_list': ('staff', '/api/vaccinations/'),
+    'user_history': ('staff', '/api/treatments/{client}/'),
+}
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = 'Time the hot read endpoints with the Django test client and print p50/p95 latency and query counts as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0, help='Picks the users and rows the requests target.')
+        parser.add_argument('--only', nargs='+', choices=sorted(ENDPOINTS), default=None)
+        parser.add_argument('--output', default=None, help='Also write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        targets = self.sample_targets()
+        # Outgoing mail goes to the locmem backend and objects to the
+        # in-memory store, so neither SMTP nor MinIO is contacted.
+        stubbed = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        )
+        stubbed.enable()
+        storage = MemoryStorage()
+        storage.make_bucket(minio_service.bucket_name)
+        minio_service.url_cache.clear()
+        try:
+            clients = {role: self.client_for(user) for role, user in targets['users'].items()}
+            report = {
+                'database': connection.vendor,
+                'rows': {
+                    'users': User.objects.count(),
+                    'pets': Pet.objects.count(),
+                    'appointments': Appointment.objects.count(),
+                },
+                'requests': options['requests'],
+                'endpoints': {},
+            }
+            with minio_service.use_client(storage):
+                for name in options['only'] or ENDPOINTS:
+                    role, url = ENDPOINTS[name]
+                    report['endpoints'][name] = self.run(clients[role], url, targets, options)
+        finally:
+            minio_service.url_cache.clear()
+            stubbed.disable()
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+    def sample_targets(self):
+        users = {}
+        for role in ('staff', 'vet', 'client'):
+            queryset = User.objects.filter(role=role, active=True).order_by('id')
+            if role != 'staff':
+                # Someone with history, so the lists are not trivially empty.
+                field = 'vet_appointments' if role == 'vet' else 'appointments'
+                queryset = queryset.filter(**{f'{field}__isnull': False}).distinct()
+            ids = list(queryset.values_list('id', flat=True)[:100])
+            if not ids:
+                raise CommandError(f'No active {role} with data to benchmark; run seed_clinic first.')
+            users[role] = User.objects.get(id=self.random.choice(ids))
+        appointments = list(
+            Appointment.objects.filter(status='completed').order_by('id').values_list('id', flat=True)[:1000]
+        )
+        pets = list(Pet.objects.order_by('id').values_list('id', flat=True)[:1000])
+        clients = list(User.objects.filter(role='client').order_by('id').values_list('id', flat=True)[:1000])
+        if not appointments or not pets:
+            raise CommandError('No completed appointments to benchmark; run seed_clinic first.')
+        return {'users': users, 'appointment': appointments, 'pet': pets, 'client': clients}
+
+    def client_for(self, user):
+        client = Client()
+        session = client.session
+        session['user_id'] = user.id
+        session.save()
+        return client
+
+    def run(self, client, url, targets, options):
+        latencies, queries, sizes, statuses = [], [], [], Counter()
+        for i in range(options['warmup'] + options['requests']):
+            path = url.format(**{key: self.random.choice(targets[key]) for key in ('appointment', 'pet', 'client')})
+            started = time.perf_counter()
+            response = client.get(path)
+            elapsed = time.perf_counter() - started
+            if i < options['warmup']:
+                continue
+            latencies.append(elapsed * 1000)
+            queries.append(int(response['X-Query-Count']))
+            sizes.append(len(response.content))
+            statuses[response.status_code] += 1
+        return {
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'max_ms': round(max(latencies), 2),
+            'queries_p50': percentile(queries, 50),
+            'queries_max': max(queries),
+            'bytes_p50': percentile(sizes, 50),
+            'status': {str(code): count for code, count in sorted(statuses.items())},
+        }
@@ -0,0 +1,117 @@
+import json
+import socketserver
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from reservation.mailer import build_email, send_each
+from reservation.outbox import collect_outbox
+from reservation.services import EmailService
+
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    # Just enough SMTP to accept and discard mail.
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO') or command.startswith('HELO'):
+                self.reply('250 sink')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.messages += 1
+                self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SmtpSinkHandler)
+        self.messages = 0
+
+
+def fake_context(staff_count):
+    owner = SimpleNamespace(full_name='Somchai Jaidee', email='owner@example.com', phone_number='0812345678')
+    pet = SimpleNamespace(name='Mali', breed='Thai Bangkaew', gender='Female', get_image_thumb_url=lambda: None)
+    appointment = SimpleNamespace(purpose='Annual check-up', remarks='Nervous with strangers')
+    staff = [SimpleNamespace(full_name=f'Staff {i}', email=f'staff{i}@example.com') for i in range(staff_count)]
+    context = {
+        'appointment': appointment,
+        'pet': pet,
+        'user': owner,
+        'appointment_date': datetime(2026, 1, 5, 10, 30).strftime('%B %d, %Y at %I:%M %p'),
+        'status_display': 'Booked',
+        'pet_image_url': None,
+        'vet_name': 'TBA',
+    }
+    return staff, context
+
+
+class Command(BaseCommand):
+    help = 'Compare per-recipient SMTP sessions with single-connection staff fan-out against a local SMTP sink.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--staff', type=int, nargs='+', default=[5, 50, 500])
+
+    def handle(self, *args, **options):
+        sink = SmtpSink()
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        smtp = {
+            'EMAIL_BACKEND': 'django.core.mail.backends.smtp.EmailBackend',
+            'EMAIL_HOST': '127.0.0.1',
+            'EMAIL_PORT': sink.server_address[1],
+            'EMAIL_USE_TLS': False,
+            'EMAIL_HOST_USER': '',
+            'EMAIL_HOST_PASSWORD': '',
+        }
+        results = []
+        try:
+            with override_settings(**smtp):
+                for count in options['staff']:
+                    staff, context = fake_context(count)
+                    with collect_outbox() as rows:
+                        started = time.perf_counter()
+                        EmailService._send_staff_appointment_emails(staff, context)
+                        render_seconds = time.perf_counter() - started
+
+                    started = time.perf_counter()
+                    for row in rows:
+                        send_mail(row.subject, row.body, row.from_email, row.recipients, html_message=row.html_body)
+                    per_recipient_seconds = time.perf_counter() - started
+
+                    started = time.perf_counter()
+                    errors = send_each([
+                        build_email(row.subject, row.body, row.recipients, row.html_body, row.from_email)
+                        for row in rows
+                    ])
+                    fan_out_seconds = time.perf_counter() - started
+
+                    results.append({
+                        'staff': count,
+                        'render_seconds': round(render_seconds, 4),
+                        'per_recipient_seconds': round(per_recipient_seconds, 4),
+                        'fan_out_seconds': round(fan_out_seconds, 4),
+                        'fan_out_failures': sum(1 for error in errors if error is not None),
+                    })
+        finally:
+            sink.shutdown()
+            sink.server_close()
+        self.stdout.write(json.dumps(results, indent=2))
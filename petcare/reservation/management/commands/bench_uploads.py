@@ -0,0 +1,105 @@
+import hashlib
+import io
+import json
+import os
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.management.base import BaseCommand
+from minio.helpers import get_part_info, read_part_data
+from reservation.services import minio_service
+
+
+class FakeObjectStore:
+    # Consumes uploads part by part the same way Minio.put_object does and
+    # keeps only a digest, so memory use reflects the caller, not the store.
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, bucket_name, object_name, data, length, content_type=None, part_size=0):
+        part_size, part_count = get_part_info(length, part_size)
+        digest = hashlib.md5()
+        total = 0
+        while True:
+            part = read_part_data(data, part_size)
+            digest.update(part)
+            total += len(part)
+            if len(part) < part_size or (part_count > 0 and total >= length):
+                break
+        self.objects[object_name] = (total, digest.hexdigest(), content_type)
+
+
+def legacy_upload(client, bucket_name, file_obj, file_name, content_type):
+    file_obj.seek(0)
+    file_data = file_obj.read()
+    client.put_object(
+        bucket_name=bucket_name,
+        object_name=file_name,
+        data=io.BytesIO(file_data),
+        length=len(file_data),
+        content_type=content_type,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Measure peak memory of concurrent image uploads against a local fake object store.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=50)
+        parser.add_argument('--size-kb', type=int, default=4096)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--in-memory', action='store_true', help='Use in-memory uploads instead of temp files.')
+
+    def make_files(self, count, size):
+        files = []
+        payload = os.urandom(size)
+        for i in range(count):
+            if self.in_memory:
+                files.append(SimpleUploadedFile(f'{i}.jpg', payload, content_type='image/jpeg'))
+            else:
+                upload = TemporaryUploadedFile(f'{i}.jpg', 'image/jpeg', size, None)
+                upload.write(payload)
+                upload.flush()
+                files.append(upload)
+        return files
+
+    def run_case(self, name, upload, files, concurrency):
+        tracemalloc.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(upload, files))
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            'path': name,
+            'files': len(files),
+            'seconds': round(elapsed, 3),
+            'peak_mib': round(peak / 1024 / 1024, 2),
+        }
+
+    def handle(self, *args, **options):
+        self.in_memory = options['in_memory']
+        size = options['size_kb'] * 1024
+        store = FakeObjectStore()
+        files = self.make_files(options['count'], size)
+        bucket = minio_service.bucket_name
+        try:
+            with minio_service.use_client(store):
+                results = [
+                    self.run_case(
+                        'legacy',
+                        lambda f: legacy_upload(store, bucket, f, f'legacy/{f.name}', f.content_type),
+                        files, options['concurrency'],
+                    ),
+                    self.run_case(
+                        'streaming',
+                        lambda f: minio_service.upload_image(f, f'streaming/{f.name}', f.content_type, variants=False),
+                        files, options['concurrency'],
+                    ),
+                ]
+        finally:
+            for f in files:
+                f.close()
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from reservation.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send pending outbox emails. Several instances can run side by side.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--loop', action='store_true', help='Keep draining until interrupted.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        while True:
+            totals = drain_outbox(batch_size=options['batch_size'])
+            if totals['batches']:
+                self.stdout.write(
+                    f"sent={totals['sent']} retried={totals['retried']} failed={totals['failed']} batches={totals['batches']}"
+                )
+            if not options['loop']:
+                return
+            if not totals['batches']:
+                time.sleep(options['interval'])
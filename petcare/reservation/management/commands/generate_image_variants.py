@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from reservation.models import Pet, User
+from reservation.services import minio_service
+
+
+class Command(BaseCommand):
+    help = 'Create thumbnail and medium variants for images uploaded before variants existed.'
+
+    def handle(self, *args, **options):
+        keys = list(User.objects.exclude(image_key__isnull=True).exclude(image_key='').values_list('image_key', flat=True))
+        keys += list(Pet.objects.exclude(image_key__isnull=True).exclude(image_key='').values_list('image_key', flat=True))
+
+        created = 0
+        for key in keys:
+            if minio_service.regenerate_variants(key):
+                created += 1
+            else:
+                self.stderr.write(f"Failed to create variants for {key}")
+        self.stdout.write(self.style.SUCCESS(f"Created variants for {created}/{len(keys)} images"))
@@ -0,0 +1,61 @@
+import json
+import os
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from reservation.bulk import read_records
+from reservation.onboarding import OWNER_FIELDS, PET_FIELDS, OnboardingError, OnboardingImport
+
+
+class Command(BaseCommand):
+    help = (
+        'Create client accounts and pets from a CSV or JSONL file (or - for stdin), one row per pet. '
+        f"Columns: {', '.join(OWNER_FIELDS + PET_FIELDS)}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                            help='Defaults to the file extension; required when reading stdin.')
+        parser.add_argument('--image-root', default=None, help='Directory the owner_image and pet_image paths are in.')
+        parser.add_argument('--checkpoint', default=None,
+                            help='Name progress is saved under. Defaults to the file path; stdin has none unless given.')
+        parser.add_argument('--restart', action='store_true', help='Start from the first row, ignoring saved progress.')
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--hash-workers', type=int, default=None, help='Password hashing processes (default: one per CPU).')
+        parser.add_argument('--upload-workers', type=int, default=None)
+        parser.add_argument('--errors', default=None, help='Write rejected rows here as JSONL instead of stderr.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or (path.rsplit('.', 1)[-1].lower() if '.' in path else None)
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError('Pass --format csv or --format jsonl.')
+        checkpoint = options['checkpoint'] or (None if path == '-' else f'onboarding:{os.path.abspath(path)}')
+        started = time.perf_counter()
+        importer = OnboardingImport(
+            checkpoint=checkpoint,
+            image_root=options['image_root'],
+            chunk_size=options['chunk_size'],
+            hash_workers=options['hash_workers'],
+            upload_workers=options['upload_workers'],
+            restart=options['restart'],
+        )
+        source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        # Appended to when resuming, so the file covers the whole import.
+        resuming = checkpoint and not options['restart']
+        errors = open(options['errors'], 'a' if resuming else 'w') if options['errors'] else self.stderr
+        try:
+            for error in importer.run(read_records(source, fmt)):
+                errors.write(json.dumps(error) + '\n')
+        except OnboardingError as e:
+            raise CommandError(f'{e} Rows up to {importer.committed} are committed.')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if options['errors']:
+                errors.close()
+        summary = importer.summary()
+        summary['checkpoint'] = checkpoint
+        summary['seconds'] = round(time.perf_counter() - started, 2)
+        self.stdout.write(json.dumps(summary))
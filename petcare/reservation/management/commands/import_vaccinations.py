@@ -0,0 +1,37 @@
+import json
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from reservation.bulk import VaccinationImport, read_records
+
+
+class Command(BaseCommand):
+    help = 'Import vaccination records from a CSV or JSONL file (or - for stdin) in chunks with bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                            help='Defaults to the file extension; required when reading stdin.')
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--errors', default=None, help='Write rejected rows here as JSONL instead of stderr.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or (path.rsplit('.', 1)[-1].lower() if '.' in path else None)
+        if fmt not in ('csv', 'jsonl'):
+            raise CommandError('Pass --format csv or --format jsonl.')
+        started = time.perf_counter()
+        importer = VaccinationImport(chunk_size=options['chunk_size'])
+        source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        errors = open(options['errors'], 'w') if options['errors'] else self.stderr
+        try:
+            for error in importer.run(read_records(source, fmt)):
+                errors.write(json.dumps(error) + '\n')
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if options['errors']:
+                errors.close()
+        summary = importer.summary()
+        summary['seconds'] = round(time.perf_counter() - started, 2)
+        self.stdout.write(json.dumps(summary))
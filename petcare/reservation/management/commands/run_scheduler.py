@@ -0,0 +1,18 @@
+import time
+from django.core.management.base import BaseCommand
+from reservation import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Run the background scheduler in this process (for deployments with SCHEDULER_AUTOSTART off in the web workers). It still takes part in leader election.'
+
+    def handle(self, *args, **options):
+        if scheduler.start() is None:
+            return
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            scheduler.stop()
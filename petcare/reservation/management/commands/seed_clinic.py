@@ -0,0 +1,141 @@
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reservation.models import Appointment, Pet, Service, Treatment, User, Vaccinated, Vaccine, VetDayLoad, VetSlot
+from reservation.services import CLINIC_TIME_ZONE, clinic_today
+from reservation.slots import rebuild_loads, rebuild_slots
+
+SEED_DOMAIN = 'seed.petcare.test'
+SERVICES = ['General check-up', 'getVaccine', 'Neutering/Spaying', 'Dental cleaning', 'Grooming', 'Skin treatment']
+VACCINES = ['Rabies', 'DHPP', 'Leptospirosis', 'Bordetella', 'FVRCP', 'FeLV', 'Canine Influenza', 'Lyme', 'Parvovirus', 'Distemper']
+BREEDS = ['Thai Bangkaew', 'Thai Ridgeback', 'Golden Retriever', 'Shih Tzu', 'Pomeranian', 'Siamese', 'Persian', 'Mixed']
+COLORS = ['White', 'Black', 'Brown', 'Golden', 'Grey', 'Cream', 'Tabby']
+PURPOSES = ['Annual check-up', 'Vaccination', 'Skin rash', 'Limping', 'Dental cleaning', 'Not eating', 'Follow-up']
+HOURS = [9, 10, 11, 13, 14, 15, 16]
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic clinic (clients, pets, vets, vaccines and years of history) with bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--pets-per-client', type=int, default=2)
+        parser.add_argument('--vets', type=int, default=5)
+        parser.add_argument('--staff', type=int, default=2)
+        parser.add_argument('--vaccines', type=int, default=len(VACCINES))
+        parser.add_argument('--years', type=float, default=2)
+        parser.add_argument('--visits-per-year', type=int, default=4, help='Appointments per pet per year.')
+        parser.add_argument('--end-date', type=date.fromisoformat, default=None,
+                            help='Last day of history (YYYY-MM-DD). Defaults to today; a month of bookings follows it.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--images', action='store_true', help='Give users and pets image keys so URLs get signed.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--flush', action='store_true', help=f'Delete previously seeded users (@{SEED_DOMAIN}) first.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        end_date = options['end_date'] or clinic_today()
+        with transaction.atomic():
+            if options['flush']:
+                User.objects.filter(email__endswith=f'@{SEED_DOMAIN}').delete()
+            counts = self.seed(options, end_date)
+        counts['seconds'] = round(time.perf_counter() - started, 2)
+        self.stdout.write(json.dumps(counts, indent=2))
+
+    def seed(self, options, end_date):
+        # One password hash for every seeded account: hashing is the slowest
+        # part of creating users and the benchmarks never log in with it.
+        password = make_password('petcare-seed')
+        images = options['images']
+        services = {
+            title: Service.objects.filter(title=title).first() or Service.objects.create(title=title)
+            for title in SERVICES
+        }
+        vaccine_names = [VACCINES[i] if i < len(VACCINES) else f'Vaccine {i}' for i in range(options['vaccines'])]
+        vaccines = [Vaccine.objects.filter(name=name).first() or Vaccine.objects.create(name=name) for name in vaccine_names]
+
+        people = []
+        for role, count in (('staff', options['staff']), ('vet', options['vets']), ('client', options['clients'])):
+            people += [
+                User(
+                    email=f'{role}{i}@{SEED_DOMAIN}', password=password, full_name=f'{role.title()} {i:05d}',
+                    phone_number=f'08{self.random.randrange(10 ** 8):08d}', role=role,
+                    image_key=f'seed/{role}{i}.jpg' if images else None,
+                )
+                for i in range(count)
+            ]
+        people = User.objects.bulk_create(people, batch_size=self.batch_size)
+        vets = [user for user in people if user.role == 'vet']
+        clients = [user for user in people if user.role == 'client']
+
+        pets = Pet.objects.bulk_create([
+            Pet(
+                user=client, name=f'Pet {client.id}-{i}', gender=self.random.choice(Pet.PetGender.values),
+                breed=self.random.choice(BREEDS), color=self.random.choice(COLORS),
+                neutered_status=self.random.random() < 0.4,
+                birth_date=end_date - timedelta(days=self.random.randrange(60, 15 * 365)),
+                image_key=f'seed/pet-{client.id}-{i}.jpg' if images else None,
+            )
+            for client in clients
+            for i in range(options['pets_per_client'])
+        ], batch_size=self.batch_size)
+
+        days = int(options['years'] * 365)
+        visits = max(int(options['years'] * options['visits_per_year']), 1)
+        appointments = []
+        for pet in pets:
+            for _ in range(visits):
+                # Mostly history, plus some bookings in the month ahead.
+                offset = self.random.randrange(-days, 31)
+                day = end_date + timedelta(days=offset)
+                when = datetime(day.year, day.month, day.day, self.random.choice(HOURS), tzinfo=CLINIC_TIME_ZONE)
+                if offset > 0:
+                    status = self.random.choice(['booked', 'booked', 'confirmed'])
+                else:
+                    status = self.random.choices(['completed', 'cancelled', 'rejected'], weights=[8, 1, 1])[0]
+                appointments.append(Appointment(
+                    user_id=pet.user_id, pet=pet, purpose=self.random.choice(PURPOSES), date=when, status=status,
+                    assigned_vet=self.random.choice(vets) if vets and status != 'booked' else None,
+                ))
+        appointments = Appointment.objects.bulk_create(appointments, batch_size=self.batch_size)
+
+        treatments, vaccinations = [], []
+        for appointment in appointments:
+            if appointment.status != 'completed':
+                continue
+            for _ in range(self.random.randint(1, 3)):
+                title = self.random.choice(SERVICES)
+                vaccine = self.random.choice(vaccines) if title == 'getVaccine' and vaccines else None
+                treatments.append(Treatment(
+                    appointment=appointment, service=services[title], vaccine=vaccine,
+                    description=f'{title} during {appointment.purpose.lower()}',
+                ))
+                if vaccine:
+                    vaccinations.append(Vaccinated(
+                        pet=appointment.pet, vaccine=vaccine, date=appointment.date.date(),
+                        remarks=f'Vaccination administered during appointment ({appointment.purpose}).',
+                    ))
+        Treatment.objects.bulk_create(treatments, batch_size=self.batch_size)
+        Vaccinated.objects.bulk_create(vaccinations, batch_size=self.batch_size)
+        # bulk_create skips sync_slot(); random times can collide, and the
+        # oldest appointment keeps a contested slot.
+        slots = rebuild_slots(Appointment, VetSlot, self.batch_size)
+        loads = rebuild_loads(VetSlot, VetDayLoad, self.batch_size)
+
+        return {
+            'users': len(people),
+            'pets': len(pets),
+            'appointments': len(appointments),
+            'treatments': len(treatments),
+            'vaccinations': len(vaccinations),
+            'vet_slots': slots,
+            'vet_day_loads': loads,
+            'services': len(services),
+            'vaccines': len(vaccines),
+        }
@@ -0,0 +1,22 @@
+import json
+from datetime import date
+from django.core.management.base import BaseCommand
+from reservation.reminders import send_reminders
+
+
+class Command(BaseCommand):
+    help = 'Queue reminder emails for confirmed appointments. Safe to rerun: reminded appointments are skipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, default=None,
+                            help='Appointment date (YYYY-MM-DD). Defaults to three days from today.')
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--concurrency', type=int, default=None, help='Outbox drains to start afterwards.')
+
+    def handle(self, *args, **options):
+        stats = send_reminders(
+            target_date=options['date'],
+            chunk_size=options['chunk_size'],
+            concurrency=options['concurrency'],
+        )
+        self.stdout.write(json.dumps(stats, indent=2))
@@ -0,0 +1,35 @@
+import json
+import os
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.template.loader import get_template
+from reservation.services import minio_service
+
+EMAIL_TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'templates', 'reservation', 'emails')
+
+
+class Command(BaseCommand):
+    help = 'Initialise the storage client (bucket check), the database connection and the email templates ahead of traffic.'
+
+    def handle(self, *args, **options):
+        timings = {}
+
+        started = time.perf_counter()
+        minio_service.warmup()
+        timings['storage'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        connection.ensure_connection()
+        timings['database'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        names = sorted(os.listdir(EMAIL_TEMPLATE_DIR))
+        for name in names:
+            get_template(f'reservation/emails/{name}')
+        timings['email_templates'] = time.perf_counter() - started
+
+        self.stdout.write(json.dumps({
+            'seconds': {name: round(seconds, 4) for name, seconds in timings.items()},
+            'email_templates': len(names),
+        }, indent=2))
@@ -0,0 +1,211 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'petcare_http_requests_total': ('counter', 'Requests by URL name, method and status.', None),
+    'petcare_http_request_duration_seconds': ('histogram', 'Request latency by URL name.', LATENCY_BUCKETS),
+    'petcare_http_request_queries': ('histogram', 'DB queries run per request by URL name.', QUERY_BUCKETS),
+    'petcare_db_queries_total': ('counter', 'DB queries run by requests, by URL name.', None),
+    'petcare_db_query_seconds_total': ('counter', 'Time spent in DB queries by requests, by URL name.', None),
+    'petcare_minio_call_duration_seconds': ('histogram', 'MinIO call latency by operation.', LATENCY_BUCKETS),
+    'petcare_minio_errors_total': ('counter', 'Failed MinIO calls by operation.', None),
+    'petcare_email_send_duration_seconds': ('histogram', 'SMTP send latency by result.', LATENCY_BUCKETS),
+    'petcare_email_queue_rejected_total': ('counter', 'Email pool tasks dropped because the queue was full.', None),
+    'petcare_email_queue_depth': ('gauge', 'Tasks waiting in the email worker pools of live processes.', None),
+    'petcare_outbox_messages': ('gauge', 'Outbox messages by status.', None),
+    'petcare_scheduler_job_duration_seconds': ('histogram', 'Scheduler job run time by job.', JOB_BUCKETS),
+    'petcare_scheduler_job_failures_total': ('counter', 'Scheduler job runs that raised, by job.', None),
+}
+
+
+def _labels(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+class Registry:
+    # Counters and histograms of this process, guarded by one lock. With
+    # METRICS_DIR set every process writes its snapshot to its own file
+    # (at most every METRICS_FLUSH_SECONDS, and at exit) and a scrape merges
+    # the files of all processes sharing the directory.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.maybe_flush()
+
+    def observe(self, name, value, labels=None):
+        buckets = METRICS[name][2]
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # per-bucket counts (the last one is +Inf), sum, count
+                histogram = self.histograms[key] = [[0] * (len(buckets) + 1), 0.0, 0]
+            histogram[0][bisect_left(buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+        self.maybe_flush()
+
+    def snapshot(self):
+        from .mailer import email_pool
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, labels, list(counts), total, count]
+                    for (name, labels), (counts, total, count) in self.histograms.items()
+                ],
+                'gauges': [['petcare_email_queue_depth', [], email_pool.stats()['queue_depth']]],
+            }
+
+    def path(self, pid=None):
+        directory = getattr(settings, 'METRICS_DIR', '')
+        return os.path.join(directory, f'metrics-{pid or os.getpid()}.json') if directory else None
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= getattr(settings, 'METRICS_FLUSH_SECONDS', 5):
+            self.flush()
+
+    def flush(self):
+        path = self.path()
+        if path is None or not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_flush = time.monotonic()
+            temp_path = f'{path}.tmp'
+            with open(temp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing metrics snapshot: {e}")
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        # This process's snapshot plus the files of every other process.
+        # Counters and histograms of exited processes still count; their
+        # gauges do not.
+        snapshots = [self.snapshot()]
+        directory = getattr(settings, 'METRICS_DIR', '')
+        if directory:
+            self.flush()
+            for file_name in os.listdir(directory):
+                if not (file_name.startswith('metrics-') and file_name.endswith('.json')):
+                    continue
+                try:
+                    with open(os.path.join(directory, file_name)) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if snapshot['pid'] == os.getpid():
+                    continue
+                if not _alive(snapshot['pid']):
+                    snapshot['gauges'] = []
+                snapshots.append(snapshot)
+        return merge(snapshots)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge(snapshots):
+    counters, histograms, gauges = {}, {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+        for name, labels, value in snapshot['gauges']:
+            key = (name, tuple(map(tuple, labels)))
+            gauges[key] = gauges.get(key, 0) + value
+    return counters, histograms, gauges
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') + '"'
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(counters, histograms, gauges):
+    # Prometheus text exposition format (version 0.0.4).
+    samples = {}
+    for (name, labels), value in sorted({**counters, **gauges}.items(), key=repr):
+        samples.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    for (name, labels), (counts, total, count) in sorted(histograms.items(), key=repr):
+        lines = samples.setdefault(name, [])
+        cumulative = 0
+        for bound, bucket_count in zip(list(METRICS[name][2]) + ['+Inf'], counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+        lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    output = []
+    for name, (kind, help_text, _) in METRICS.items():
+        if name in samples:
+            output += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}'] + samples[name]
+    return '\n'.join(output) + '\n'
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def record_request(url_name, method, status_code, seconds, queries, db_seconds):
+    labels = {'url_name': url_name}
+    registry.inc('petcare_http_requests_total', {**labels, 'method': method, 'status': status_code})
+    registry.observe('petcare_http_request_duration_seconds', seconds, labels)
+    registry.observe('petcare_http_request_queries', queries, labels)
+    registry.inc('petcare_db_queries_total', labels, queries)
+    registry.inc('petcare_db_query_seconds_total', labels, db_seconds)
+
+
+def timed_job(name, func, *args):
+    # Runs one scheduler job and records how long it took and whether it raised.
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    except Exception:
+        registry.inc('petcare_scheduler_job_failures_total', {'job': name})
+        raise
+    finally:
+        registry.observe('petcare_scheduler_job_duration_seconds', time.perf_counter() - started, {'job': name})
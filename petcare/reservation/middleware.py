@@ -0,0 +1,57 @@
+import json
+import time
+from django.conf import settings
+from django.db import connection
+from .metrics import record_request
+from .services import UserService
+from .timing import RequestTimings, collect
+
+
+class UserServiceMiddleware:
+    # Attaches one UserService per request.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_service = UserService(request.session)
+        return self.get_response(request)
+
+
+class RequestTimingMiddleware:
+    # Reports what the request cost: X-Query-Count, a Server-Timing header
+    # (db, minio, render, app, total) and, when enabled, one JSON log line;
+    # latency and query counts also go to /api/metrics. Requests running
+    # more than SLOW_REQUEST_QUERY_THRESHOLD queries also log their SQL.
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = getattr(settings, 'SLOW_REQUEST_QUERY_THRESHOLD', 0)
+        timings = RequestTimings(keep_sql=threshold > 0)
+        start = time.perf_counter()
+        with collect(timings), connection.execute_wrapper(timings):
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        request.query_count = timings.queries
+        request.timings = timings
+        response['X-Query-Count'] = str(timings.queries)
+        response['Server-Timing'] = timings.server_timing(total)
+        match = request.resolver_match
+        record_request(
+            match.url_name if match and match.url_name else 'unmatched', request.method,
+            response.status_code, total, timings.queries, timings.durations.get('db', 0.0),
+        )
+        if getattr(settings, 'REQUEST_TIMING_LOG', False):
+            print(json.dumps({
+                'event': 'request',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': timings.queries,
+                **{f'{name}_ms': round(ms, 1) for name, ms in timings.milliseconds(total).items()},
+            }))
+        if threshold and timings.queries > threshold:
+            print(f"{request.method} {request.path} ran {timings.queries} queries (threshold {threshold}):")
+            for elapsed, sql in timings.sql:
+                print(f"  [{elapsed * 1000:.1f} ms] {sql}")
+        return response
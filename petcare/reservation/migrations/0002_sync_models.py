@@ -0,0 +1,76 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Service',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='treatment',
+            name='title',
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='chronic_conditions',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='gender',
+            field=models.CharField(choices=[('Male', 'Male'), ('Female', 'Female')], default='Male', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='marks',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='pet',
+            name='neutered_status',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='treatment',
+            name='vaccine',
+            field=models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='treatments', to='reservation.vaccine'),
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='purpose',
+            field=models.TextField(),
+        ),
+        migrations.AlterModelTable(
+            name='user',
+            table=None,
+        ),
+        migrations.AddField(
+            model_name='treatment',
+            name='service',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='treatments', to='reservation.service'),
+        ),
+    ]
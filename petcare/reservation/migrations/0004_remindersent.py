@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0003_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderSent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('appointment_date', models.DateTimeField()),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders_sent', to='reservation.appointment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('appointment', 'appointment_date'), name='unique_reminder_per_date')],
+            },
+        ),
+    ]
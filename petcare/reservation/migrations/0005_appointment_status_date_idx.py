@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0004_remindersent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'date'], name='appointment_status_date_idx'),
+        ),
+    ]
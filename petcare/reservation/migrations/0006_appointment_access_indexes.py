@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0005_appointment_status_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='status_rank',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(status='booked', then=models.Value(1)), models.When(status='confirmed', then=models.Value(2)), models.When(status='completed', then=models.Value(3)), models.When(status='cancelled', then=models.Value(4)), models.When(status='rejected', then=models.Value(5)), default=models.Value(6)), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status_rank', 'date'], name='appointment_rank_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['assigned_vet', 'status_rank', 'date'], name='appointment_vet_rank_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['user', 'status_rank', 'date'], name='appointment_user_rank_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['pet', '-date'], name='appointment_pet_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccinated',
+            index=models.Index(fields=['-date'], name='vaccinated_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccinated',
+            index=models.Index(fields=['pet', '-date'], name='vaccinated_pet_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccinated',
+            index=models.Index(fields=['vaccine', '-date'], name='vaccinated_vaccine_date_idx'),
+        ),
+    ]
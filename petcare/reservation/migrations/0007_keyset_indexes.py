@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0006_appointment_access_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appointment_rank_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appointment_vet_rank_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='appointment',
+            name='appointment_user_rank_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vaccinated',
+            name='vaccinated_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vaccinated',
+            name='vaccinated_pet_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vaccinated',
+            name='vaccinated_vaccine_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status_rank', 'date', 'id'], name='appointment_rank_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['assigned_vet', 'status_rank', 'date', 'id'], name='appointment_vet_rank_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['user', 'status_rank', 'date', 'id'], name='appointment_user_rank_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccinated',
+            index=models.Index(fields=['-date', 'id'], name='vaccinated_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccinated',
+            index=models.Index(fields=['pet', '-date', 'id'], name='vaccinated_pet_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vaccinated',
+            index=models.Index(fields=['vaccine', '-date', 'id'], name='vaccinated_vaccine_date_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:27
+
+from django.db import migrations, models
+
+
+# Prefix search runs UPPER(col::text) LIKE UPPER('abc%') (istartswith) and
+# col::text LIKE 'abc%' (startswith). With a non-C collation Postgres can only
+# serve those from text_pattern_ops indexes on the same expressions; other
+# databases just skip them.
+SEARCH_INDEXES = [
+    ('user_full_name_prefix_idx', '(UPPER("full_name"::text)) text_pattern_ops'),
+    ('user_email_prefix_idx', '(UPPER("email"::text)) text_pattern_ops'),
+    ('user_phone_prefix_idx', '("phone_number"::text) text_pattern_ops'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, expression in SEARCH_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "reservation_user" ({expression})')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-active', 'role', 'full_name', 'id'], name='user_list_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'active', 'full_name', 'id'], name='user_role_list_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:39
+
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_slots(apps, schema_editor):
+    # Frozen copy of the slot rules as they were when VetSlot was added, so
+    # later changes to reservation.slots do not change this migration. One
+    # slot row per active appointment with a vet; of appointments that
+    # collide, the oldest keeps the slot.
+    Appointment = apps.get_model('reservation', 'Appointment')
+    VetSlot = apps.get_model('reservation', 'VetSlot')
+    zone = ZoneInfo(getattr(settings, 'CLINIC_TIME_ZONE', 'Asia/Bangkok'))
+    minutes = getattr(settings, 'CLINIC_SLOT_MINUTES', 30)
+    opening = getattr(settings, 'CLINIC_OPENING_HOUR', 9) * 60
+    closing = getattr(settings, 'CLINIC_CLOSING_HOUR', 17) * 60
+    working_days = getattr(settings, 'CLINIC_WORKING_DAYS', [0, 1, 2, 3, 4, 5])
+    grid = range(opening, closing - minutes + 1, minutes)
+
+    def slot_start(when):
+        local = when.astimezone(zone)
+        minute = local.hour * 60 + local.minute
+        if local.weekday() not in working_days or not grid or not grid[0] <= minute < grid[-1] + minutes:
+            return None
+        start = grid[0] + (minute - grid[0]) // minutes * minutes
+        return local.replace(hour=start // 60, minute=start % 60, second=0, microsecond=0)
+
+    VetSlot.objects.all().delete()
+    appointments = Appointment.objects.filter(
+        assigned_vet__isnull=False, status__in=['booked', 'confirmed', 'completed'],
+    ).order_by('id').values_list('id', 'assigned_vet_id', 'date')
+    rows, taken = [], set()
+    for appointment_id, vet_id, date in appointments.iterator(chunk_size=1000):
+        start = slot_start(date)
+        if start is None or (vet_id, start) in taken:
+            continue
+        taken.add((vet_id, start))
+        rows.append(VetSlot(appointment_id=appointment_id, vet_id=vet_id, start=start))
+    VetSlot.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0009_schedulerlease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VetSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('appointment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='slot', to='reservation.appointment')),
+                ('vet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='reservation.user')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vet', 'start'), name='unique_vet_slot')],
+            },
+        ),
+        migrations.RunPython(backfill_slots, migrations.RunPython.noop),
+    ]
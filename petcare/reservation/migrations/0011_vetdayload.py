@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-16 23:42
+
+from collections import Counter
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_loads(apps, schema_editor):
+    # Frozen copy of the counting rule as it was when VetDayLoad was added:
+    # one per slot row, on the slot's clinic day.
+    VetSlot = apps.get_model('reservation', 'VetSlot')
+    VetDayLoad = apps.get_model('reservation', 'VetDayLoad')
+    zone = ZoneInfo(getattr(settings, 'CLINIC_TIME_ZONE', 'Asia/Bangkok'))
+    VetDayLoad.objects.all().delete()
+    counts = Counter(
+        (vet_id, start.astimezone(zone).date())
+        for vet_id, start in VetSlot.objects.values_list('vet_id', 'start').iterator(chunk_size=1000)
+    )
+    VetDayLoad.objects.bulk_create(
+        [VetDayLoad(vet_id=vet_id, day=day, appointments=count) for (vet_id, day), count in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservation', '0010_vetslot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VetDayLoad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('appointments', models.PositiveIntegerField(default=0)),
+                ('vet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_loads', to='reservation.user')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vet', 'day'), name='unique_vet_day_load')],
+            },
+        ),
+        migrations.RunPython(backfill_loads, migrations.RunPython.noop),
+    ]
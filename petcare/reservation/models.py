@@ -31,6 +31,20 @@ class User(models.Model):
             return minio_service.get_image_url(self.image_key)
         return None
 
+    class Meta:
+        indexes = [
+            # UserView (all users) and UserViewByRole (active users of a role),
+            # in the keyset order they are paginated on. Prefix-search indexes
+            # are Postgres-specific and created in migration 0008.
+            models.Index(fields=['-active', 'role', 'full_name', 'id'], name='user_list_idx'),
+            models.Index(fields=['role', 'active', 'full_name', 'id'], name='user_role_list_idx'),
+        ]
+
+    def get_image_thumb_url(self):
+        if self.image_key:
+            return minio_service.get_variant_url(self.image_key, 'thumb')
+        return None
+
     def __str__(self):
         return self.full_name
 
@@ -65,6 +79,11 @@ class Pet(models.Model):
             return minio_service.get_image_url(self.image_key)
         return None
 
+    def get_image_thumb_url(self):
+        if self.image_key:
+            return minio_service.get_variant_url(self.image_key, 'thumb')
+        return None
+
     def __str__(self):
         return f"{self.name} ({self.user.full_name})"
 
@@ -75,6 +94,14 @@ class Vaccinated(models.Model):
     remarks = models.TextField(blank=True, null=True)
     date = models.DateField()
 
+    class Meta:
+        indexes = [
+            # VaccinatedView: newest first, optionally narrowed by pet or vaccine.
+            models.Index(fields=['-date', 'id'], name='vaccinated_date_idx'),
+            models.Index(fields=['pet', '-date', 'id'], name='vaccinated_pet_date_idx'),
+            models.Index(fields=['vaccine', '-date', 'id'], name='vaccinated_vaccine_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.pet.name} - {self.vaccine.name} on {self.date}"
 
@@ -87,6 +114,8 @@ class Appointment(models.Model):
         REJECTED = 'rejected'
         CANCELLED = 'cancelled'
 
+    STATUS_ORDER = ['booked', 'confirmed', 'completed', 'cancelled', 'rejected']
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='appointments')
     pet = models.ForeignKey(Pet, on_delete=models.CASCADE, related_name='appointments')
     purpose = models.TextField()
@@ -107,6 +136,31 @@ class Appointment(models.Model):
     vet_note = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    # Position of the status in appointment lists (booked first), stored by
+    # the database so the lists can be read straight off an index. Being
+    # generated, it also stays right after queryset.update(status=...).
+    status_rank = models.GeneratedField(
+        expression=models.Case(
+            *[models.When(status=value, then=models.Value(rank)) for rank, value in enumerate(STATUS_ORDER, start=1)],
+            default=models.Value(len(STATUS_ORDER) + 1),
+        ),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # Serves status filters with a [start, end) range on date, e.g.
+            # the reminder job and day lookups (see services.day_range).
+            models.Index(fields=['status', 'date'], name='appointment_status_date_idx'),
+            # AppointmentView: staff, vet and client lists by status rank, date
+            # and id, the keyset the list is paginated on.
+            models.Index(fields=['status_rank', 'date', 'id'], name='appointment_rank_date_idx'),
+            models.Index(fields=['assigned_vet', 'status_rank', 'date', 'id'], name='appointment_vet_rank_date_idx'),
+            models.Index(fields=['user', 'status_rank', 'date', 'id'], name='appointment_user_rank_date_idx'),
+            # PetDetailView: a pet's appointments, newest first.
+            models.Index(fields=['pet', '-date'], name='appointment_pet_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.pet.name} - {self.purpose} on {self.date.strftime('%Y-%m-%d %H:%M')}"
@@ -122,4 +176,116 @@ class Treatment(models.Model):
     description = models.TextField()
 
     def __str__(self):
-        return f"{self.service} for {self.appointment.pet.name}"
\ No newline at end of file
+        return f"{self.service} for {self.appointment.pet.name}"
+
+
+class OutboxMessage(models.Model):
+    class OutboxStatus(models.TextChoices):
+        PENDING = 'pending'
+        SENDING = 'sending'
+        SENT = 'sent'
+        FAILED = 'failed'
+
+    subject = models.TextField()
+    body = models.TextField()
+    html_body = models.TextField(blank=True, null=True)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(
+        max_length=10,
+        choices=OutboxStatus.choices,
+        default=OutboxStatus.PENDING,
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    # When the row may next be claimed: the retry time for pending rows and
+    # the lease expiry for rows a sender is currently working on.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+
+class ReminderSent(models.Model):
+    # One row per reminder that made it into the outbox. The appointment
+    # date is part of the key so a rescheduled appointment gets reminded
+    # again, while reruns of the same job never send twice.
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminders_sent')
+    appointment_date = models.DateTimeField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['appointment', 'appointment_date'], name='unique_reminder_per_date'),
+        ]
+
+    def __str__(self):
+        return f"Reminder for appointment {self.appointment_id} ({self.appointment_date})"
+
+
+class SchedulerLease(models.Model):
+    # Leader election for the background scheduler: whoever holds the
+    # unexpired lease runs the jobs and renews it on every heartbeat; when
+    # it stops renewing, another process takes over after expires_at.
+    name = models.CharField(max_length=100, unique=True)
+    holder = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+    renewed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.holder} until {self.expires_at}"
+
+
+class VetSlot(models.Model):
+    # One row per occupied slot of a vet's working grid (see slots.py). The
+    # unique (vet, start) pair keeps two appointments out of the same slot
+    # and is the index availability queries scan.
+    vet = models.ForeignKey(User, on_delete=models.CASCADE, related_name='slots')
+    start = models.DateTimeField()
+    appointment = models.OneToOneField(Appointment, on_delete=models.CASCADE, related_name='slot')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vet', 'start'], name='unique_vet_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.vet_id} busy at {self.start} (appointment {self.appointment_id})"
+
+
+class VetDayLoad(models.Model):
+    # How many appointments hold a slot of the vet on a clinic day, moved
+    # in step with VetSlot by sync_slot(). Auto-assignment reads these
+    # counters instead of counting appointments.
+    vet = models.ForeignKey(User, on_delete=models.CASCADE, related_name='day_loads')
+    day = models.DateField()
+    appointments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vet', 'day'], name='unique_vet_day_load'),
+        ]
+
+    def __str__(self):
+        return f"{self.vet_id} on {self.day}: {self.appointments}"
+
+
+class ImportCheckpoint(models.Model):
+    # Progress of a resumable import (see onboarding.py). Saved in the
+    # transaction that commits each chunk, so a rerun under the same name
+    # continues after the last committed row.
+    name = models.CharField(max_length=255, unique=True)
+    rows_done = models.PositiveIntegerField(default=0)
+    counts = models.JSONField(default=dict)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.rows_done} rows{' (finished)' if self.finished else ''}"
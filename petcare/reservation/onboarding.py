@@ -0,0 +1,291 @@
+import mimetypes
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from .services import clinic_today, minio_service
+
+# Columns of a CSV row or keys of a JSONL object, one row per pet. An
+# owner's details come from the first row with their email; a row without
+# pet_name only creates the owner. Image columns are paths under the
+# import's image root.
+OWNER_FIELDS = ['owner_email', 'owner_full_name', 'owner_phone_number', 'owner_password', 'owner_image']
+PET_FIELDS = [
+    'pet_name', 'pet_gender', 'pet_breed', 'pet_color', 'pet_birth_date', 'pet_allergic', 'pet_marks',
+    'pet_chronic_conditions', 'pet_neutered_status', 'pet_image',
+]
+COLUMNS = set(OWNER_FIELDS + PET_FIELDS)
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+COUNTS = ['owners_created', 'pets_created', 'images_uploaded', 'failed']
+
+
+class OnboardingError(Exception):
+    # Stops the import. Chunks already committed stay, and a rerun with the
+    # same checkpoint continues after them.
+    pass
+
+
+def _text(record, key):
+    value = record.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def _upload(path, key):
+    content_type = mimetypes.guess_type(path)[0] or 'image/jpeg'
+    with open(path, 'rb') as f:
+        return minio_service.upload_image(f, key, content_type)
+
+
+class OnboardingImport:
+    # Creates client accounts and their pets from a stream of rows, a chunk
+    # per transaction. For each chunk, passwords are hashed in a process
+    # pool and images uploaded from a thread pool before one bulk_create
+    # per table. With a checkpoint name, the number of rows done is saved
+    # in the same transaction as the rows, so a failed import resumes where
+    # it stopped. Owners that already exist (by email) get the new pets.
+    def __init__(self, checkpoint=None, image_root=None, chunk_size=None, hash_workers=None, upload_workers=None,
+                 restart=False):
+        self.checkpoint = checkpoint
+        self.image_root = os.path.realpath(image_root) if image_root else None
+        self.chunk_size = chunk_size or getattr(settings, 'ONBOARDING_CHUNK_SIZE', 500)
+        hash_workers = getattr(settings, 'ONBOARDING_HASH_WORKERS', 0) if hash_workers is None else hash_workers
+        self.hash_workers = hash_workers or os.cpu_count() or 1
+        self.upload_workers = upload_workers or getattr(settings, 'ONBOARDING_UPLOAD_WORKERS', 8)
+        self.restart = restart
+        self.today = clinic_today()
+        self.rows = self.resumed_from = self.committed = 0
+        self.finished = False
+        self.counts = dict.fromkeys(COUNTS, 0)
+        self._hashers = self._uploaders = None
+
+    def summary(self):
+        return {
+            'rows': self.rows, 'committed': self.committed, 'resumed_from': self.resumed_from, 'finished': self.finished,
+            **self.counts,
+        }
+
+    def run(self, records):
+        # Yields {"row": n, "errors": {field: [message]}} for each rejected
+        # row; rows count from 1 in input order, including resumed ones.
+        skip = self._start()
+        chunk = []
+        try:
+            for record in records:
+                self.rows += 1
+                if self.rows <= skip:
+                    continue
+                chunk.append((self.rows, record))
+                if len(chunk) >= self.chunk_size:
+                    yield from self._load(chunk)
+                    chunk = []
+            if chunk:
+                yield from self._load(chunk)
+            self.finished = True
+            self._save_checkpoint(self.rows)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._hashers:
+            self._hashers.shutdown(cancel_futures=True)
+        if self._uploaders:
+            self._uploaders.shutdown(cancel_futures=True)
+        self._hashers = self._uploaders = None
+
+    def _start(self):
+        from .models import ImportCheckpoint
+        if not self.checkpoint:
+            return 0
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(name=self.checkpoint)
+        if self.restart:
+            checkpoint.rows_done, checkpoint.counts, checkpoint.finished = 0, {}, False
+            checkpoint.save()
+        self.resumed_from = self.committed = checkpoint.rows_done
+        self.counts.update({key: checkpoint.counts.get(key, 0) for key in COUNTS})
+        return checkpoint.rows_done
+
+    def _save_checkpoint(self, rows_done, expected=None):
+        # Joins the chunk's transaction. The row lock and the rows_done
+        # check stop two imports under one name from interleaving.
+        from .models import ImportCheckpoint
+        if not self.checkpoint:
+            return
+        with transaction.atomic():
+            checkpoint = ImportCheckpoint.objects.select_for_update().get(name=self.checkpoint)
+            if expected is not None and checkpoint.rows_done != expected:
+                raise OnboardingError(
+                    f'Checkpoint {self.checkpoint!r} moved to row {checkpoint.rows_done}; '
+                    'is another import running under this name?'
+                )
+            checkpoint.rows_done = rows_done
+            checkpoint.counts = self.counts
+            checkpoint.finished = self.finished
+            checkpoint.save()
+
+    def _image(self, record, key, errors):
+        value = _text(record, key)
+        if not value:
+            return None
+        if not self.image_root:
+            errors[key] = ['Images need an image root for the import.']
+            return None
+        path = os.path.realpath(os.path.join(self.image_root, value))
+        if not path.startswith(self.image_root + os.sep) or not os.path.isfile(path):
+            errors[key] = [f'No image at {value!r}.']
+            return None
+        return path
+
+    def _parse(self, record):
+        # ({owner}, {pet} or None, errors) for one row.
+        if not isinstance(record, dict):
+            return None, None, {'non_field_errors': ['Each row must be an object with owner and pet columns.']}
+        errors = {}
+        unknown = sorted(str(key) for key in record if key not in COLUMNS and _text(record, key))
+        if unknown:
+            # Most likely a misspelt header; the value would be dropped.
+            errors['non_field_errors'] = [f"Unknown columns: {', '.join(unknown)}."]
+        owner = {
+            'email': _text(record, 'owner_email'),
+            'full_name': _text(record, 'owner_full_name'),
+            'phone_number': _text(record, 'owner_phone_number') or None,
+            'password': _text(record, 'owner_password') or None,
+            'image': self._image(record, 'owner_image', errors),
+        }
+        try:
+            validate_email(owner['email'])
+        except ValidationError:
+            errors['owner_email'] = ['Enter a valid email address.']
+        if len(owner['full_name']) > 255:
+            errors['owner_full_name'] = ['At most 255 characters.']
+        if owner['phone_number'] and len(owner['phone_number']) > 20:
+            errors['owner_phone_number'] = ['At most 20 characters.']
+
+        pet = None
+        if _text(record, 'pet_name'):
+            pet = {
+                'name': _text(record, 'pet_name'),
+                'gender': _text(record, 'pet_gender').capitalize() or 'Male',
+                'breed': _text(record, 'pet_breed'),
+                'color': _text(record, 'pet_color'),
+                'allergic': _text(record, 'pet_allergic') or None,
+                'marks': _text(record, 'pet_marks') or None,
+                'chronic_conditions': _text(record, 'pet_chronic_conditions') or None,
+                'neutered_status': _text(record, 'pet_neutered_status').lower() in TRUE_VALUES,
+                'image': self._image(record, 'pet_image', errors),
+            }
+            for field, limit in (('name', 100), ('breed', 100), ('color', 50)):
+                if not pet[field]:
+                    errors[f'pet_{field}'] = ['This field is required.']
+                elif len(pet[field]) > limit:
+                    errors[f'pet_{field}'] = [f'At most {limit} characters.']
+            if pet['gender'] not in ('Male', 'Female'):
+                errors['pet_gender'] = ['Must be Male or Female.']
+            try:
+                pet['birth_date'] = date.fromisoformat(_text(record, 'pet_birth_date'))
+                if pet['birth_date'] > self.today:
+                    errors['pet_birth_date'] = ['Birth date cannot be in the future.']
+            except ValueError:
+                errors['pet_birth_date'] = ['Date must be YYYY-MM-DD.']
+        return owner, pet, errors
+
+    def _hash(self, passwords):
+        # Spawned, not forked: the parent runs threads (scheduler, email
+        # pool) and the workers only need Django's password hashers.
+        if not passwords:
+            return []
+        if self._hashers is None:
+            self._hashers = ProcessPoolExecutor(self.hash_workers, mp_context=multiprocessing.get_context('spawn'))
+        chunksize = max(1, len(passwords) // (self.hash_workers * 4))
+        return list(self._hashers.map(make_password, passwords, chunksize=chunksize))
+
+    def _upload(self, images):
+        # [(path, key)] -> uploaded concurrently; any failure stops the import
+        # before the chunk is written.
+        if not images:
+            return
+        if self._uploaders is None:
+            self._uploaders = ThreadPoolExecutor(self.upload_workers, thread_name_prefix='onboarding-upload')
+        futures = [(path, self._uploaders.submit(_upload, path, key)) for path, key in images]
+        failed = [path for path, future in futures if not future.result()]
+        if failed:
+            raise OnboardingError(f'Could not upload {len(failed)} image(s), e.g. {failed[0]}; rerun to resume.')
+        self.counts['images_uploaded'] += len(images)
+
+    def _load(self, chunk):
+        from .models import User
+        parsed = [(row, *self._parse(record)) for row, record in chunk]
+        emails = {owner['email'] for _, owner, _, errors in parsed if not errors}
+        existing = {
+            email: (user_id, role)
+            for email, user_id, role in User.objects.filter(email__in=emails).values_list('email', 'id', 'role')
+        }
+
+        # Every owner and pet gets its own object key, even when rows share an
+        # image file, so deleting or replacing one image leaves the others.
+        new_owners, pets, images = {}, [], []
+        for row, owner, pet, errors in parsed:
+            if not errors:
+                known = existing.get(owner['email'])
+                if known and known[1] != 'client':
+                    errors['owner_email'] = [f'{owner["email"]} belongs to a {known[1]} account.']
+                elif not known and owner['email'] not in new_owners and not owner['full_name']:
+                    errors['owner_full_name'] = ['This field is required for a new owner.']
+            if errors:
+                self.counts['failed'] += 1
+                yield {'row': row, 'errors': errors}
+                continue
+            if not existing.get(owner['email']) and owner['email'] not in new_owners:
+                new_owners[owner['email']] = owner
+                if owner['image']:
+                    owner['image_key'] = f"{uuid.uuid4()}{os.path.splitext(owner['image'])[1] or '.jpg'}"
+                    images.append((owner['image'], owner['image_key']))
+            if pet:
+                pet['owner'] = owner['email']
+                if pet['image']:
+                    pet['image_key'] = f"pets/{uuid.uuid4()}{os.path.splitext(pet['image'])[1] or '.jpg'}"
+                    images.append((pet['image'], pet['image_key']))
+                pets.append(pet)
+
+        with_password = [owner for owner in new_owners.values() if owner['password']]
+        for owner, hashed in zip(with_password, self._hash([owner['password'] for owner in with_password])):
+            owner['hashed'] = hashed
+        self._upload(images)
+
+        try:
+            self._write(chunk, new_owners, existing, pets)
+        except IntegrityError as e:
+            # An email was registered by someone else since the lookup.
+            raise OnboardingError(f'Rows {chunk[0][0]}-{chunk[-1][0]} could not be saved ({e}); rerun to resume.')
+        self.committed = chunk[-1][0]
+
+    def _write(self, chunk, new_owners, existing, pets):
+        from .models import Pet, User
+        with transaction.atomic():
+            User.objects.bulk_create([
+                User(
+                    email=email, full_name=owner['full_name'], phone_number=owner['phone_number'], role='client',
+                    # No password given: unusable until staff set one.
+                    password=owner.get('hashed') or make_password(None), image_key=owner.get('image_key'),
+                )
+                for email, owner in new_owners.items()
+            ], batch_size=self.chunk_size)
+            owner_ids = {email: user_id for email, (user_id, _) in existing.items()}
+            owner_ids.update(User.objects.filter(email__in=list(new_owners)).values_list('email', 'id'))
+            Pet.objects.bulk_create([
+                Pet(
+                    user_id=owner_ids[pet['owner']], name=pet['name'], gender=pet['gender'], breed=pet['breed'],
+                    color=pet['color'], allergic=pet['allergic'], marks=pet['marks'],
+                    chronic_conditions=pet['chronic_conditions'], neutered_status=pet['neutered_status'],
+                    birth_date=pet['birth_date'], image_key=pet.get('image_key'),
+                )
+                for pet in pets
+            ], batch_size=self.chunk_size)
+            self.counts['owners_created'] += len(new_owners)
+            self.counts['pets_created'] += len(pets)
+            self._save_checkpoint(chunk[-1][0], expected=chunk[0][0] - 1)
@@ -0,0 +1,196 @@
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.html import escape
+from .mailer import build_email, email_pool, send_each
+
+RECIPIENT_NAME = '__RECIPIENT_NAME__'
+
+_collector = threading.local()
+_drain_lock = threading.Lock()
+_drain_scheduled = False
+
+
+def queue_mail(subject, message, recipient_list, html_message=None, from_email=None):
+    # Store the message in the outbox instead of sending it. Inside
+    # collect_outbox() the row is only built and the caller inserts the batch.
+    from .models import OutboxMessage
+    outbox_message = OutboxMessage(
+        subject=subject,
+        body=message,
+        html_body=html_message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+    messages = getattr(_collector, 'messages', None)
+    if messages is not None:
+        messages.append(outbox_message)
+    else:
+        outbox_message.save()
+        transaction.on_commit(schedule_drain)
+    return outbox_message
+
+
+def queue_fan_out(subject, message, recipients, html_message=None, from_email=None):
+    # One rendered message for many recipients: RECIPIENT_NAME in the bodies
+    # is swapped for each (email, name) pair and every copy is inserted in
+    # one statement (or handed to the active collect_outbox()). The HTML body
+    # was rendered before the swap, so the name is escaped for it here.
+    from .models import OutboxMessage
+    from_email = from_email or settings.DEFAULT_FROM_EMAIL
+    rows = [
+        OutboxMessage(
+            subject=subject,
+            body=message.replace(RECIPIENT_NAME, name),
+            html_body=html_message.replace(RECIPIENT_NAME, escape(name)) if html_message else None,
+            from_email=from_email,
+            recipients=[email],
+        )
+        for email, name in recipients
+    ]
+    messages = getattr(_collector, 'messages', None)
+    if messages is not None:
+        messages.extend(rows)
+    elif rows:
+        OutboxMessage.objects.bulk_create(rows)
+        transaction.on_commit(schedule_drain)
+    return rows
+
+
+@contextmanager
+def collect_outbox():
+    previous = getattr(_collector, 'messages', None)
+    _collector.messages = []
+    try:
+        yield _collector.messages
+    finally:
+        _collector.messages = previous
+
+
+def queue_email(email_function, *args):
+    # Render the notifications of `email_function` now and write them to the
+    # outbox in the caller's transaction; sending starts after commit.
+    return queue_emails([(email_function, *args)])
+
+
+def queue_emails(calls):
+    # queue_email() for many (email_function, *args) calls, inserted with
+    # one bulk_create.
+    from .models import OutboxMessage
+    with collect_outbox() as messages:
+        for email_function, *args in calls:
+            email_function(*args)
+    if messages:
+        OutboxMessage.objects.bulk_create(messages)
+        transaction.on_commit(schedule_drain)
+    return len(messages)
+
+
+def schedule_drain():
+    # Coalesce: one drain queued on the email pool covers every commit
+    # that happens before it starts.
+    global _drain_scheduled
+    with _drain_lock:
+        if _drain_scheduled:
+            return
+        _drain_scheduled = True
+    if not email_pool.submit(_scheduled_drain):
+        with _drain_lock:
+            _drain_scheduled = False
+
+
+def _scheduled_drain():
+    global _drain_scheduled
+    with _drain_lock:
+        _drain_scheduled = False
+    drain_outbox()
+
+
+def drain_concurrently(workers):
+    # Start several drains on the email pool. claim_batch() hands each of
+    # them different rows with SKIP LOCKED; without it (SQLite) fall back to
+    # the single coalesced drain.
+    if not connection.features.has_select_for_update_skip_locked:
+        schedule_drain()
+        return 1
+    return sum(1 for _ in range(max(workers, 1)) if email_pool.submit(drain_outbox))
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 30)
+    cap = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+
+def claim_batch(batch_size):
+    # Lock due rows with SKIP LOCKED so concurrent senders never pick the
+    # same message, then lease them by moving next_attempt_at forward. A
+    # sender that dies mid-batch leaves rows that become due again.
+    from .models import OutboxMessage
+    now = timezone.now()
+    lease = timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        queryset = OutboxMessage.objects.filter(
+            status__in=[OutboxMessage.OutboxStatus.PENDING, OutboxMessage.OutboxStatus.SENDING],
+            next_attempt_at__lte=now,
+        ).order_by('next_attempt_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        batch = list(queryset[:batch_size])
+        if batch:
+            OutboxMessage.objects.filter(id__in=[message.id for message in batch]).update(
+                status=OutboxMessage.OutboxStatus.SENDING,
+                next_attempt_at=now + lease,
+                attempts=F('attempts') + 1,
+            )
+            for message in batch:
+                message.attempts += 1
+    return batch
+
+
+def send_batch(batch):
+    from .models import OutboxMessage
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+    result = {'sent': 0, 'retried': 0, 'failed': 0}
+    emails = [
+        build_email(
+            message.subject, message.body, message.recipients,
+            html_message=message.html_body, from_email=message.from_email,
+        )
+        for message in batch
+    ]
+    for message, error in zip(batch, send_each(emails)):
+        if error is None:
+            message.status = OutboxMessage.OutboxStatus.SENT
+            message.sent_at = timezone.now()
+            message.last_error = None
+            result['sent'] += 1
+        elif message.attempts >= max_attempts:
+            message.status = OutboxMessage.OutboxStatus.FAILED
+            message.last_error = str(error)
+            result['failed'] += 1
+            print(f"Giving up on outbox message {message.id} to {', '.join(message.recipients)} after {message.attempts} attempts: {str(error)}")
+        else:
+            message.status = OutboxMessage.OutboxStatus.PENDING
+            message.last_error = str(error)
+            message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+            result['retried'] += 1
+    OutboxMessage.objects.bulk_update(batch, ['status', 'next_attempt_at', 'last_error', 'sent_at'])
+    return result
+
+
+def drain_outbox(batch_size=None, max_batches=None):
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+    totals = {'sent': 0, 'retried': 0, 'failed': 0, 'batches': 0}
+    while max_batches is None or totals['batches'] < max_batches:
+        batch = claim_batch(batch_size)
+        if not batch:
+            break
+        totals['batches'] += 1
+        for key, value in send_batch(batch).items():
+            totals[key] += value
+    return totals
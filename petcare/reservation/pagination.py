@@ -0,0 +1,89 @@
+import base64
+import json
+from django.conf import settings
+from django.db.models import BooleanField, Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_dump(value) for value in values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, count):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    # Sort keys are never null and never containers; anything else was not
+    # made by encode_cursor(). keyset_page() checks each key against its field.
+    if not isinstance(values, list) or len(values) != count or not all(
+        isinstance(value, (str, int, float)) for value in values
+    ):
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def get_page_size(request):
+    default = getattr(settings, 'API_PAGE_SIZE', 50)
+    try:
+        page_size = int(request.GET.get('page_size', default))
+    except ValueError:
+        raise InvalidCursor('page_size must be an integer')
+    return max(1, min(page_size, getattr(settings, 'API_MAX_PAGE_SIZE', 200)))
+
+
+def _after(fields, values):
+    # Rows that sort after `values`: (a > x) or (a = x and b > y) or ...,
+    # with < for descending keys.
+    condition = Q()
+    for i, (name, descending) in enumerate(fields):
+        step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[i]})
+        for j, (prev_name, _) in enumerate(fields[:i]):
+            step &= Q(**{prev_name: values[j]})
+        condition |= step
+    # The redundant bound on the first key lets the database start the
+    # index scan at the cursor instead of filtering from the beginning.
+    name, descending = fields[0]
+    return Q(**{f"{name}__{'lte' if descending else 'gte'}": values[0]}) & condition
+
+
+def _to_key(field, value):
+    # JSON true/false only ever come from a BooleanField key.
+    if isinstance(value, bool) != isinstance(field, BooleanField):
+        raise InvalidCursor('Invalid cursor')
+    return field.to_python(value)
+
+
+def keyset_page(queryset, ordering, request):
+    # One page of `queryset` in `ordering` (which must end in a unique key)
+    # plus an opaque cursor for the next page, or None on the last one. The
+    # cursor holds the sort keys of the last row, so every page is an index
+    # seek and costs the same however far the client has scrolled.
+    page_size = get_page_size(request)
+    fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+    queryset = queryset.order_by(*ordering)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, len(fields))
+        try:
+            values = [
+                _to_key(queryset.model._meta.get_field(name), value)
+                for (name, _), value in zip(fields, values)
+            ]
+            queryset = queryset.filter(_after(fields, values))
+        except Exception:
+            raise InvalidCursor('Invalid cursor')
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([getattr(rows[-1], name) for name, _ in fields])
+    return rows, next_cursor
@@ -0,0 +1,87 @@
+import time
+from functools import partial
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from .outbox import collect_outbox, drain_concurrently, queue_email, schedule_drain
+from .services import clinic_today, day_range
+
+REMINDER_DAYS_AHEAD = 3
+
+
+def due_reminders(target_date):
+    from .models import Appointment, ReminderSent
+    start, end = day_range(target_date)
+    already_sent = ReminderSent.objects.filter(appointment=OuterRef('pk'), appointment_date=OuterRef('date'))
+    return (
+        Appointment.objects.filter(status='confirmed', date__gte=start, date__lt=end)
+        .exclude(Exists(already_sent))
+        .select_related('user', 'pet', 'assigned_vet')
+        .order_by('id')
+    )
+
+
+def _queue_chunk(chunk, stats):
+    # Render the chunk, then write its outbox rows and ReminderSent rows in
+    # one transaction: either both land or neither does.
+    from .models import OutboxMessage, ReminderSent
+    from .services import email_service
+    records = []
+    with collect_outbox() as messages:
+        for appointment in chunk:
+            if email_service.send_appointment_reminder(appointment):
+                records.append(ReminderSent(appointment=appointment, appointment_date=appointment.date))
+            else:
+                stats['failed'] += 1
+    try:
+        with transaction.atomic():
+            ReminderSent.objects.bulk_create(records)
+            OutboxMessage.objects.bulk_create(messages)
+            transaction.on_commit(schedule_drain)
+        stats['queued'] += len(records)
+    except IntegrityError:
+        # Another run reminded some of these in the meantime; fall back to
+        # one savepoint per appointment and skip the ones already recorded.
+        for record in records:
+            try:
+                with transaction.atomic():
+                    ReminderSent.objects.create(appointment=record.appointment, appointment_date=record.appointment_date)
+                    queue_email(email_service.send_appointment_reminder, record.appointment)
+                stats['queued'] += 1
+            except IntegrityError:
+                stats['skipped'] += 1
+
+
+def send_reminders(target_date=None, chunk_size=None, concurrency=None):
+    # Streams due appointments in chunks, queues one reminder each and
+    # returns what happened. Sending runs on the email pool, `concurrency`
+    # drains side by side once everything is queued.
+    started = time.perf_counter()
+    target_date = target_date or clinic_today() + timedelta(days=REMINDER_DAYS_AHEAD)
+    chunk_size = chunk_size or getattr(settings, 'REMINDER_CHUNK_SIZE', 200)
+    concurrency = concurrency or getattr(settings, 'REMINDER_SEND_CONCURRENCY', 2)
+    stats = {
+        'target_date': target_date.isoformat(),
+        'found': 0,
+        'queued': 0,
+        'skipped': 0,
+        'failed': 0,
+        'chunks': 0,
+        'concurrency': concurrency,
+    }
+    chunk = []
+    for appointment in due_reminders(target_date).iterator(chunk_size=chunk_size):
+        stats['found'] += 1
+        chunk.append(appointment)
+        if len(chunk) >= chunk_size:
+            _queue_chunk(chunk, stats)
+            stats['chunks'] += 1
+            chunk = []
+    if chunk:
+        _queue_chunk(chunk, stats)
+        stats['chunks'] += 1
+    if stats['queued']:
+        transaction.on_commit(partial(drain_concurrently, concurrency))
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    return stats
@@ -0,0 +1,9 @@
+from rest_framework import renderers
+from .timing import track
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    # Reports the time spent encoding responses as "render" in Server-Timing.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with track('render'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -1,58 +1,180 @@
 # scheduler.py
+import atexit
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from datetime import timedelta
 from apscheduler.schedulers.background import BackgroundScheduler
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import DateTimeField, ExpressionWrapper, Q
+from django.db.models.functions import Now
 from django.utils import timezone
-from datetime import timedelta
-from .models import Appointment
-from .services import email_service
+from .metrics import timed_job
+from .outbox import drain_outbox
+from .reminders import send_reminders
+
+LEASE_NAME = 'scheduler'
 
 def send_appointment_reminders():
     try:
-        target_date = timezone.now().date() + timedelta(days=3)
-        appointments = Appointment.objects.filter(
-            status='confirmed',
-            date__date=target_date
-        ).select_related('user', 'pet', 'assigned_vet')
-        
-        sent_count = 0
-        error_count = 0
-
-        print(f"[{timezone.now()}] Starting appointment reminder job...")
-        print(f"Looking for confirmed appointments on {target_date}")
-
-        if not appointments.exists():
-            print(f"No confirmed appointments found for {target_date}")
-            return
-
-        print(f"Found {appointments.count()} confirmed appointments")
-        for appointment in appointments:
+        stats = send_reminders()
+        print(f"[{timezone.now()}] Reminder job: {stats}")
+        return stats
+    except Exception as e:
+        print(f"Error in reminder job: {str(e)}")
+
+# id: (function, trigger arguments, description)
+JOBS = {
+    'send_appointment_reminders': (send_appointment_reminders, {'trigger': 'cron', 'hour': 9, 'minute': 0}, 'daily at 9:00 AM'),
+    'drain_outbox': (drain_outbox, {'trigger': 'interval', 'minutes': 1}, 'every minute'),
+}
+
+
+class LeaderElection:
+    # Every process running a scheduler competes for one SchedulerLease row.
+    # heartbeat() takes the lease when it is free or expired and renews it
+    # while held; expiry is computed with the database clock so nodes with
+    # skewed clocks agree. A leader that cannot renew stops counting itself
+    # leader before its lease runs out, so two nodes never both run jobs.
+    def __init__(self, name=LEASE_NAME, lease_seconds=None):
+        self.name = name
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.lease = timedelta(seconds=lease_seconds or getattr(settings, 'SCHEDULER_LEASE_SECONDS', 60))
+        self._leader_until = 0.0
+        self._lock = threading.Lock()
+
+    def heartbeat(self):
+        from .models import SchedulerLease
+        started = time.monotonic()
+        expires_at = ExpressionWrapper(Now() + self.lease, output_field=DateTimeField())
+        try:
+            held = SchedulerLease.objects.filter(
+                Q(holder=self.holder) | Q(expires_at__lt=Now()), name=self.name,
+            ).update(holder=self.holder, expires_at=expires_at, renewed_at=Now()) == 1
+            if not held and not SchedulerLease.objects.filter(name=self.name).exists():
+                try:
+                    with transaction.atomic():
+                        SchedulerLease.objects.create(
+                            name=self.name, holder=self.holder, expires_at=expires_at, renewed_at=Now(),
+                        )
+                    held = True
+                except IntegrityError:
+                    held = False
+        except Exception as e:
+            print(f"Scheduler lease heartbeat failed: {str(e)}")
+            held = False
+        finally:
+            close_old_connections()
+        with self._lock:
+            # Measured from before the UPDATE: the lease is at least this fresh.
+            self._leader_until = started + self.lease.total_seconds() * 0.9 if held else 0.0
+        return held
+
+    def is_leader(self):
+        with self._lock:
+            return time.monotonic() < self._leader_until
+
+    def release(self):
+        from .models import SchedulerLease
+        with self._lock:
+            was_leader = self._leader_until > 0
+            self._leader_until = 0.0
+        if was_leader:
             try:
-                email_service.send_appointment_reminder(appointment)
-                sent_count += 1
-                print(f"✅ Sent reminder to {appointment.user.email} for appointment {appointment.id} ({appointment.pet.name})")
+                SchedulerLease.objects.filter(name=self.name, holder=self.holder).update(expires_at=Now())
             except Exception as e:
-                error_count += 1
-                print(f"❌ Failed to send reminder for appointment {appointment.id}: {str(e)}")
+                print(f"Could not release scheduler lease: {str(e)}")
 
-        print(f"Reminder job completed: {sent_count} sent, {error_count} failed")
 
-    except Exception as e:
-        print(f"Error in reminder job: {str(e)}")
+election = LeaderElection()
+_scheduler = None
+_leading = False
+
+def run_if_leader(job_id):
+    # Checked again at run time: leadership may have moved since the
+    # job was resumed.
+    if not election.is_leader():
+        print(f"Skipping job '{job_id}': this process is not the scheduler leader")
+        return None
+    return timed_job(job_id, JOBS[job_id][0])
+
+def heartbeat(scheduler):
+    # Resume the jobs when this process becomes leader and pause them when
+    # it stops being one.
+    global _leading
+    leading = election.heartbeat()
+    if leading == _leading:
+        return
+    _leading = leading
+    for job_id in JOBS:
+        if leading:
+            scheduler.resume_job(job_id)
+        else:
+            scheduler.pause_job(job_id)
+    print(f"Scheduler {'acquired' if leading else 'lost'} leadership ({election.holder})")
+
+def should_autostart(argv=None):
+    # Only web processes start the scheduler: WSGI/ASGI workers, and
+    # runserver (the reloaded child, or the only process with --noreload).
+    # Every other manage.py command leaves it alone; run_scheduler starts
+    # one explicitly.
+    if not getattr(settings, 'SCHEDULER_AUTOSTART', True):
+        return False
+    argv = sys.argv if argv is None else argv
+    program = os.path.basename(argv[0]) if argv else ''
+    if program in ('manage.py', 'django-admin', '__main__.py'):
+        command = argv[1] if len(argv) > 1 else ''
+        return command == 'runserver' and (os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv)
+    return True
 
 def start():
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
     scheduler = BackgroundScheduler()
+    for job_id, (func, trigger, description) in JOBS.items():
+        # Added paused; heartbeat() resumes them on the leader only.
+        scheduler.add_job(
+            run_if_leader,
+            args=[job_id],
+            id=job_id,
+            max_instances=1,
+            replace_existing=True,
+            next_run_time=None,
+            **trigger,
+        )
+        print(f"✅ Added job '{job_id}' to run {description}")
     scheduler.add_job(
-        send_appointment_reminders,
-        trigger='cron',
-        hour=9,
-        minute=0,
-        id='send_appointment_reminders',
+        heartbeat,
+        args=[scheduler],
+        trigger='interval',
+        seconds=getattr(settings, 'SCHEDULER_HEARTBEAT_SECONDS', 15),
+        id='scheduler_heartbeat',
         max_instances=1,
         replace_existing=True,
+        next_run_time=timezone.now(),
     )
-    print("✅ Added job 'send_appointment_reminders' to run daily at 9:00 AM")
 
     try:
         print("Starting scheduler...")
         scheduler.start()
     except Exception as e:
         print(f"Error starting scheduler: {e}")
+        return None
+    _scheduler = scheduler
+    atexit.register(stop)
+    return scheduler
+
+def stop():
+    global _scheduler, _leading
+    if _scheduler is None:
+        return
+    _scheduler.shutdown(wait=False)
+    _scheduler = None
+    _leading = False
+    # Let the next leader take over now instead of after the lease expires.
+    election.release()
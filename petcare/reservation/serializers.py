@@ -2,6 +2,8 @@ from rest_framework import serializers
 from django.db import transaction
 from .models import *
 from .services import minio_service, get_user_service
+from .assignment import auto_assign
+from .slots import SlotUnavailable, slot_start, sync_slot
 import uuid
 import os
 from datetime import timedelta
@@ -12,15 +14,19 @@ class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     image = serializers.ImageField(required=False, write_only=True)
     image_url = serializers.SerializerMethodField()
+    image_thumb_url = serializers.SerializerMethodField()
     active = serializers.BooleanField(default=True, required=False)
 
     class Meta:
         model = User
-        fields = ['id', 'email', 'password', 'full_name', 'phone_number', 'role', 'image', 'image_url', 'active', 'created_at']
+        fields = ['id', 'email', 'password', 'full_name', 'phone_number', 'role', 'image', 'image_url', 'image_thumb_url', 'active', 'created_at']
 
     def get_image_url(self, obj):
         return obj.get_image_url()
 
+    def get_image_thumb_url(self, obj):
+        return obj.get_image_thumb_url()
+
     def create(self, validated_data):
         password = validated_data.pop('password')
         image_file = validated_data.pop('image', None)
@@ -57,6 +63,18 @@ class UserSerializer(serializers.ModelSerializer):
                 'image_deleted': bool(image_key)
             }
 
+class UserSummarySerializer(serializers.ModelSerializer):
+    # Owner and vet nested in a detail view: contact details and the
+    # thumbnail only, so one URL is signed per user instead of two.
+    image_thumb_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = User
+        fields = ['id', 'email', 'full_name', 'phone_number', 'role', 'image_thumb_url']
+
+    def get_image_thumb_url(self, obj):
+        return obj.get_image_thumb_url()
+
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
@@ -82,27 +100,35 @@ class LoginSerializer(serializers.Serializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_thumb_url = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'email', 'full_name', 'phone_number', 'role', 'active', 'created_at', 'image_url']
+        fields = ['id', 'email', 'full_name', 'phone_number', 'role', 'active', 'created_at', 'image_url', 'image_thumb_url']
 
     def get_image_url(self, obj):
         return obj.get_image_url()
 
+    def get_image_thumb_url(self, obj):
+        return obj.get_image_thumb_url()
+
 class UserUpdateSerializer(serializers.ModelSerializer):
     current_password = serializers.CharField(write_only=True, required=False)
     password = serializers.CharField(write_only=True, required=False)
     image = serializers.ImageField(required=False, write_only=True)
     image_url = serializers.SerializerMethodField()
+    image_thumb_url = serializers.SerializerMethodField()
 
     class Meta:
         model = User
-        fields = ['id', 'email', 'password', 'current_password', 'full_name', 'phone_number', 'role', 'active', 'image', 'image_url']
+        fields = ['id', 'email', 'password', 'current_password', 'full_name', 'phone_number', 'role', 'active', 'image', 'image_url', 'image_thumb_url']
 
     def get_image_url(self, obj):
         return obj.get_image_url()
 
+    def get_image_thumb_url(self, obj):
+        return obj.get_image_thumb_url()
+
     def validate(self, data):
         user = self.instance
         request = self.context.get('request')
@@ -153,6 +179,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
 class PetSerializer(serializers.ModelSerializer):
     image = serializers.ImageField(required=False, write_only=True)
     image_url = serializers.SerializerMethodField()
+    image_thumb_url = serializers.SerializerMethodField()
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     age = serializers.SerializerMethodField()
     owner_id = serializers.IntegerField(write_only=True, required=False)
@@ -162,7 +189,7 @@ class PetSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'name', 'gender', 'breed', 'color', 
             'allergic', 'marks', 'chronic_conditions', 'neutered_status', 
-            'birth_date', 'image', 'image_url', 'age', 'owner_id'
+            'birth_date', 'image', 'image_url', 'image_thumb_url', 'age', 'owner_id'
         ]
     
     def validate_birth_date(self, value):
@@ -174,6 +201,9 @@ class PetSerializer(serializers.ModelSerializer):
     def get_image_url(self, obj):
         return obj.get_image_url()
 
+    def get_image_thumb_url(self, obj):
+        return obj.get_image_thumb_url()
+
     def get_age(self, obj):
         from datetime import date
         today = date.today()
@@ -232,17 +262,21 @@ class PetSerializer(serializers.ModelSerializer):
 
 class PetListSerializer(serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    image_thumb_url = serializers.SerializerMethodField()
     age = serializers.SerializerMethodField()
     owner_id = serializers.IntegerField(source='user.id', read_only=True)
     owner_name = serializers.CharField(source='user.full_name', read_only=True)
 
     class Meta:
         model = Pet
-        fields = ['id', 'name', 'breed', 'gender', 'age', 'image_url', 'owner_name', 'owner_id']
+        fields = ['id', 'name', 'breed', 'gender', 'age', 'image_url', 'image_thumb_url', 'owner_name', 'owner_id']
 
     def get_image_url(self, obj):
         return obj.get_image_url()
 
+    def get_image_thumb_url(self, obj):
+        return obj.get_image_thumb_url()
+
     def get_age(self, obj):
         from datetime import date
         today = date.today()
@@ -331,6 +365,8 @@ class BookAppointmentSerializer(serializers.ModelSerializer):
         now = timezone.localtime(timezone.now()) 
         if appointment_time < now:
             raise serializers.ValidationError("Appointment date cannot be in the past.")
+        if slot_start(value) is None:
+            raise serializers.ValidationError("Appointment time is outside clinic hours.")
         return value
     def validate_assigned_vet(self, value):
         request = self.context.get('request', None)
@@ -378,7 +414,12 @@ class BookAppointmentSerializer(serializers.ModelSerializer):
                     raise serializers.ValidationError({'assigned_vet': 'Staff must assign a veterinarian (assigned_vet).'})
                 validated_data['status'] = 'confirmed'
 
-        appointment = Appointment.objects.create(**validated_data)
+        try:
+            with transaction.atomic():
+                appointment = Appointment.objects.create(**validated_data)
+                sync_slot(appointment)
+        except SlotUnavailable as e:
+            raise serializers.ValidationError({'date': [str(e)]})
         return appointment
 
     def update(self, instance, validated_data):
@@ -404,13 +445,18 @@ class BookAppointmentSerializer(serializers.ModelSerializer):
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        try:
+            with transaction.atomic():
+                instance.save()
+                sync_slot(instance)
+        except SlotUnavailable as e:
+            raise serializers.ValidationError({'date': [str(e)]})
         return instance
 
 class AppointmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Appointment
-        fields = '__all__'
+        exclude = ['status_rank']
 
 class AppointmentListSerializer(serializers.ModelSerializer):
     pet_name = serializers.CharField(source='pet.name', read_only=True)
@@ -418,6 +464,7 @@ class AppointmentListSerializer(serializers.ModelSerializer):
     owner_email = serializers.CharField(source='user.email', read_only=True)
     assigned_vet = serializers.CharField(source='assigned_vet.full_name', read_only=True)
     pet_image_url = serializers.CharField(source='pet.get_image_url', read_only=True)
+    pet_image_thumb_url = serializers.CharField(source='pet.get_image_thumb_url', read_only=True)
     pet_breed = serializers.CharField(source='pet.breed', read_only=True)
     pet_gender = serializers.CharField(source='pet.gender', read_only=True)
     pet_age = serializers.SerializerMethodField()
@@ -431,13 +478,27 @@ class AppointmentListSerializer(serializers.ModelSerializer):
         return None
     class Meta:
         model = Appointment
-        fields = ['id', 'date', 'pet_name', 'owner_name', 'status', 'purpose', 'owner_email', 'assigned_vet', 'pet_image_url', 'pet_breed', 'pet_gender', 'pet_age']
+        fields = ['id', 'date', 'pet_name', 'owner_name', 'status', 'purpose', 'owner_email', 'assigned_vet', 'pet_image_url', 'pet_image_thumb_url', 'pet_breed', 'pet_gender', 'pet_age']
+
+
+def check_staff_status(status, vet):
+    # Staff rules for a status change, shared with the bulk endpoint.
+    if status == 'confirmed' and not vet:
+        raise serializers.ValidationError('Cannot confirm without assigning a vet.')
+    if status != 'confirmed' and vet:
+        raise serializers.ValidationError('Can only assign a vet when status is "confirmed".')
+    if vet and vet.role != 'vet':
+        raise serializers.ValidationError('Assigned user is not a veterinarian.')
 
 
 class UpdateStatusSerializer(serializers.ModelSerializer):
+    # Staff may confirm with auto_assign instead of an assigned_vet: the
+    # least-loaded free vet is picked (see assignment.py).
+    auto_assign = serializers.BooleanField(write_only=True, required=False)
+
     class Meta:
         model = Appointment
-        fields = ['id', 'status', 'assigned_vet']
+        fields = ['id', 'status', 'assigned_vet', 'auto_assign']
     def validate(self, data):
         user_service = self.context.get('user_service')
         appointment = self.instance
@@ -446,23 +507,36 @@ class UpdateStatusSerializer(serializers.ModelSerializer):
             if appointment.user != user_service.get_user():
                 raise serializers.ValidationError('Permission denied.')
 
-            if data.get('assigned_vet'):
+            if data.get('assigned_vet') or data.get('auto_assign'):
                 raise serializers.ValidationError('Clients cannot assign a vet.')
 
             if data.get('status') != 'cancelled':
                 raise serializers.ValidationError('Clients can only update status to "cancelled".')
 
         elif user_service.is_staff():
-            if data.get('status') == 'confirmed' and not data.get('assigned_vet'):
-                raise serializers.ValidationError('Cannot confirm without assigning a vet.')
-            if data.get('status') != 'confirmed' and data.get('assigned_vet'):
-                raise serializers.ValidationError('Can only assign a vet when status is "confirmed".')
-            if data.get('assigned_vet') and data.get('assigned_vet').role != 'vet':
-                raise serializers.ValidationError('Assigned user is not a veterinarian.')
+            if data.get('auto_assign'):
+                if data.get('status') != 'confirmed' or data.get('assigned_vet'):
+                    raise serializers.ValidationError('auto_assign confirms the appointment and picks the vet itself.')
+                if appointment.status != 'booked':
+                    raise serializers.ValidationError('Only booked appointments can be auto-assigned.')
+                return data
+            check_staff_status(data.get('status'), data.get('assigned_vet'))
         else:
             raise serializers.ValidationError('Permission denied.')
 
         return data
+
+    def update(self, instance, validated_data):
+        try:
+            if validated_data.pop('auto_assign', False):
+                auto_assign(instance)
+                return instance
+            with transaction.atomic():
+                instance = super().update(instance, validated_data)
+                sync_slot(instance)
+        except SlotUnavailable as e:
+            raise serializers.ValidationError({'assigned_vet': [str(e)]})
+        return instance
     
 
 class TreatmentSerializer(serializers.ModelSerializer):
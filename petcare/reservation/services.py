@@ -1,94 +1,344 @@
-from minio import Minio
 from minio.error import S3Error
 from django.conf import settings
-from django.core.mail import send_mail
-from datetime import timedelta
+from django.template.loader import get_template
+from django.utils import timezone
+from .mailer import email_pool
+from .outbox import RECIPIENT_NAME, queue_email, queue_fan_out, queue_mail
+from . import metrics
+from .storage import create_storage_client
+from .timing import track
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+from zoneinfo import ZoneInfo
 import io
+import os
 import threading
+import time
 
 def send_email_async(email_function, *args):
-    threading.Thread(
-        target=email_function,
-        args=args,
-        daemon=True
-    ).start()
+    return email_pool.submit(email_function, *args)
+
+CLINIC_TIME_ZONE = ZoneInfo(getattr(settings, 'CLINIC_TIME_ZONE', 'Asia/Bangkok'))
+
+def clinic_today():
+    return timezone.localdate(timezone=CLINIC_TIME_ZONE)
+
+def day_range(day):
+    # [start, end) of a calendar day at the clinic as aware datetimes. Filter
+    # with date__gte=start, date__lt=end rather than date__date=day, which
+    # casts the column and keeps the database off the index on date.
+    start = datetime.combine(day, dt_time.min, tzinfo=CLINIC_TIME_ZONE)
+    end = datetime.combine(day + timedelta(days=1), dt_time.min, tzinfo=CLINIC_TIME_ZONE)
+    return start, end
+
+UPLOAD_PART_SIZE = 10 * 1024 * 1024
+
+IMAGE_VARIANT_SIZES = {
+    'medium': 1024,
+    'thumb': 256,
+}
+IMAGE_VARIANT_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+IMAGE_VARIANT_EXTENSION = {'WEBP': 'webp', 'JPEG': 'jpg'}[IMAGE_VARIANT_FORMAT]
+IMAGE_VARIANT_CONTENT_TYPE = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}[IMAGE_VARIANT_FORMAT]
+
+def variant_key(file_name, variant):
+    root, _ = os.path.splitext(file_name)
+    return f"{root}_{variant}.{IMAGE_VARIANT_EXTENSION}"
+
+def render_image_variants(file_obj):
+    # Decode once (at reduced scale for JPEGs), fix EXIF orientation, then
+    # shrink largest-first so each variant is resized from the previous one.
+    file_obj.seek(0)
+    image = Image.open(file_obj)
+    largest = max(IMAGE_VARIANT_SIZES.values())
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if IMAGE_VARIANT_FORMAT == 'WEBP' and has_alpha:
+        image = image.convert('RGBA')
+    else:
+        image = image.convert('RGB')
+
+    variants = {}
+    for variant, size in sorted(IMAGE_VARIANT_SIZES.items(), key=lambda item: -item[1]):
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, IMAGE_VARIANT_FORMAT, quality=82, optimize=True)
+        buffer.seek(0)
+        variants[variant] = buffer
+    return variants
+
+def get_stream_length(file_obj):
+    size = getattr(file_obj, 'size', None)
+    if size is not None:
+        return size - file_obj.tell()
+    try:
+        position = file_obj.tell()
+        file_obj.seek(0, io.SEEK_END)
+        size = file_obj.tell() - position
+        file_obj.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return -1
+
+class PresignedUrlCache:
+    # Bounded LRU of presigned URLs keyed by object key. An entry is only
+    # served while it stays valid for at least `min_valid` more, so callers
+    # always get a URL with that much life left and stale ones are evicted
+    # well before the signature expires.
+    def __init__(self, max_size=1024, min_valid=timedelta(days=1)):
+        self.max_size = max_size
+        self.min_valid = min_valid.total_seconds()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, file_name, expires_days):
+        key = (file_name, expires_days)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                url, expires_at = entry
+                if expires_at - time.time() >= self.min_valid:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return url
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+            return None
+
+    def set(self, file_name, expires_days, url):
+        if self.max_size <= 0:
+            return
+        key = (file_name, expires_days)
+        with self._lock:
+            self._entries[key] = (url, time.time() + expires_days * 86400)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def purge(self, file_name):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == file_name]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+@contextmanager
+def minio_call(operation):
+    # Times one MinIO client call for Server-Timing and /api/metrics, and
+    # counts it as an error when it raises.
+    started = time.perf_counter()
+    try:
+        with track('minio'):
+            yield
+    except Exception:
+        metrics.registry.inc('petcare_minio_errors_total', {'operation': operation})
+        raise
+    finally:
+        metrics.registry.observe('petcare_minio_call_duration_seconds', time.perf_counter() - started, {'operation': operation})
+
 
 class MinIOService:
+    # The client is built and the bucket checked on first use, once per
+    # process, so importing the models never waits on MinIO. `warmup`
+    # (or GET /api/health/) does it ahead of traffic.
     def __init__(self):
-        self.client = Minio(
-            settings.MINIO_ENDPOINT,
-            access_key=settings.MINIO_ACCESS_KEY,
-            secret_key=settings.MINIO_SECRET_KEY,
-            secure=settings.MINIO_SECURE
-        )
         self.bucket_name = settings.MINIO_BUCKET_NAME
-        self._ensure_bucket_exists()
-    
-    def _ensure_bucket_exists(self):
+        self.url_cache = PresignedUrlCache(
+            max_size=getattr(settings, 'MINIO_URL_CACHE_SIZE', 1024),
+            min_valid=timedelta(days=getattr(settings, 'MINIO_URL_MIN_VALID_DAYS', 1)),
+        )
+        self._client = None
+        self._ready = False
+        self._init_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if not self._ready:
+            self.warmup()
+        return self._client
+
+    def warmup(self):
+        with self._init_lock:
+            if not self._ready:
+                # minio.Minio, or an in-process stand-in (see storage.py).
+                if self._client is None:
+                    self._client = create_storage_client()
+                # An unreachable server raises here and the next use retries.
+                self._ensure_bucket_exists(self._client)
+                self._ready = True
+        return self._client
+
+    @contextmanager
+    def use_client(self, client):
+        # Run against another storage client for the duration of the block
+        # (benchmarks, tests); it is assumed to be ready.
+        with self._init_lock:
+            previous = self._client, self._ready
+            self._client, self._ready = client, True
         try:
-            if not self.client.bucket_exists(self.bucket_name):
-                self.client.make_bucket(self.bucket_name)
+            yield client
+        finally:
+            with self._init_lock:
+                self._client, self._ready = previous
+
+    def _ensure_bucket_exists(self, client):
+        try:
+            with minio_call('bucket_exists'):
+                exists = client.bucket_exists(self.bucket_name)
+            if not exists:
+                with minio_call('make_bucket'):
+                    client.make_bucket(self.bucket_name)
                 print(f"Created bucket: {self.bucket_name}")
         except S3Error as e:
             print(f"Error creating bucket: {e}")
-    
-    def upload_image(self, file_obj, file_name, content_type='image/jpeg'):
+
+    def upload_image(self, file_obj, file_name, content_type='image/jpeg', variants=True):
+        # Hand the upload (in-memory or temp file) straight to put_object.
+        # With a known length the client sends small files in one PUT and
+        # larger ones as multipart, reading one part at a time.
         try:
             file_obj.seek(0)
-            file_data = file_obj.read()
-            file_size = len(file_data)
-            file_stream = io.BytesIO(file_data)
-
-            self.client.put_object(
-                bucket_name=self.bucket_name,
-                object_name=file_name,
-                data=file_stream,
-                length=file_size,
-                content_type=content_type
-            )
+            file_size = get_stream_length(file_obj)
+
+            with minio_call('put_object'):
+                self.client.put_object(
+                    bucket_name=self.bucket_name,
+                    object_name=file_name,
+                    data=file_obj,
+                    length=file_size,
+                    content_type=content_type,
+                    part_size=UPLOAD_PART_SIZE if file_size < 0 else 0,
+                )
+            self.url_cache.purge(file_name)
+            if variants:
+                self.upload_variants(file_obj, file_name)
             
             return True
         except S3Error as e:
             print(f"Error uploading file: {e}")
             return False
 
+    def upload_variants(self, file_obj, file_name):
+        try:
+            rendered = render_image_variants(file_obj)
+        except (UnidentifiedImageError, OSError, ValueError) as e:
+            print(f"Skipping image variants for {file_name}: {e}")
+            return False
+        try:
+            for variant, buffer in rendered.items():
+                key = variant_key(file_name, variant)
+                with minio_call('put_object'):
+                    self.client.put_object(
+                        bucket_name=self.bucket_name,
+                        object_name=key,
+                        data=buffer,
+                        length=buffer.getbuffer().nbytes,
+                        content_type=IMAGE_VARIANT_CONTENT_TYPE,
+                    )
+                self.url_cache.purge(key)
+            return True
+        except S3Error as e:
+            print(f"Error uploading image variants: {e}")
+            return False
+
+    def regenerate_variants(self, file_name):
+        try:
+            with minio_call('get_object'):
+                response = self.client.get_object(self.bucket_name, file_name)
+                try:
+                    original = io.BytesIO(response.read())
+                finally:
+                    response.close()
+                    response.release_conn()
+        except S3Error as e:
+            print(f"Error reading {file_name}: {e}")
+            return False
+        return self.upload_variants(original, file_name)
+
     def get_image_url(self, file_name, expires_days=7):
+        url = self.url_cache.get(file_name, expires_days)
+        if url is not None:
+            return url
         try:
             expires = timedelta(days=expires_days)
-            url = self.client.presigned_get_object(
-                bucket_name=self.bucket_name,
-                object_name=file_name,
-                expires=expires
-            )
+            with minio_call('presigned_get_object'):
+                url = self.client.presigned_get_object(
+                    bucket_name=self.bucket_name,
+                    object_name=file_name,
+                    expires=expires
+                )
+            self.url_cache.set(file_name, expires_days, url)
             return url
         except S3Error as e:
             print(f"Error getting image URL: {e}")
             return None
+
+    def get_variant_url(self, file_name, variant, expires_days=7):
+        return self.get_image_url(variant_key(file_name, variant), expires_days)
     
     def delete_image(self, file_name):
         try:
-            self.client.remove_object(
-                bucket_name=self.bucket_name,
-                object_name=file_name
-            )
-            return True
+            with minio_call('remove_object'):
+                self.client.remove_object(
+                    bucket_name=self.bucket_name,
+                    object_name=file_name
+                )
+            self.url_cache.purge(file_name)
         except S3Error as e:
             print(f"Error deleting file: {e}")
             return False
+        for variant in IMAGE_VARIANT_SIZES:
+            key = variant_key(file_name, variant)
+            try:
+                with minio_call('remove_object'):
+                    self.client.remove_object(bucket_name=self.bucket_name, object_name=key)
+            except S3Error as e:
+                print(f"Error deleting image variant {key}: {e}")
+            self.url_cache.purge(key)
+        return True
         
+_UNSET = object()
+
 class UserService:
+    # One instance is shared by the whole request (see UserServiceMiddleware),
+    # so the session user is loaded once and every role check reuses it.
     def __init__(self, session):
         self.session = session
         self.user_id = session.get('user_id', None)
+        self._user = _UNSET
 
     def get_user(self):
         from .models import User
-        if self.user_id:
+        if not self.user_id:
+            return None
+        if self._user is _UNSET:
             try:
-                return User.objects.get(id=self.user_id)
+                self._user = User.objects.get(id=self.user_id)
             except User.DoesNotExist:
-                return None
-        return None
+                self._user = None
+        return self._user
 
     def get_role(self):
         user = self.get_user()
@@ -112,41 +362,58 @@ class UserService:
             raise PermissionError("Authentication required")
 
 def get_user_service(request):
-    return UserService(request.session)
+    user_service = getattr(request, 'user_service', None)
+    if isinstance(user_service, UserService):
+        return user_service
+    user_service = UserService(request.session)
+    request.user_service = user_service
+    return user_service
+
+def render_email(name, context):
+    # get_template() goes through the engine's cached loader, so each
+    # template is read and compiled once per process and only rendered here.
+    html_message = get_template(f'reservation/emails/{name}.html').render(context)
+    plain_message = get_template(f'reservation/emails/{name}.txt').render(context)
+    return html_message, plain_message
 
 class EmailService:
+    @staticmethod
+    def build_context(appointment, **extra):
+        # Everything the templates read, computed once per notification. The
+        # pet thumbnail is signed here instead of inside every template.
+        vet = appointment.assigned_vet
+        context = {
+            'appointment': appointment,
+            'pet': appointment.pet,
+            'user': appointment.user,
+            'appointment_date': appointment.date.strftime('%B %d, %Y at %I:%M %p'),
+            'status_display': appointment.get_status_display(),
+            'pet_image_url': appointment.pet.get_image_thumb_url(),
+            'vet_name': vet.full_name if vet else 'TBA',
+        }
+        context.update(extra)
+        return context
+
     @staticmethod
     def send_appointment_notification(appointment):
         try:
             from .models import User
-            staff_users = User.objects.filter(role='staff', active=True)
-
-            context = {
-                'appointment': appointment,
-                'pet': appointment.pet,
-                'user': appointment.user,
-                'appointment_date': appointment.date.strftime('%B %d, %Y at %I:%M %p'),
-                'status_display': appointment.get_status_display(),
-            }
+            staff_users = User.objects.filter(role='staff', active=True).only('email', 'full_name')
+
+            context = EmailService.build_context(appointment)
 
             EmailService._send_user_appointment_email(appointment.user, context)
-            for staff in staff_users:
-                EmailService._send_staff_appointment_email(staff, context)
+            EmailService._send_staff_appointment_emails(staff_users, context)
                 
         except Exception as e:
             print(f"Error in sending appointment notifications: {str(e)}")
     
     @staticmethod
-    def send_appointment_status_update(appointment, old_status=None):
+    def send_appointment_status_update(appointment, old_status=None, staff_users=None):
+        # staff_users: pass the staff list when sending many updates, so
+        # cancellations do not query it once each.
         try:
-            context = {
-                'appointment': appointment,
-                'pet': appointment.pet,
-                'user': appointment.user,
-                'appointment_date': appointment.date.strftime('%B %d, %Y at %I:%M %p'),
-                'status_display': appointment.get_status_display(),
-                'old_status': old_status,
-            }
+            context = EmailService.build_context(appointment, old_status=old_status)
 
             if appointment.status == 'confirmed' and appointment.assigned_vet:
                 EmailService._send_vet_assignment_email(appointment.assigned_vet, context)
@@ -154,10 +421,10 @@ class EmailService:
 
             elif appointment.status == 'cancelled' and old_status != 'cancelled':
                 EmailService._send_user_cancellation_email(appointment.user, context)
-                from .models import User
-                staff_users = User.objects.filter(role='staff', active=True)
-                for staff in staff_users:
-                    EmailService._send_staff_cancellation_email(staff, context)
+                if staff_users is None:
+                    from .models import User
+                    staff_users = User.objects.filter(role='staff', active=True).only('email', 'full_name')
+                EmailService._send_staff_cancellation_emails(staff_users, context)
 
             elif appointment.status == 'rejected':
                 EmailService._send_user_rejection_email(appointment.user, context)
@@ -169,79 +436,13 @@ class EmailService:
     def _send_vet_assignment_email(vet, context):
         try:
             subject = f"Appointment Assigned - {context['pet'].name} ({context['user'].full_name})"
-            
-            html_message = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #b8860b; border-bottom: 2px solid #b8860b; padding-bottom: 10px;">
-                        👨‍⚕️ Appointment Assignment
-                    </h2>
-                    
-                    <p>Dear Dr. {vet.full_name},</p>
-                    
-                    <p>You have been assigned to an appointment that has been confirmed:</p>
-                    
-                    <div style="background: #f8f6f0; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="color: #b8860b; margin-top: 0;">Appointment Details</h3>
-                        {f'<div style="text-align: center; margin-bottom: 15px;"><img src="{context["pet"].get_image_url()}" alt="{context["pet"].name}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; border: 2px solid #b8860b;"><br><small style="color: #666; font-style: italic;">{context["pet"].name}</small></div>' if context['pet'].get_image_url() else ''}
-                        <p><strong>Pet Owner:</strong> {context['user'].full_name}</p>
-                        <p><strong>Contact:</strong> {context['user'].email} {f"| {context['user'].phone_number}" if context['user'].phone_number else ""}</p>
-                        <p><strong>Pet Name:</strong> {context['pet'].name}</p>
-                        <p><strong>Pet Breed:</strong> {context['pet'].breed}</p>
-                        <p><strong>Pet Gender:</strong> {context['pet'].gender}</p>
-                        <p><strong>Date & Time:</strong> {context['appointment_date']}</p>
-                        <p><strong>Purpose:</strong> {context['appointment'].purpose}</p>
-                        <p><strong>Status:</strong> <span style="color: #28a745; font-weight: bold;">CONFIRMED</span></p>
-                        {f"<p><strong>Remarks:</strong> {context['appointment'].remarks}</p>" if context['appointment'].remarks else ""}
-                    </div>
-                    
-                    <div style="background: #d4edda; padding: 15px; border-left: 4px solid #28a745; margin: 20px 0;">
-                        <p style="margin: 0;"><strong>Next Steps:</strong></p>
-                        <p style="margin: 5px 0 0 0;">Please prepare for this appointment and update the status to "Completed" after the visit.</p>
-                    </div>
-                    
-                    <p>Thank you for your commitment to providing excellent pet care.</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>PetCare System</strong></p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            plain_message = f"""
-            Appointment Assignment
-            
-            Dear Dr. {vet.full_name},
-            
-            You have been assigned to an appointment that has been confirmed:
-            
-            Appointment Details:
-            - Pet Owner: {context['user'].full_name}
-            - Contact: {context['user'].email} {f"| {context['user'].phone_number}" if context['user'].phone_number else ""}
-            - Pet Name: {context['pet'].name}
-            - Pet Breed: {context['pet'].breed}
-            - Pet Gender: {context['pet'].gender}
-            - Date & Time: {context['appointment_date']}
-            - Purpose: {context['appointment'].purpose}
-            - Status: CONFIRMED
-            {f"- Remarks: {context['appointment'].remarks}" if context['appointment'].remarks else ""}
-            
-            Next Steps:
-            Please prepare for this appointment and update the status to "Completed" after the visit.
-            
-            Best regards,
-            PetCare System
-            """
-            
-            send_mail(
+            html_message, plain_message = render_email('vet_assignment', {**context, 'recipient_name': vet.full_name})
+
+            queue_mail(
                 subject=subject,
                 message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[vet.email],
                 html_message=html_message,
-                fail_silently=False,
             )
             
         except Exception as e:
@@ -251,83 +452,13 @@ class EmailService:
     def _send_user_confirmation_email(user, context):
         try:
             subject = f"Appointment Confirmed - {context['pet'].name}"
-            
-            html_message = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #b8860b; border-bottom: 2px solid #b8860b; padding-bottom: 10px;">
-                        ✅ Appointment Confirmed
-                    </h2>
-                    
-                    <p>Dear {user.full_name},</p>
-                    
-                    <p>Great news! Your appointment has been confirmed by our staff:</p>
-                    
-                    <div style="background: #f8f6f0; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="color: #b8860b; margin-top: 0;">Confirmed Appointment Details</h3>
-                        {f'<div style="text-align: center; margin-bottom: 15px;"><img src="{context["pet"].get_image_url()}" alt="{context["pet"].name}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; border: 2px solid #b8860b;"></div>' if context['pet'].get_image_url() else ''}
-                        <p><strong>Pet:</strong> {context['pet'].name}</p>
-                        <p><strong>Breed:</strong> {context['pet'].breed}</p>
-                        <p><strong>Date & Time:</strong> {context['appointment_date']}</p>
-                        <p><strong>Purpose:</strong> {context['appointment'].purpose}</p>
-                        <p><strong>Assigned Veterinarian:</strong> Dr. {context['appointment'].assigned_vet.full_name if context['appointment'].assigned_vet else 'TBA'}</p>
-                        <p><strong>Status:</strong> <span style="color: #28a745; font-weight: bold;">CONFIRMED</span></p>
-                        {f"<p><strong>Remarks:</strong> {context['appointment'].remarks}</p>" if context['appointment'].remarks else ""}
-                    </div>
-                    
-                    <div style="background: #d4edda; padding: 15px; border-left: 4px solid #28a745; margin: 20px 0;">
-                        <p style="margin: 0;"><strong>Important Reminders:</strong></p>
-                        <ul style="margin: 5px 0 0 20px; padding: 0;">
-                            <li>Please arrive 10 minutes early</li>
-                            <li>Bring any previous medical records</li>
-                            <li>If you need to reschedule, please contact us at least 24 hours in advance</li>
-                        </ul>
-                    </div>
-                    
-                    <p>We look forward to seeing you and {context['pet'].name}!</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>PetCare Team</strong></p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            plain_message = f"""
-            Appointment Confirmed
-            
-            Dear {user.full_name},
-            
-            Great news! Your appointment has been confirmed by our staff:
-            
-            Confirmed Appointment Details:
-            - Pet: {context['pet'].name}
-            - Breed: {context['pet'].breed}
-            - Date & Time: {context['appointment_date']}
-            - Purpose: {context['appointment'].purpose}
-            - Assigned Veterinarian: Dr. {context['appointment'].assigned_vet.full_name if context['appointment'].assigned_vet else 'TBA'}
-            - Status: CONFIRMED
-            {f"- Remarks: {context['appointment'].remarks}" if context['appointment'].remarks else ""}
-            
-            Important Reminders:
-            - Please arrive 10 minutes early
-            - Bring any previous medical records
-            - If you need to reschedule, please contact us at least 24 hours in advance
-            
-            We look forward to seeing you and {context['pet'].name}!
-            
-            Best regards,
-            PetCare Team
-            """
-            
-            send_mail(
+            html_message, plain_message = render_email('user_confirmation', {**context, 'recipient_name': user.full_name})
+
+            queue_mail(
                 subject=subject,
                 message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[user.email],
                 html_message=html_message,
-                fail_silently=False,
             )
             
         except Exception as e:
@@ -337,153 +468,29 @@ class EmailService:
     def _send_user_cancellation_email(user, context):
         try:
             subject = f"Appointment Cancelled - {context['pet'].name}"
-            
-            html_message = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #dc3545; border-bottom: 2px solid #dc3545; padding-bottom: 10px;">
-                        ❌ Appointment Cancelled
-                    </h2>
-                    
-                    <p>Dear {user.full_name},</p>
-                    
-                    <p>Your appointment has been cancelled as requested:</p>
-                    
-                    <div style="background: #f8f6f0; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="color: #dc3545; margin-top: 0;">Cancelled Appointment Details</h3>
-                        {f'<div style="text-align: center; margin-bottom: 15px;"><img src="{context["pet"].get_image_url()}" alt="{context["pet"].name}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; border: 2px solid #b8860b;"></div>' if context['pet'].get_image_url() else ''}
-                        <p><strong>Pet:</strong> {context['pet'].name}</p>
-                        <p><strong>Breed:</strong> {context['pet'].breed}</p>
-                        <p><strong>Original Date & Time:</strong> {context['appointment_date']}</p>
-                        <p><strong>Purpose:</strong> {context['appointment'].purpose}</p>
-                        <p><strong>Status:</strong> <span style="color: #dc3545; font-weight: bold;">CANCELLED</span></p>
-                    </div>
-                    
-                    <div style="background: #f8d7da; padding: 15px; border-left: 4px solid #dc3545; margin: 20px 0;">
-                        <p style="margin: 0;"><strong>Need to Reschedule?</strong></p>
-                        <p style="margin: 5px 0 0 0;">If you'd like to book a new appointment, please visit our booking system or contact us directly.</p>
-                    </div>
-                    
-                    <p>Thank you for notifying us. We hope to see you and {context['pet'].name} again soon!</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>PetCare Team</strong></p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            plain_message = f"""
-            Appointment Cancelled
-            
-            Dear {user.full_name},
-            
-            Your appointment has been cancelled as requested:
-            
-            Cancelled Appointment Details:
-            - Pet: {context['pet'].name}
-            - Breed: {context['pet'].breed}
-            - Original Date & Time: {context['appointment_date']}
-            - Purpose: {context['appointment'].purpose}
-            - Status: CANCELLED
-            
-            Need to Reschedule?
-            If you'd like to book a new appointment, please visit our booking system or contact us directly.
-            
-            Thank you for notifying us. We hope to see you and {context['pet'].name} again soon!
-            
-            Best regards,
-            PetCare Team
-            """
-            
-            send_mail(
+            html_message, plain_message = render_email('user_cancellation', {**context, 'recipient_name': user.full_name})
+
+            queue_mail(
                 subject=subject,
                 message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[user.email],
                 html_message=html_message,
-                fail_silently=False,
             )
             
         except Exception as e:
             print(f"Failed to send user cancellation email: {str(e)}")
     
     @staticmethod
-    def _send_staff_cancellation_email(staff, context):
+    def _send_staff_cancellation_emails(staff_users, context):
         try:
             subject = f"Appointment Cancelled - {context['pet'].name} ({context['user'].full_name})"
-            
-            html_message = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #dc3545; border-bottom: 2px solid #dc3545; padding-bottom: 10px;">
-                        🚫 Appointment Cancellation Alert
-                    </h2>
-                    
-                    <p>Dear {staff.full_name},</p>
-                    
-                    <p>An appointment has been cancelled by the client:</p>
-                    
-                    <div style="background: #f8f6f0; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="color: #dc3545; margin-top: 0;">Cancelled Appointment Details</h3>
-                        {f'<div style="text-align: center; margin-bottom: 15px;"><img src="{context["pet"].get_image_url()}" alt="{context["pet"].name}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; border: 2px solid #b8860b;"><br><small style="color: #666; font-style: italic;">{context["pet"].name}</small></div>' if context['pet'].get_image_url() else ''}
-                        <p><strong>Pet Owner:</strong> {context['user'].full_name}</p>
-                        <p><strong>Contact:</strong> {context['user'].email} {f"| {context['user'].phone_number}" if context['user'].phone_number else ""}</p>
-                        <p><strong>Pet Name:</strong> {context['pet'].name}</p>
-                        <p><strong>Pet Breed:</strong> {context['pet'].breed}</p>
-                        <p><strong>Original Date & Time:</strong> {context['appointment_date']}</p>
-                        <p><strong>Purpose:</strong> {context['appointment'].purpose}</p>
-                        <p><strong>Status:</strong> <span style="color: #dc3545; font-weight: bold;">CANCELLED</span></p>
-                    </div>
-                    
-                    <div style="background: #f8d7da; padding: 15px; border-left: 4px solid #dc3545; margin: 20px 0;">
-                        <p style="margin: 0;"><strong>Action Required:</strong></p>
-                        <p style="margin: 5px 0 0 0;">Please update your schedule and notify the assigned veterinarian if applicable.</p>
-                    </div>
-                    
-                    <p>This appointment slot is now available for other bookings.</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>PetCare System</strong></p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            plain_message = f"""
-            Appointment Cancellation Alert
-            
-            Dear {staff.full_name},
-            
-            An appointment has been cancelled by the client:
-            
-            Cancelled Appointment Details:
-            - Pet Owner: {context['user'].full_name}
-            - Contact: {context['user'].email} {f"| {context['user'].phone_number}" if context['user'].phone_number else ""}
-            - Pet Name: {context['pet'].name}
-            - Pet Breed: {context['pet'].breed}
-            - Original Date & Time: {context['appointment_date']}
-            - Purpose: {context['appointment'].purpose}
-            - Status: CANCELLED
-            
-            Action Required:
-            Please update your schedule and notify the assigned veterinarian if applicable.
-            
-            This appointment slot is now available for other bookings.
-            
-            Best regards,
-            PetCare System
-            """
-            
-            send_mail(
+            html_message, plain_message = render_email('staff_cancellation', {**context, 'recipient_name': RECIPIENT_NAME})
+
+            queue_fan_out(
                 subject=subject,
                 message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[staff.email],
+                recipients=[(staff.email, staff.full_name) for staff in staff_users],
                 html_message=html_message,
-                fail_silently=False,
             )
             
         except Exception as e:
@@ -493,81 +500,13 @@ class EmailService:
     def _send_user_rejection_email(user, context):
         try:
             subject = f"Appointment Request Declined - {context['pet'].name}"
-            
-            html_message = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #dc3545; border-bottom: 2px solid #dc3545; padding-bottom: 10px;">
-                        ⚠️ Appointment Request Declined
-                    </h2>
-                    
-                    <p>Dear {user.full_name},</p>
-                    
-                    <p>We regret to inform you that your appointment request has been declined:</p>
-                    
-                    <div style="background: #f8f6f0; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="color: #dc3545; margin-top: 0;">Declined Appointment Details</h3>
-                        {f'<div style="text-align: center; margin-bottom: 15px;"><img src="{context["pet"].get_image_url()}" alt="{context["pet"].name}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; border: 2px solid #b8860b;"></div>' if context['pet'].get_image_url() else ''}
-                        <p><strong>Pet:</strong> {context['pet'].name}</p>
-                        <p><strong>Breed:</strong> {context['pet'].breed}</p>
-                        <p><strong>Requested Date & Time:</strong> {context['appointment_date']}</p>
-                        <p><strong>Purpose:</strong> {context['appointment'].purpose}</p>
-                        <p><strong>Status:</strong> <span style="color: #dc3545; font-weight: bold;">DECLINED</span></p>
-                        {f"<p><strong>Staff Note:</strong> {context['appointment'].vet_note}</p>" if context['appointment'].vet_note else ""}
-                    </div>
-                    
-                    <div style="background: #fff3cd; padding: 15px; border-left: 4px solid #daa520; margin: 20px 0;">
-                        <p style="margin: 0;"><strong>Alternative Options:</strong></p>
-                        <ul style="margin: 5px 0 0 20px; padding: 0;">
-                            <li>Try booking a different date and time</li>
-                            <li>Contact us directly to discuss alternative arrangements</li>
-                            <li>Consider our emergency services if this is urgent</li>
-                        </ul>
-                    </div>
-                    
-                    <p>We apologize for any inconvenience. Please don't hesitate to contact us if you have any questions or would like to discuss other options.</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>PetCare Team</strong></p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            plain_message = f"""
-            Appointment Request Declined
-            
-            Dear {user.full_name},
-            
-            We regret to inform you that your appointment request has been declined:
-            
-            Declined Appointment Details:
-            - Pet: {context['pet'].name}
-            - Breed: {context['pet'].breed}
-            - Requested Date & Time: {context['appointment_date']}
-            - Purpose: {context['appointment'].purpose}
-            - Status: DECLINED
-            {f"- Staff Note: {context['appointment'].vet_note}" if context['appointment'].vet_note else ""}
-            
-            Alternative Options:
-            - Try booking a different date and time
-            - Contact us directly to discuss alternative arrangements
-            - Consider our emergency services if this is urgent
-            
-            We apologize for any inconvenience. Please don't hesitate to contact us if you have any questions.
-            
-            Best regards,
-            PetCare Team
-            """
-            
-            send_mail(
+            html_message, plain_message = render_email('user_rejection', {**context, 'recipient_name': user.full_name})
+
+            queue_mail(
                 subject=subject,
                 message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[user.email],
                 html_message=html_message,
-                fail_silently=False,
             )
             
         except Exception as e:
@@ -577,153 +516,29 @@ class EmailService:
     def _send_user_appointment_email(user, context):
         try:
             subject = f"Appointment Confirmation - {context['pet'].name}"
-            html_message = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #b8860b; border-bottom: 2px solid #b8860b; padding-bottom: 10px;">
-                        🐾 Appointment Confirmation
-                    </h2>
-                    
-                    <p>Dear {user.full_name},</p>
-                    
-                    <p>Your appointment has been successfully booked. Here are the details:</p>
-                    
-                    <div style="background: #f8f6f0; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="color: #b8860b; margin-top: 0;">Appointment Details</h3>
-                        {f'<div style="text-align: center; margin-bottom: 15px;"><img src="{context["pet"].get_image_url()}" alt="{context["pet"].name}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; border: 2px solid #b8860b;"></div>' if context['pet'].get_image_url() else ''}
-                        <p><strong>Pet:</strong> {context['pet'].name}</p>
-                        <p><strong>Breed:</strong> {context['pet'].breed}</p>
-                        <p><strong>Date & Time:</strong> {context['appointment_date']}</p>
-                        <p><strong>Purpose:</strong> {context['appointment'].purpose}</p>
-                        <p><strong>Status:</strong> {context['status_display']}</p>
-                        {f"<p><strong>Remarks:</strong> {context['appointment'].remarks}</p>" if context['appointment'].remarks else ""}
-                    </div>
-                    
-                    <div style="background: #fff8e1; padding: 15px; border-left: 4px solid #daa520; margin: 20px 0;">
-                        <p style="margin: 0;"><strong>What's Next?</strong></p>
-                        <p style="margin: 5px 0 0 0;">Our staff will review your appointment and confirm the details shortly. You'll receive another email once your appointment is confirmed.</p>
-                    </div>
-                    
-                    <p>If you have any questions or need to make changes, please contact us.</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>PetCare Team</strong></p>
-                </div>
-            </body>
-            </html>
-            """
-
-            plain_message = f"""
-            Appointment Confirmation
-            
-            Dear {user.full_name},
-            
-            Your appointment has been successfully booked. Here are the details:
-            
-            Appointment Details:
-            - Pet: {context['pet'].name}
-            - Breed: {context['pet'].breed}
-            - Date & Time: {context['appointment_date']}
-            - Purpose: {context['appointment'].purpose}
-            - Status: {context['status_display']}
-            {f"- Remarks: {context['appointment'].remarks}" if context['appointment'].remarks else ""}
-            
-            What's Next?
-            Our staff will review your appointment and confirm the details shortly.
-            
-            Best regards,
-            PetCare Team
-            """
-            
-            send_mail(
+            html_message, plain_message = render_email('user_appointment', {**context, 'recipient_name': user.full_name})
+
+            queue_mail(
                 subject=subject,
                 message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[user.email],
                 html_message=html_message,
-                fail_silently=False,
             )
             
         except Exception as e:
             print(f"Failed to send user email: {str(e)}")
-
+    
     @staticmethod
-    def _send_staff_appointment_email(staff, context):
+    def _send_staff_appointment_emails(staff_users, context):
         try:
             subject = f"New Appointment - {context['pet'].name} ({context['user'].full_name})"
-            html_message = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #b8860b; border-bottom: 2px solid #b8860b; padding-bottom: 10px;">
-                        🏥 New Appointment Alert
-                    </h2>
-                    
-                    <p>Dear {staff.full_name},</p>
-                    
-                    <p>A new appointment has been booked and requires your attention:</p>
-                    
-                    <div style="background: #f8f6f0; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                        <h3 style="color: #b8860b; margin-top: 0;">Appointment Details</h3>
-                        {f'<div style="text-align: center; margin-bottom: 15px;"><img src="{context["pet"].get_image_url()}" alt="{context["pet"].name}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; border: 2px solid #b8860b;"><br><small style="color: #666; font-style: italic;">{context["pet"].name}</small></div>' if context['pet'].get_image_url() else ''}
-                        <p><strong>Pet Owner:</strong> {context['user'].full_name}</p>
-                        <p><strong>Contact:</strong> {context['user'].email} {f"| {context['user'].phone_number}" if context['user'].phone_number else ""}</p>
-                        <p><strong>Pet Name:</strong> {context['pet'].name}</p>
-                        <p><strong>Pet Breed:</strong> {context['pet'].breed}</p>
-                        <p><strong>Pet Gender:</strong> {context['pet'].gender}</p>
-                        <p><strong>Date & Time:</strong> {context['appointment_date']}</p>
-                        <p><strong>Purpose:</strong> {context['appointment'].purpose}</p>
-                        <p><strong>Current Status:</strong> {context['status_display']}</p>
-                        {f"<p><strong>Remarks:</strong> {context['appointment'].remarks}</p>" if context['appointment'].remarks else ""}
-                    </div>
-                    
-                    <div style="background: #fff3cd; padding: 15px; border-left: 4px solid #daa520; margin: 20px 0;">
-                        <p style="margin: 0;"><strong>Action Required:</strong></p>
-                        <p style="margin: 5px 0 0 0;">Please review this appointment and update the status as needed through the admin panel.</p>
-                    </div>
-                    
-                    <p>You can manage this appointment through the PetCare management system.</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>PetCare System</strong></p>
-                </div>
-            </body>
-            </html>
-            """
-
-            plain_message = f"""
-            New Appointment Alert
-            
-            Dear {staff.full_name},
-            
-            A new appointment has been booked and requires your attention:
-            
-            Appointment Details:
-            - Pet Owner: {context['user'].full_name}
-            - Contact: {context['user'].email} {f"| {context['user'].phone_number}" if context['user'].phone_number else ""}
-            - Pet Name: {context['pet'].name}
-            - Pet Breed: {context['pet'].breed}
-            - Pet Gender: {context['pet'].gender}
-            - Date & Time: {context['appointment_date']}
-            - Purpose: {context['appointment'].purpose}
-            - Current Status: {context['status_display']}
-            {f"- Remarks: {context['appointment'].remarks}" if context['appointment'].remarks else ""}
-            
-            Action Required:
-            Please review this appointment and update the status as needed.
-            
-            Best regards,
-            PetCare System
-            """
-            
-            send_mail(
+            html_message, plain_message = render_email('staff_appointment', {**context, 'recipient_name': RECIPIENT_NAME})
+
+            queue_fan_out(
                 subject=subject,
                 message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[staff.email],
+                recipients=[(staff.email, staff.full_name) for staff in staff_users],
                 html_message=html_message,
-                fail_silently=False,
             )
             
         except Exception as e:
@@ -734,108 +549,24 @@ class EmailService:
         try:
             subject = f"Appointment Reminder - {appointment.pet.name} Tomorrow!"
             
-            context = {
-                'appointment': appointment,
-                'pet': appointment.pet,
-                'user': appointment.user,
-                'appointment_date': appointment.date.strftime('%B %d, %Y at %I:%M %p'),
-                'days_until': 2
-            }
-            
-            html_message = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                    <h2 style="color: #b8860b; border-bottom: 2px solid #b8860b; padding-bottom: 10px;">
-                        ⏰ Appointment Reminder
-                    </h2>
-                    
-                    <p>Dear {appointment.user.full_name},</p>
-                    
-                    <p>This is a friendly reminder that you have an upcoming appointment in <strong>2 days</strong>:</p>
-                    
-                    <div style="background: #e8f5e8; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #28a745;">
-                        <h3 style="color: #28a745; margin-top: 0;">📅 Upcoming Appointment</h3>
-                        {f'<div style="text-align: center; margin-bottom: 15px;"><img src="{appointment.pet.get_image_url()}" alt="{appointment.pet.name}" style="max-width: 150px; max-height: 150px; border-radius: 8px; object-fit: cover; border: 2px solid #b8860b;"></div>' if appointment.pet.get_image_url() else ''}
-                        <p><strong>Pet:</strong> {appointment.pet.name}</p>
-                        <p><strong>Breed:</strong> {appointment.pet.breed}</p>
-                        <p><strong>Date & Time:</strong> {context['appointment_date']}</p>
-                        <p><strong>Purpose:</strong> {appointment.purpose}</p>
-                        <p><strong>Assigned Veterinarian:</strong> Dr. {appointment.assigned_vet.full_name if appointment.assigned_vet else 'TBA'}</p>
-                        <p><strong>Status:</strong> <span style="color: #28a745; font-weight: bold;">CONFIRMED</span></p>
-                        {f"<p><strong>Remarks:</strong> {appointment.remarks}</p>" if appointment.remarks else ""}
-                    </div>
-                    
-                    <div style="background: #fff3cd; padding: 15px; border-left: 4px solid #daa520; margin: 20px 0;">
-                        <p style="margin: 0;"><strong>📋 Pre-Appointment Checklist:</strong></p>
-                        <ul style="margin: 10px 0 0 20px; padding: 0;">
-                            <li>Ensure your pet has fasted if required for the procedure</li>
-                            <li>Bring any previous medical records or test results</li>
-                            <li>Prepare a list of questions for the veterinarian</li>
-                            <li>Arrive 10-15 minutes early for check-in</li>
-                            <li>Bring your pet's favorite toy or blanket for comfort</li>
-                        </ul>
-                    </div>
-                    
-                    <div style="background: #f8f9fa; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                        <p style="margin: 0;"><strong>📞 Need to make changes?</strong></p>
-                        <p style="margin: 5px 0 0 0;">If you need to reschedule or cancel, please contact us at least 24 hours in advance to avoid cancellation fees.</p>
-                    </div>
-                    
-                    <p>We look forward to seeing you and {appointment.pet.name} soon!</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>PetCare Team</strong></p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            plain_message = f"""
-            Appointment Reminder
-            
-            Dear {appointment.user.full_name},
-            
-            This is a friendly reminder that you have an upcoming appointment in 2 days:
-            
-            Upcoming Appointment:
-            - Pet: {appointment.pet.name}
-            - Breed: {appointment.pet.breed}
-            - Date & Time: {context['appointment_date']}
-            - Purpose: {appointment.purpose}
-            - Assigned Veterinarian: Dr. {appointment.assigned_vet.full_name if appointment.assigned_vet else 'TBA'}
-            - Status: CONFIRMED
-            {f"- Remarks: {appointment.remarks}" if appointment.remarks else ""}
-            
-            Pre-Appointment Checklist:
-            - Ensure your pet has fasted if required for the procedure
-            - Bring any previous medical records or test results
-            - Prepare a list of questions for the veterinarian
-            - Arrive 10-15 minutes early for check-in
-            - Bring your pet's favorite toy or blanket for comfort
-            
-            Need to make changes?
-            If you need to reschedule or cancel, please contact us at least 24 hours in advance.
-            
-            We look forward to seeing you and {appointment.pet.name} soon!
-            
-            Best regards,
-            PetCare Team
-            """
+            context = EmailService.build_context(
+                appointment,
+                days_until=2,
+                recipient_name=appointment.user.full_name,
+            )
+            html_message, plain_message = render_email('appointment_reminder', context)
             
-            send_mail(
+            queue_mail(
                 subject=subject,
                 message=plain_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[appointment.user.email],
                 html_message=html_message,
-                fail_silently=False,
             )
-            
-            print(f"Reminder email sent for appointment {appointment.id} to {appointment.user.email}")
+            return True
             
         except Exception as e:
             print(f"Failed to send reminder email for appointment {appointment.id}: {str(e)}")
+            return False
 
 minio_service = MinIOService()
 email_service = EmailService()
\ No newline at end of file
@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+from django.conf import settings
+from collections import Counter
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .services import CLINIC_TIME_ZONE, day_range
+
+# Appointments that hold their vet's slot. Cancelled and rejected ones free it.
+ACTIVE_STATUSES = ('booked', 'confirmed', 'completed')
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def slot_minutes():
+    return getattr(settings, 'CLINIC_SLOT_MINUTES', 30)
+
+
+def working_days():
+    return getattr(settings, 'CLINIC_WORKING_DAYS', [0, 1, 2, 3, 4, 5])
+
+
+@lru_cache(maxsize=None)
+def _grid(opening_hour, closing_hour, minutes):
+    return tuple(range(opening_hour * 60, closing_hour * 60 - minutes + 1, minutes))
+
+
+def working_grid():
+    # Start of every slot in a working day, in minutes after midnight
+    # (clinic time). Computed once per configuration.
+    return _grid(
+        getattr(settings, 'CLINIC_OPENING_HOUR', 9),
+        getattr(settings, 'CLINIC_CLOSING_HOUR', 17),
+        slot_minutes(),
+    )
+
+
+def day_slots(day):
+    if day.weekday() not in working_days():
+        return []
+    midnight = datetime(day.year, day.month, day.day, tzinfo=CLINIC_TIME_ZONE)
+    return [midnight + timedelta(minutes=minute) for minute in working_grid()]
+
+
+def slot_start(when):
+    # The slot containing `when`, or None outside working hours.
+    local = when.astimezone(CLINIC_TIME_ZONE)
+    grid = working_grid()
+    minute = local.hour * 60 + local.minute
+    if local.weekday() not in working_days() or not grid or not grid[0] <= minute < grid[-1] + slot_minutes():
+        return None
+    start = grid[0] + (minute - grid[0]) // slot_minutes() * slot_minutes()
+    return local.replace(hour=start // 60, minute=start % 60, second=0, microsecond=0)
+
+
+def _wanted_slot(appointment):
+    if not appointment.assigned_vet_id or appointment.status not in ACTIVE_STATUSES:
+        return None
+    return slot_start(appointment.date)
+
+
+def clinic_day(start):
+    return start.astimezone(CLINIC_TIME_ZONE).date()
+
+
+def _add_load(vet_id, day, delta):
+    from .models import VetDayLoad
+    if delta > 0:
+        VetDayLoad.objects.get_or_create(vet_id=vet_id, day=day)
+    # F() so concurrent confirmations for the same vet and day both count.
+    VetDayLoad.objects.filter(vet_id=vet_id, day=day).update(appointments=F('appointments') + delta)
+
+
+def sync_slot(appointment):
+    sync_slots([appointment])
+    return _wanted_slot(appointment)
+
+
+def sync_slots(appointments):
+    # Point each appointment's VetSlot row at its current vet and slot, or
+    # drop it, and move it between the VetDayLoad counters to match. Called
+    # after every change to the vet, date or status; the unique (vet, start)
+    # constraint turns a concurrent double booking into SlotUnavailable for
+    # whichever transaction commits second. The number of queries does not
+    # depend on the number of appointments, only on the (vet, day) pairs
+    # whose load changes.
+    from .models import VetSlot
+    by_id = {appointment.id: appointment for appointment in appointments}
+    wanted = {appointment_id: _wanted_slot(appointment) for appointment_id, appointment in by_id.items()}
+    new = {
+        appointment_id: (by_id[appointment_id].assigned_vet_id, start)
+        for appointment_id, start in wanted.items() if start is not None
+    }
+    old = {
+        appointment_id: (vet_id, start)
+        for appointment_id, vet_id, start in VetSlot.objects.filter(
+            appointment_id__in=list(by_id),
+        ).values_list('appointment_id', 'vet_id', 'start')
+    }
+    changed = [appointment_id for appointment_id in by_id if old.get(appointment_id) != new.get(appointment_id)]
+    if not changed:
+        return
+    loads = Counter()
+    for appointment_id in changed:
+        if appointment_id in old:
+            vet_id, start = old[appointment_id]
+            loads[vet_id, clinic_day(start)] -= 1
+        if appointment_id in new:
+            vet_id, start = new[appointment_id]
+            loads[vet_id, clinic_day(start)] += 1
+    added = [appointment_id for appointment_id in changed if appointment_id in new]
+    try:
+        with transaction.atomic():
+            VetSlot.objects.filter(appointment_id__in=changed).delete()
+            VetSlot.objects.bulk_create([
+                VetSlot(appointment_id=appointment_id, vet_id=new[appointment_id][0], start=new[appointment_id][1])
+                for appointment_id in added
+            ])
+            # Sorted so concurrent batches lock counters in the same order.
+            for (vet_id, day), delta in sorted(loads.items()):
+                if delta:
+                    _add_load(vet_id, day, delta)
+    except IntegrityError:
+        if len(added) == 1:
+            start = new[added[0]][1]
+            raise SlotUnavailable(f"The veterinarian is already booked at {start.strftime('%B %d, %Y at %I:%M %p')}.")
+        raise SlotUnavailable('A veterinarian is already booked at one of the requested times.')
+
+
+def rebuild_slots(appointment_model, slot_model, batch_size=1000):
+    # Recreate every slot row from the appointments, for seeding and repairs.
+    # Of appointments that collide, the oldest keeps the slot.
+    slot_model.objects.all().delete()
+    appointments = appointment_model.objects.filter(
+        assigned_vet__isnull=False, status__in=ACTIVE_STATUSES,
+    ).order_by('id').values_list('id', 'assigned_vet_id', 'date', 'status')
+    rows, taken = [], set()
+    for appointment_id, vet_id, date, status in appointments.iterator(chunk_size=batch_size):
+        start = slot_start(date)
+        if start is None or (vet_id, start) in taken:
+            continue
+        taken.add((vet_id, start))
+        rows.append(slot_model(appointment_id=appointment_id, vet_id=vet_id, start=start))
+    slot_model.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def rebuild_loads(slot_model, load_model, batch_size=1000):
+    # Recount VetDayLoad from the slot rows; models passed as for
+    # rebuild_slots().
+    load_model.objects.all().delete()
+    counts = Counter(
+        (vet_id, clinic_day(start))
+        for vet_id, start in slot_model.objects.values_list('vet_id', 'start').iterator(chunk_size=batch_size)
+    )
+    load_model.objects.bulk_create(
+        [load_model(vet_id=vet_id, day=day, appointments=count) for (vet_id, day), count in counts.items()],
+        batch_size=batch_size,
+    )
+    return len(counts)
+
+
+def availability(vets, first_day, last_day):
+    # Free slots per vet between two clinic days (inclusive), from one range
+    # query over the (vet, start) index. Slots already past are not free.
+    from .models import VetSlot
+    start, _ = day_range(first_day)
+    _, end = day_range(last_day)
+    taken = set(VetSlot.objects.filter(vet__in=vets, start__gte=start, start__lt=end).values_list('vet_id', 'start'))
+    now = timezone.now()
+    grid = [
+        slot
+        for offset in range((last_day - first_day).days + 1)
+        for slot in day_slots(first_day + timedelta(days=offset))
+        if slot > now
+    ]
+    return {vet.id: [slot for slot in grid if (vet.id, slot) not in taken] for vet in vets}
@@ -0,0 +1,174 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from urllib.parse import quote
+from django.conf import settings
+from minio import Minio
+from minio.error import S3Error
+
+# MinIOService talks to its storage through the part of the minio.Minio API
+# it uses: bucket_exists, make_bucket, put_object, get_object,
+# presigned_get_object and remove_object. STORAGE_BACKEND picks the
+# implementation: 'minio' (the real client), 'memory' or 'filesystem'.
+
+
+class StoredObject:
+    # Stands in for the urllib3 response get_object() returns.
+    def __init__(self, data, content_type):
+        self.data = data
+        self.headers = {'Content-Type': content_type, 'Content-Length': str(len(data))}
+        self._offset = 0
+
+    def read(self, amt=None):
+        end = len(self.data) if amt is None else self._offset + amt
+        chunk = self.data[self._offset:end]
+        self._offset += len(chunk)
+        return chunk
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class MemoryStorage:
+    # Objects live in a dict for the life of the process. Missing buckets
+    # and keys fail with the same S3Error codes MinIO returns.
+    def __init__(self, base_url=None):
+        self.base_url = (base_url or getattr(settings, 'STORAGE_FAKE_URL', 'http://storage.invalid')).rstrip('/')
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def _error(self, code, message, bucket_name, object_name=None):
+        resource = f'/{bucket_name}/{object_name}' if object_name else f'/{bucket_name}'
+        return S3Error(code, message, resource, None, None, None, bucket_name, object_name)
+
+    def _bucket(self, bucket_name):
+        bucket = self._buckets.get(bucket_name)
+        if bucket is None:
+            raise self._error('NoSuchBucket', 'The specified bucket does not exist', bucket_name)
+        return bucket
+
+    def bucket_exists(self, bucket_name):
+        with self._lock:
+            return bucket_name in self._buckets
+
+    def make_bucket(self, bucket_name):
+        with self._lock:
+            if bucket_name in self._buckets:
+                raise self._error('BucketAlreadyOwnedByYou', 'Your previous request to create the named bucket succeeded', bucket_name)
+            self._buckets[bucket_name] = {}
+
+    def put_object(self, bucket_name, object_name, data, length, content_type='application/octet-stream', part_size=0, **kwargs):
+        # length -1 means "read to the end", as with the real client.
+        content = data.read() if length < 0 else data.read(length)
+        with self._lock:
+            self._bucket(bucket_name)[object_name] = (bytes(content), content_type)
+
+    def get_object(self, bucket_name, object_name, **kwargs):
+        with self._lock:
+            stored = self._bucket(bucket_name).get(object_name)
+        if stored is None:
+            raise self._error('NoSuchKey', 'The specified key does not exist.', bucket_name, object_name)
+        return StoredObject(*stored)
+
+    def remove_object(self, bucket_name, object_name, **kwargs):
+        # Removing a missing key succeeds, as it does on S3.
+        with self._lock:
+            self._bucket(bucket_name).pop(object_name, None)
+
+    def presigned_get_object(self, bucket_name, object_name, expires=None, **kwargs):
+        # An HMAC over bucket, key and expiry, so URLs change with expiry
+        # like real presigned URLs. Nothing serves them.
+        seconds = int(expires.total_seconds()) if expires else 7 * 86400
+        expires_at = int(time.time()) + seconds
+        path = f'/{bucket_name}/{quote(object_name)}'
+        signature = hmac.new(settings.SECRET_KEY.encode(), f'{path}:{expires_at}'.encode(), hashlib.sha256).hexdigest()
+        return f'{self.base_url}{path}?X-Expires={expires_at}&X-Signature={signature}'
+
+
+class FileSystemStorage(MemoryStorage):
+    # Same behaviour as MemoryStorage with every bucket a directory under
+    # `root`, so objects survive restarts and can be shared by processes.
+    # Content types are kept in a parallel tree under root/.meta.
+    def __init__(self, root=None, base_url=None):
+        super().__init__(base_url)
+        self.root = str(root or getattr(settings, 'STORAGE_ROOT', 'storage'))
+
+    def _path(self, bucket_name, object_name=None, meta=False):
+        bucket_path = os.path.join(self.root, '.meta' if meta else '', bucket_name)
+        if object_name is None:
+            return bucket_path
+        path = os.path.normpath(os.path.join(bucket_path, object_name))
+        if not path.startswith(bucket_path + os.sep):
+            raise self._error('InvalidObjectName', 'Object name escapes the bucket', bucket_name, object_name)
+        return path
+
+    def _check_bucket(self, bucket_name):
+        if not self.bucket_exists(bucket_name):
+            raise self._error('NoSuchBucket', 'The specified bucket does not exist', bucket_name)
+
+    def bucket_exists(self, bucket_name):
+        return os.path.isdir(self._path(bucket_name))
+
+    def make_bucket(self, bucket_name):
+        try:
+            os.makedirs(self._path(bucket_name))
+        except FileExistsError:
+            raise self._error('BucketAlreadyOwnedByYou', 'Your previous request to create the named bucket succeeded', bucket_name)
+
+    def _write(self, path, content):
+        # Write then rename so readers never see a partial file.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def put_object(self, bucket_name, object_name, data, length, content_type='application/octet-stream', part_size=0, **kwargs):
+        self._check_bucket(bucket_name)
+        path = self._path(bucket_name, object_name)
+        content = data.read() if length < 0 else data.read(length)
+        self._write(self._path(bucket_name, object_name, meta=True), content_type.encode())
+        self._write(path, content)
+
+    def get_object(self, bucket_name, object_name, **kwargs):
+        self._check_bucket(bucket_name)
+        try:
+            with open(self._path(bucket_name, object_name), 'rb') as f:
+                content = f.read()
+        except (FileNotFoundError, IsADirectoryError):
+            raise self._error('NoSuchKey', 'The specified key does not exist.', bucket_name, object_name)
+        try:
+            with open(self._path(bucket_name, object_name, meta=True)) as f:
+                content_type = f.read()
+        except FileNotFoundError:
+            content_type = 'application/octet-stream'
+        return StoredObject(content, content_type)
+
+    def remove_object(self, bucket_name, object_name, **kwargs):
+        self._check_bucket(bucket_name)
+        for path in (self._path(bucket_name, object_name), self._path(bucket_name, object_name, meta=True)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def create_storage_client(backend=None):
+    backend = backend or getattr(settings, 'STORAGE_BACKEND', 'minio')
+    if backend == 'minio':
+        return Minio(
+            settings.MINIO_ENDPOINT,
+            access_key=settings.MINIO_ACCESS_KEY,
+            secret_key=settings.MINIO_SECRET_KEY,
+            secure=settings.MINIO_SECURE,
+        )
+    if backend == 'memory':
+        return MemoryStorage()
+    if backend == 'filesystem':
+        return FileSystemStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected 'minio', 'memory' or 'filesystem'")
@@ -1,3 +1,1205 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import shutil
+import smtplib
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth.hashers import is_password_usable
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from minio.error import S3Error
+from PIL import Image
+from . import metrics
+from .assignment import least_loaded_vet
+from .bulk import VaccinationImport, bulk_update_status
+from .mailer import EmailWorkerPool, deliver_mail
+from .models import (
+    Appointment, ImportCheckpoint, OutboxMessage, Pet, ReminderSent, SchedulerLease, Service, Treatment, User, Vaccinated, Vaccine, VetDayLoad, VetSlot,
+)
+from .outbox import RECIPIENT_NAME, collect_outbox, drain_outbox, queue_email, queue_fan_out, queue_mail
+from .pagination import InvalidCursor, encode_cursor, keyset_page
+from .reminders import due_reminders, send_reminders
+from .scheduler import LeaderElection, should_autostart
+from .slots import slot_start, sync_slot
+from .services import (
+    CLINIC_TIME_ZONE, IMAGE_VARIANT_CONTENT_TYPE, EmailService, MinIOService, PresignedUrlCache, UserService, clinic_today,
+    day_range, minio_service, render_email, render_image_variants, variant_key,
+)
+from .storage import FileSystemStorage, MemoryStorage
+from .timing import RequestTimings, collect, track
 
-# Create your tests here.
+
+class UserServiceCacheTest(TestCase):
+    def setUp(self):
+        self.staff = User(email='staff@example.com', full_name='Staff', role='staff')
+        self.staff.set_password('secret123')
+        self.staff.save()
+
+    def test_role_checks_load_user_once(self):
+        user_service = UserService({'user_id': self.staff.id})
+        with self.assertNumQueries(1):
+            self.assertTrue(user_service.is_staff())
+            self.assertFalse(user_service.is_client())
+            self.assertFalse(user_service.is_vet())
+            self.assertEqual(user_service.get_user(), self.staff)
+
+    def test_missing_user_is_cached(self):
+        user_service = UserService({'user_id': self.staff.id + 1000})
+        with self.assertNumQueries(1):
+            self.assertIsNone(user_service.get_user())
+            self.assertFalse(user_service.is_staff())
+
+    def test_request_reports_query_count(self):
+        session = self.client.session
+        session['user_id'] = self.staff.id
+        session.save()
+        response = self.client.get('/api/users/')
+        self.assertEqual(response.status_code, 200)
+        # session + user + user list, no matter how many role checks ran
+        self.assertEqual(response['X-Query-Count'], '3')
+
+
+class RequestTimingTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(email='staff@example.com', full_name='Staff', role='staff')
+        session = self.client.session
+        session['user_id'] = self.staff.id
+        session.save()
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/users/')
+        metrics = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(metrics), {'db', 'minio', 'render', 'app', 'total'})
+        self.assertIn('desc="3 queries"', metrics['db'])
+
+    def test_track_only_records_inside_collect(self):
+        with track('minio'):
+            pass
+        timings = RequestTimings()
+        with collect(timings):
+            with track('minio'):
+                pass
+            with track('minio'):
+                pass
+        self.assertEqual(list(timings.durations), ['minio'])
+
+    def test_timing_can_be_switched_off(self):
+        with self.modify_settings(MIDDLEWARE={'remove': 'reservation.middleware.RequestTimingMiddleware'}):
+            response = self.client.get('/api/users/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('X-Query-Count', response)
+
+    @override_settings(SLOW_REQUEST_QUERY_THRESHOLD=2)
+    def test_slow_request_logs_sql(self):
+        with mock.patch('builtins.print') as printed:
+            self.client.get('/api/users/')
+        lines = [call.args[0] for call in printed.call_args_list]
+        self.assertIn('GET /api/users/ ran 3 queries (threshold 2):', lines)
+        self.assertTrue(any('reservation_user' in line for line in lines))
+
+
+class MetricsTest(TestCase):
+    def test_endpoint_reports_requests_by_url_name(self):
+        self.client.get('/api/users/')
+        body = self.client.get('/api/metrics').content.decode()
+        self.assertIn('# TYPE petcare_http_request_duration_seconds histogram', body)
+        self.assertRegex(body, r'petcare_http_requests_total\{method="GET",status="401",url_name="user_list"\} \d+')
+        self.assertRegex(body, r'petcare_http_request_queries_bucket\{url_name="user_list",le="\+Inf"\} \d+')
+        self.assertIn('petcare_outbox_messages{status="pending"} 0', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get('/api/metrics').status_code, 403)
+        response = self.client.get('/api/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_snapshots_of_other_processes_are_merged(self):
+        registry = metrics.Registry()
+        registry.observe('petcare_minio_call_duration_seconds', 0.02, {'operation': 'put_object'})
+        registry.inc('petcare_minio_errors_total', {'operation': 'put_object'})
+        labels = [['operation', 'put_object']]
+        other = {
+            'pid': 2 ** 22 + 1,  # not running: its gauges are dropped
+            'counters': [['petcare_minio_errors_total', labels, 2]],
+            'histograms': [['petcare_minio_call_duration_seconds', labels, [0, 0, 1] + [0] * 9, 0.02, 1]],
+            'gauges': [['petcare_email_queue_depth', [], 7]],
+        }
+        with self.settings(METRICS_DIR=self.tmp_dir()):
+            with open(registry.path(other['pid']), 'w') as f:
+                json.dump(other, f)
+            counters, histograms, gauges = registry.collect()
+        key = (('operation', 'put_object'),)
+        self.assertEqual(counters[('petcare_minio_errors_total', key)], 3)
+        self.assertEqual(histograms[('petcare_minio_call_duration_seconds', key)][0][2], 2)
+        self.assertEqual(gauges[('petcare_email_queue_depth', ())], 0)
+        body = metrics.render(counters, histograms, gauges)
+        self.assertIn('petcare_minio_call_duration_seconds_bucket{operation="put_object",le="0.025"} 2', body)
+
+    def tmp_dir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        return directory
+
+
+class PresignedUrlCacheTest(SimpleTestCase):
+    def test_hit_miss_and_purge(self):
+        cache = PresignedUrlCache(max_size=10)
+        self.assertIsNone(cache.get('pets/a.jpg', 7))
+        cache.set('pets/a.jpg', 7, 'http://signed/a')
+        self.assertEqual(cache.get('pets/a.jpg', 7), 'http://signed/a')
+        cache.purge('pets/a.jpg')
+        self.assertIsNone(cache.get('pets/a.jpg', 7))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_evicts_least_recently_used(self):
+        cache = PresignedUrlCache(max_size=2)
+        cache.set('a', 7, 'url-a')
+        cache.set('b', 7, 'url-b')
+        cache.get('a', 7)
+        cache.set('c', 7, 'url-c')
+        self.assertIsNone(cache.get('b', 7))
+        self.assertEqual(cache.get('a', 7), 'url-a')
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_drops_urls_close_to_expiry(self):
+        cache = PresignedUrlCache(max_size=10, min_valid=timedelta(days=1))
+        with mock.patch('reservation.services.time.time', return_value=0):
+            cache.set('a', 7, 'url-a')
+        with mock.patch('reservation.services.time.time', return_value=5 * 86400):
+            self.assertEqual(cache.get('a', 7), 'url-a')
+        with mock.patch('reservation.services.time.time', return_value=6.5 * 86400):
+            self.assertIsNone(cache.get('a', 7))
+
+
+class ImageVariantTest(SimpleTestCase):
+    def test_variants_are_resized_and_rotated(self):
+        image = Image.new('RGB', (1600, 1200), 'white')
+        exif = image.getexif()
+        exif[0x0112] = 6  # rotated 90 degrees
+        original = io.BytesIO()
+        image.save(original, 'JPEG', exif=exif)
+
+        variants = render_image_variants(original)
+        self.assertEqual(Image.open(variants['thumb']).size, (192, 256))
+        self.assertEqual(Image.open(variants['medium']).size, (768, 1024))
+
+    def test_delete_image_removes_variants(self):
+        with minio_service.use_client(mock.Mock()) as client:
+            self.assertTrue(minio_service.delete_image('pets/a.jpg'))
+        removed = {call.kwargs['object_name'] for call in client.remove_object.call_args_list}
+        self.assertEqual(removed, {
+            'pets/a.jpg',
+            variant_key('pets/a.jpg', 'thumb'),
+            variant_key('pets/a.jpg', 'medium'),
+        })
+
+
+class StorageBackendTest(SimpleTestCase):
+    def check_backend(self, storage):
+        self.assertFalse(storage.bucket_exists('images'))
+        with self.assertRaises(S3Error) as raised:
+            storage.put_object('images', 'a.jpg', io.BytesIO(b'x'), 1)
+        self.assertEqual(raised.exception.code, 'NoSuchBucket')
+        storage.make_bucket('images')
+        storage.put_object('images', 'pets/a.jpg', io.BytesIO(b'jpeg-bytes'), -1, content_type='image/jpeg')
+        stored = storage.get_object('images', 'pets/a.jpg')
+        self.assertEqual((stored.read(), stored.headers['Content-Type']), (b'jpeg-bytes', 'image/jpeg'))
+        url = storage.presigned_get_object('images', 'pets/a.jpg', expires=timedelta(days=1))
+        self.assertTrue(url.startswith('http://storage.invalid/images/pets/a.jpg?X-Expires='))
+        storage.remove_object('images', 'pets/a.jpg')
+        storage.remove_object('images', 'pets/a.jpg')
+        with self.assertRaises(S3Error) as raised:
+            storage.get_object('images', 'pets/a.jpg')
+        self.assertEqual(raised.exception.code, 'NoSuchKey')
+
+    def test_memory(self):
+        self.check_backend(MemoryStorage())
+
+    def test_filesystem(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.check_backend(FileSystemStorage(root))
+        with self.assertRaises(S3Error):
+            FileSystemStorage(root).get_object('images', '../../etc/passwd')
+
+    @override_settings(STORAGE_BACKEND='memory')
+    def test_service_runs_on_memory_backend(self):
+        service = MinIOService()
+        image = io.BytesIO()
+        Image.new('RGB', (800, 600), 'white').save(image, 'JPEG')
+        self.assertTrue(service.upload_image(image, 'pets/b.jpg'))
+        self.assertEqual(service.client.get_object(service.bucket_name, variant_key('pets/b.jpg', 'thumb')).headers['Content-Type'], IMAGE_VARIANT_CONTENT_TYPE)
+        self.assertIn('/pets/b.jpg?', service.get_image_url('pets/b.jpg'))
+        self.assertTrue(service.delete_image('pets/b.jpg'))
+        with self.assertRaises(S3Error):
+            service.client.get_object(service.bucket_name, 'pets/b.jpg')
+
+    def test_upload_streams_file_with_real_length(self):
+        # The upload object itself goes to put_object, not a BytesIO copy.
+        service = MinIOService()
+        storage = MemoryStorage()
+        storage.make_bucket(service.bucket_name)
+        content = os.urandom(64 * 1024)
+        on_disk = TemporaryUploadedFile('mali.jpg', 'image/jpeg', len(content), None)
+        on_disk.write(content)
+        self.addCleanup(on_disk.close)
+        for upload in (SimpleUploadedFile('mali.jpg', content, content_type='image/jpeg'), on_disk):
+            with service.use_client(storage), \
+                    mock.patch.object(storage, 'put_object', wraps=storage.put_object) as put_object:
+                self.assertTrue(service.upload_image(upload, 'pets/mali.jpg', variants=False))
+            self.assertIs(put_object.call_args.kwargs['data'], upload)
+            self.assertEqual(put_object.call_args.kwargs['length'], len(content))
+            self.assertEqual(storage.get_object(service.bucket_name, 'pets/mali.jpg').read(), content)
+
+class LazyStorageTest(SimpleTestCase):
+    @override_settings(STORAGE_BACKEND='memory')
+    def test_client_is_created_once_on_first_use(self):
+        with mock.patch('reservation.services.create_storage_client', wraps=MemoryStorage) as create:
+            service = MinIOService()
+            create.assert_not_called()
+            threads = [threading.Thread(target=lambda: service.client) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(create.call_count, 1)
+        self.assertTrue(service.client.bucket_exists(service.bucket_name))
+
+    def test_failed_bucket_check_is_retried(self):
+        storage = MemoryStorage()
+        service = MinIOService()
+        with mock.patch('reservation.services.create_storage_client', return_value=storage), \
+                mock.patch.object(storage, 'bucket_exists', side_effect=[ConnectionError('down'), True]):
+            with self.assertRaises(ConnectionError):
+                service.warmup()
+            self.assertIs(service.client, storage)
+
+
+class HealthTest(TestCase):
+    def test_ok(self):
+        with minio_service.use_client(MemoryStorage()):
+            response = self.client.get('/api/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'status': 'ok', 'database': 'ok', 'storage': 'ok'})
+
+    def test_storage_down(self):
+        with mock.patch.object(minio_service, 'warmup', side_effect=ConnectionError('refused by minio.internal:9000')), \
+                mock.patch('builtins.print') as printed:
+            response = self.client.get('/api/health/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data, {'status': 'error', 'database': 'ok', 'storage': 'error'})
+        self.assertNotIn(b'minio.internal', response.content)
+        printed.assert_called_once_with('Health check: storage unavailable: refused by minio.internal:9000')
+
+
+class EmailWorkerPoolTest(SimpleTestCase):
+    def test_workers_reuse_connection_and_drain_on_shutdown(self):
+        pool = EmailWorkerPool(workers=2, max_queue=20)
+        with mock.patch('reservation.mailer.get_connection', wraps=mail.get_connection) as get_connection:
+            for i in range(8):
+                self.assertTrue(pool.submit(deliver_mail, 'Subject', 'Body', [f'user{i}@example.com']))
+            pool.shutdown(timeout=5)
+        self.assertEqual(len(mail.outbox), 8)
+        self.assertLessEqual(get_connection.call_count, 2)
+        stats = pool.stats()
+        self.assertEqual((stats['sent'], stats['failed'], stats['queue_depth']), (8, 0, 0))
+        self.assertFalse(pool.submit(deliver_mail, 'Late', 'Body', ['late@example.com']))
+
+    def test_full_queue_applies_backpressure(self):
+        pool = EmailWorkerPool(workers=1, max_queue=1, put_timeout=0.05)
+        release = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        self.assertTrue(pool.submit(block))
+        started.wait(5)
+        self.assertTrue(pool.submit(block))
+        self.assertFalse(pool.submit(block))
+        self.assertEqual(pool.stats()['rejected'], 1)
+        release.set()
+        pool.shutdown(timeout=5)
+
+
+class OutboxTest(TestCase):
+    def queue_two(self):
+        queue_mail('First', 'Body', ['first@example.com'])
+        queue_mail('Second', 'Body', ['second@example.com'], html_message='<p>Body</p>')
+
+    def test_messages_roll_back_with_the_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertEqual(queue_email(self.queue_two), 2)
+                raise RuntimeError('booking failed')
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_drain_sends_batch_over_one_connection(self):
+        queue_email(self.queue_two)
+        with mock.patch('reservation.mailer.get_connection', wraps=mail.get_connection) as get_connection:
+            totals = drain_outbox()
+        self.assertEqual((totals['sent'], totals['batches']), (2, 1))
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(set(OutboxMessage.objects.values_list('status', flat=True)), {'sent'})
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_sends_back_off_then_give_up(self):
+        queue_mail('First', 'Body', ['first@example.com'])
+        with mock.patch('reservation.mailer.send_email_message', side_effect=smtplib.SMTPException('down')):
+            self.assertEqual(drain_outbox()['retried'], 1)
+            message = OutboxMessage.objects.get()
+            self.assertEqual((message.status, message.attempts), ('pending', 1))
+            self.assertGreater(message.next_attempt_at, timezone.now())
+            self.assertEqual(drain_outbox()['batches'], 0)
+
+            OutboxMessage.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(drain_outbox()['failed'], 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.last_error), ('failed', 'down'))
+
+    def test_fan_out_reports_failures_per_recipient(self):
+        recipients = [(f'staff{i}@example.com', f'Staff {i}') for i in range(3)]
+        queue_fan_out('New Appointment', f'Dear {RECIPIENT_NAME},', recipients)
+        self.assertEqual(
+            sorted(OutboxMessage.objects.values_list('body', flat=True)),
+            ['Dear Staff 0,', 'Dear Staff 1,', 'Dear Staff 2,'],
+        )
+
+        def refuse_staff1(email):
+            if email.to == ['staff1@example.com']:
+                raise smtplib.SMTPRecipientsRefused({'staff1@example.com': (550, b'No such user')})
+            mail.outbox.append(email)
+
+        with mock.patch('reservation.mailer.send_email_message', side_effect=refuse_staff1):
+            totals = drain_outbox()
+        self.assertEqual((totals['sent'], totals['retried']), (2, 1))
+        refused = OutboxMessage.objects.get(status='pending')
+        self.assertEqual(refused.recipients, ['staff1@example.com'])
+        self.assertIn('No such user', refused.last_error)
+
+    def test_fan_out_escapes_name_in_html_only(self):
+        queue_fan_out(
+            'New Appointment', f'Dear {RECIPIENT_NAME},', [('staff@example.com', 'Tom & "Jerry" <b>')],
+            html_message=f'<p>Dear {RECIPIENT_NAME},</p>',
+        )
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.body, 'Dear Tom & "Jerry" <b>,')
+        self.assertEqual(message.html_body, '<p>Dear Tom &amp; &quot;Jerry&quot; &lt;b&gt;,</p>')
+
+
+class EmailTemplateTest(SimpleTestCase):
+    def appointment(self):
+        owner = SimpleNamespace(full_name='Owner', email='owner@example.com', phone_number=None)
+        pet = SimpleNamespace(name='Mali <3', breed='Bangkaew', gender='Female', get_image_thumb_url=mock.Mock(return_value='https://img/mali_thumb.webp'))
+        vet = SimpleNamespace(full_name='Vet', email='vet@example.com')
+        return SimpleNamespace(
+            user=owner, pet=pet, assigned_vet=vet, purpose='Check-up', remarks=None, vet_note=None,
+            date=datetime(2026, 1, 5, 10, 30), get_status_display=lambda: 'Confirmed',
+        )
+
+    def test_image_url_is_signed_once_per_notification(self):
+        appointment = self.appointment()
+        with collect_outbox() as rows:
+            EmailService._send_vet_assignment_email(appointment.assigned_vet, EmailService.build_context(appointment))
+        self.assertEqual(appointment.pet.get_image_thumb_url.call_count, 1)
+        self.assertEqual(rows[0].recipients, ['vet@example.com'])
+        self.assertIn('Dear Dr. Vet,', rows[0].body)
+        self.assertIn('src="https://img/mali_thumb.webp"', rows[0].html_body)
+        self.assertIn('Mali &lt;3', rows[0].html_body)
+        self.assertIn('Pet Name: Mali <3', rows[0].body)
+
+    def test_staff_templates_keep_recipient_placeholder(self):
+        context = EmailService.build_context(self.appointment())
+        html_message, plain_message = render_email('staff_appointment', {**context, 'recipient_name': RECIPIENT_NAME})
+        self.assertIn(f'Dear {RECIPIENT_NAME},', html_message)
+        self.assertIn(f'Dear {RECIPIENT_NAME},', plain_message)
+
+
+class ReminderJobTest(TestCase):
+    def setUp(self):
+        owner = User.objects.create(email='owner@example.com', full_name='Owner')
+        pet = Pet.objects.create(user=owner, name='Mali', breed='Bangkaew', color='White', birth_date=date(2020, 1, 1))
+        self.target_date = date(2026, 1, 5)
+        when = timezone.make_aware(datetime(2026, 1, 5, 10, 30))
+        for status in ('confirmed', 'confirmed', 'booked'):
+            Appointment.objects.create(user=owner, pet=pet, purpose='Check-up', date=when, status=status)
+
+    def test_reruns_never_double_send(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            stats = send_reminders(self.target_date, chunk_size=1)
+        self.assertEqual((stats['found'], stats['queued'], stats['chunks'], stats['failed']), (2, 2, 2, 0))
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        self.assertEqual(ReminderSent.objects.count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=False):
+            stats = send_reminders(self.target_date)
+        self.assertEqual((stats['found'], stats['queued']), (0, 0))
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+
+    def test_rescheduled_appointment_is_reminded_again(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            send_reminders(self.target_date)
+        appointment = Appointment.objects.filter(status='confirmed').first()
+        appointment.date += timedelta(hours=2)
+        appointment.save()
+        with self.captureOnCommitCallbacks(execute=False):
+            self.assertEqual(send_reminders(self.target_date)['queued'], 1)
+
+    def test_concurrent_run_is_skipped_per_appointment(self):
+        # Simulate another run recording one reminder after this one listed it.
+        first = Appointment.objects.filter(status='confirmed').first()
+        ReminderSent.objects.create(appointment=first, appointment_date=first.date)
+        listed = Appointment.objects.filter(status='confirmed').order_by('id')
+        with mock.patch('reservation.reminders.due_reminders', return_value=listed):
+            with self.captureOnCommitCallbacks(execute=False):
+                stats = send_reminders(self.target_date)
+        self.assertEqual((stats['queued'], stats['skipped']), (1, 1))
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+
+class SchedulerLeaderTest(TestCase):
+    def test_one_leader_with_failover(self):
+        first, second = LeaderElection(), LeaderElection()
+        self.assertTrue(first.heartbeat())
+        self.assertFalse(second.heartbeat())
+        self.assertTrue(first.heartbeat())
+        self.assertTrue(first.is_leader())
+        self.assertFalse(second.is_leader())
+
+        # The leader stops renewing and its lease runs out.
+        SchedulerLease.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(second.heartbeat())
+        self.assertFalse(first.heartbeat())
+        self.assertFalse(first.is_leader())
+        self.assertEqual(SchedulerLease.objects.get().holder, second.holder)
+
+    def test_release_hands_over_immediately(self):
+        first, second = LeaderElection(), LeaderElection()
+        first.heartbeat()
+        first.release()
+        self.assertFalse(first.is_leader())
+        self.assertTrue(second.heartbeat())
+
+    def test_jobs_follow_leadership(self):
+        from . import scheduler
+        fake = mock.Mock()
+        with mock.patch.object(scheduler, 'election') as election, mock.patch.object(scheduler, '_leading', False):
+            election.heartbeat.return_value = True
+            scheduler.heartbeat(fake)
+            self.assertEqual({call.args[0] for call in fake.resume_job.call_args_list}, set(scheduler.JOBS))
+            election.heartbeat.return_value = False
+            scheduler.heartbeat(fake)
+            self.assertEqual({call.args[0] for call in fake.pause_job.call_args_list}, set(scheduler.JOBS))
+            election.is_leader.return_value = False
+            with mock.patch.object(scheduler, 'timed_job') as timed_job:
+                self.assertIsNone(scheduler.run_if_leader('drain_outbox'))
+            timed_job.assert_not_called()
+
+    @override_settings(SCHEDULER_AUTOSTART=True)
+    def test_only_web_processes_autostart(self):
+        self.assertTrue(should_autostart(['gunicorn', 'petcare.wsgi']))
+        self.assertTrue(should_autostart(['manage.py', 'runserver', '--noreload']))
+        self.assertFalse(should_autostart(['manage.py', 'runserver']))
+        self.assertFalse(should_autostart(['manage.py', 'migrate']))
+        self.assertFalse(should_autostart(['manage.py', 'send_reminders']))
+        with mock.patch.dict(os.environ, {'RUN_MAIN': 'true'}):
+            self.assertTrue(should_autostart(['manage.py', 'runserver']))
+        with self.settings(SCHEDULER_AUTOSTART=False):
+            self.assertFalse(should_autostart(['gunicorn', 'petcare.wsgi']))
+
+
+class SlotEngineTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(email='staff@example.com', full_name='Staff', role='staff')
+        self.vet = User.objects.create(email='vet@example.com', full_name='Vet A', role='vet')
+        self.other_vet = User.objects.create(email='vet2@example.com', full_name='Vet B', role='vet')
+        self.owner = User.objects.create(email='owner@example.com', full_name='Owner')
+        self.pet = Pet.objects.create(user=self.owner, name='Mali', breed='Bangkaew', color='White', birth_date=date(2020, 1, 1))
+        self.monday = clinic_today() + timedelta(days=14)
+        self.monday -= timedelta(days=self.monday.weekday())
+        session = self.client.session
+        session['user_id'] = self.staff.id
+        session.save()
+
+    def at(self, hour, minute=0):
+        return datetime(self.monday.year, self.monday.month, self.monday.day, hour, minute, tzinfo=CLINIC_TIME_ZONE)
+
+    def book(self, when, vet):
+        return self.client.post('/api/appointments/book/', {
+            'user': self.owner.id, 'pet': self.pet.id, 'purpose': 'Check-up',
+            'date': when.isoformat(), 'assigned_vet': vet.id,
+        }, content_type='application/json')
+
+    def free(self, vet):
+        response = self.client.get('/api/appointments/availability/', {
+            'vet': vet.id, 'from': self.monday.isoformat(), 'to': self.monday.isoformat(),
+        })
+        self.assertEqual(response.status_code, 200)
+        return [datetime.fromisoformat(slot) for slot in response.json()['vets'][0]['free_slots']]
+
+    def test_slot_start(self):
+        self.assertEqual(slot_start(self.at(10, 20)), self.at(10))
+        self.assertEqual(slot_start(self.at(16, 59)), self.at(16, 30))
+        self.assertIsNone(slot_start(self.at(17)))
+        self.assertIsNone(slot_start(self.at(8, 59)))
+        self.assertIsNone(slot_start(self.at(10) + timedelta(days=6)))  # Sunday
+
+    def test_double_booking_is_rejected(self):
+        response = self.book(self.at(10), self.vet)
+        self.assertEqual(response.status_code, 201, response.data)
+        response = self.book(self.at(10, 15), self.vet)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already booked', response.data['date'][0])
+        self.assertEqual(self.book(self.at(10, 15), self.other_vet).status_code, 201)
+        self.assertEqual(Appointment.objects.count(), 2)
+        self.assertEqual(self.book(self.at(18), self.vet).status_code, 400)
+
+    def test_availability_follows_bookings_and_status(self):
+        self.assertEqual(len(self.free(self.vet)), 16)
+        self.book(self.at(10), self.vet)
+        self.assertNotIn(self.at(10), self.free(self.vet))
+        self.assertIn(self.at(10), self.free(self.other_vet))
+
+        appointment = Appointment.objects.get()
+        response = self.client.put(
+            f'/api/appointments/updatestatus/{appointment.id}/', {'status': 'cancelled'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.at(10), self.free(self.vet))
+        self.assertFalse(VetSlot.objects.exists())
+
+    def test_bad_range(self):
+        response = self.client.get('/api/appointments/availability/', {'from': '2026-01-10', 'to': '2026-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AutoAssignTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(email='staff@example.com', full_name='Staff', role='staff')
+        self.vets = [User.objects.create(email=f'vet{i}@example.com', full_name=f'Vet {i}', role='vet') for i in range(3)]
+        self.owner = User.objects.create(email='owner@example.com', full_name='Owner')
+        self.pet = Pet.objects.create(user=self.owner, name='Mali', breed='Bangkaew', color='White', birth_date=date(2020, 1, 1))
+        self.monday = clinic_today() + timedelta(days=14)
+        self.monday -= timedelta(days=self.monday.weekday())
+        session = self.client.session
+        session['user_id'] = self.staff.id
+        session.save()
+        # Vet 0 has two appointments that day, vet 1 one, vet 2 one at 10:00.
+        for vet, hour in ((0, 9), (0, 11), (1, 9), (2, 10)):
+            self.appointment(hour, status='confirmed', vet=self.vets[vet])
+
+    def at(self, hour, minute=0):
+        return datetime(self.monday.year, self.monday.month, self.monday.day, hour, minute, tzinfo=CLINIC_TIME_ZONE)
+
+    def appointment(self, hour, status='booked', vet=None):
+        appointment = Appointment.objects.create(
+            user=self.owner, pet=self.pet, purpose='Check-up', date=self.at(hour), status=status, assigned_vet=vet,
+        )
+        sync_slot(appointment)
+        return appointment
+
+    def load(self, vet):
+        return VetDayLoad.objects.get(vet=vet, day=self.monday).appointments
+
+    def test_picks_least_loaded_free_vet(self):
+        # Vet 2 is as loaded as vet 1 but busy at 10:00.
+        self.assertEqual(least_loaded_vet(self.at(10)), self.vets[1])
+        self.assertEqual(least_loaded_vet(self.at(13)), self.vets[1])
+        self.assertEqual(least_loaded_vet(self.at(13), exclude=[self.vets[1].id]), self.vets[2])
+        self.assertIsNone(least_loaded_vet(self.at(18)))
+
+        appointment = self.appointment(10)
+        response = self.client.put(
+            f'/api/appointments/updatestatus/{appointment.id}/', {'status': 'confirmed', 'auto_assign': True},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['assigned_vet'], self.vets[1].id)
+        self.assertEqual(self.load(self.vets[1]), 2)
+
+        response = self.client.put(
+            f'/api/appointments/updatestatus/{appointment.id}/', {'status': 'cancelled'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.load(self.vets[1]), 1)
+
+    def test_batch_reports_full_slots(self):
+        first, second, third, fourth = [self.appointment(9) for _ in range(4)]
+        response = self.client.post(
+            '/api/appointments/auto-assign/', {'date': self.monday.isoformat()}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        # Only vet 2 is free at 9:00.
+        self.assertEqual(response.data['assigned'], [{'id': first.id, 'assigned_vet': self.vets[2].id, 'vet_name': 'Vet 2'}])
+        self.assertEqual([row['id'] for row in response.data['failed']], [second.id, third.id, fourth.id])
+        self.assertEqual(self.load(self.vets[2]), 2)
+        self.assertEqual(Appointment.objects.get(id=second.id).status, 'booked')
+        self.assertEqual(OutboxMessage.objects.count(), 2)  # vet assignment and owner confirmation
+
+    def test_loads_match_rebuild(self):
+        from .slots import rebuild_loads
+        self.appointment(13, status='confirmed', vet=self.vets[2])
+        before = sorted(VetDayLoad.objects.filter(appointments__gt=0).values_list('vet_id', 'day', 'appointments'))
+        rebuild_loads(VetSlot, VetDayLoad)
+        self.assertEqual(sorted(VetDayLoad.objects.values_list('vet_id', 'day', 'appointments')), before)
+
+    def test_staff_only(self):
+        session = self.client.session
+        session['user_id'] = self.owner.id
+        session.save()
+        response = self.client.post('/api/appointments/auto-assign/', {'appointments': [1]}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkStatusTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(email='staff@example.com', full_name='Staff', role='staff')
+        self.vets = [User.objects.create(email=f'vet{i}@example.com', full_name=f'Vet {i}', role='vet') for i in range(2)]
+        self.owner = User.objects.create(email='owner@example.com', full_name='Owner')
+        self.pet = Pet.objects.create(user=self.owner, name='Mali', breed='Bangkaew', color='White', birth_date=date(2020, 1, 1))
+        self.monday = clinic_today() + timedelta(days=14)
+        self.monday -= timedelta(days=self.monday.weekday())
+        session = self.client.session
+        session['user_id'] = self.staff.id
+        session.save()
+
+    def appointments(self, *hours):
+        return [
+            Appointment.objects.create(
+                user=self.owner, pet=self.pet, purpose='Check-up', status='booked',
+                date=datetime(self.monday.year, self.monday.month, self.monday.day, hour, tzinfo=CLINIC_TIME_ZONE),
+            )
+            for hour in hours
+        ]
+
+    def post(self, updates):
+        return self.client.post('/api/appointments/bulk-status/', {'updates': updates}, content_type='application/json')
+
+    def test_results_per_item(self):
+        first, second, third, fourth = self.appointments(9, 9, 10, 11)
+        vet = self.vets[0].id
+        response = self.post([
+            {'id': first.id, 'status': 'confirmed', 'assigned_vet': vet},
+            {'id': second.id, 'status': 'confirmed', 'assigned_vet': vet},
+            {'id': third.id, 'status': 'rejected'},
+            {'id': 999, 'status': 'rejected'},
+            {'id': first.id, 'status': 'cancelled'},
+            {'id': fourth.id, 'status': 'confirmed'},
+            {'id': fourth.id, 'status': 'confirmed', 'assigned_vet': self.staff.id},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['ok'] for result in response.data['results']], [True, False, True, False, False, False, False])
+        self.assertIn('already booked', response.data['results'][1]['error'])
+        self.assertEqual(response.data['results'][5]['error'], 'Cannot confirm without assigning a vet.')
+        self.assertEqual(response.data['results'][6]['error'], 'Appointment appears more than once.')
+        self.assertEqual((response.data['updated'], response.data['failed']), (2, 5))
+
+        statuses = dict(Appointment.objects.values_list('id', 'status'))
+        self.assertEqual([statuses[a.id] for a in (first, second, third, fourth)], ['confirmed', 'booked', 'rejected', 'booked'])
+        self.assertEqual(list(VetSlot.objects.values_list('appointment_id', flat=True)), [first.id])
+        self.assertEqual(VetDayLoad.objects.get(vet_id=vet).appointments, 1)
+        # Vet assignment and owner confirmation, plus the rejection.
+        self.assertEqual(OutboxMessage.objects.count(), 3)
+
+    def test_malformed_ids_are_item_errors(self):
+        first, second, third = self.appointments(9, 10, 11)
+        response = self.post([
+            {'id': first.id, 'status': 'confirmed', 'assigned_vet': [self.vets[0].id]},
+            {'id': second.id, 'status': 'confirmed', 'assigned_vet': {'id': self.vets[0].id}},
+            {'id': third.id, 'status': 'confirmed', 'assigned_vet': True},
+            {'id': [first.id], 'status': 'rejected'},
+            {'id': True, 'status': 'rejected'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['failed'], 5)
+        self.assertEqual(
+            [result['error'] for result in response.data['results']],
+            ['assigned_vet must be an integer id or null.'] * 3 + ['Each update needs an integer id.'] * 2,
+        )
+        self.assertFalse(Appointment.objects.exclude(status='booked').exists())
+
+    def test_freed_slot_can_be_taken_in_same_batch(self):
+        first, second = self.appointments(9, 9)
+        vet = self.vets[0].id
+        self.post([{'id': first.id, 'status': 'confirmed', 'assigned_vet': vet}])
+        response = self.post([
+            {'id': first.id, 'status': 'cancelled'},
+            {'id': second.id, 'status': 'confirmed', 'assigned_vet': vet},
+        ])
+        self.assertEqual(response.data['updated'], 2)
+        self.assertEqual(list(VetSlot.objects.values_list('appointment_id', flat=True)), [second.id])
+        self.assertEqual(VetDayLoad.objects.get(vet_id=vet).appointments, 1)
+
+    def test_queries_do_not_grow_with_batch(self):
+        def queries(hours):
+            updates = [
+                {'id': appointment.id, 'status': 'confirmed', 'assigned_vet': self.vets[0].id}
+                for appointment in self.appointments(*hours)
+            ]
+            with CaptureQueriesContext(connection) as captured:
+                results = bulk_update_status(updates)
+            self.assertTrue(all(result['ok'] for result in results))
+            return len(captured)
+        queries([9])  # creates the day's load counter
+        self.assertEqual(queries([10, 11]), queries([13, 14, 15, 16]))
+
+    def test_staff_only(self):
+        session = self.client.session
+        session['user_id'] = self.owner.id
+        session.save()
+        self.assertEqual(self.post([{'id': 1, 'status': 'rejected'}]).status_code, 403)
+
+
+@override_settings(VACCINATION_IMPORT_CHUNK_SIZE=2)
+class VaccinationImportTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(email='staff@example.com', full_name='Staff', role='staff')
+        self.owner = User.objects.create(email='owner@example.com', full_name='Owner')
+        self.pet = Pet.objects.create(user=self.owner, name='Mali', breed='Bangkaew', color='White', birth_date=date(2020, 1, 1))
+        self.rabies = Vaccine.objects.create(name='Rabies')
+        self.records = [
+            {'pet': self.pet.id, 'vaccine': self.rabies.id, 'date': '2025-01-10'},
+            {'pet': str(self.pet.id), 'vaccine': 'rabies', 'date': '2025-02-10', 'remarks': 'Drive'},
+            {'pet': self.pet.id, 'vaccine': 'Rabies', 'date': (clinic_today() + timedelta(days=1)).isoformat()},
+            {'pet': 999, 'vaccine': 'Unknown', 'date': 'yesterday'},
+            'not a record',
+        ]
+
+    def test_endpoint_streams_row_errors(self):
+        session = self.client.session
+        session['user_id'] = self.staff.id
+        session.save()
+        response = self.client.post('/api/vaccinations/bulk/', {'records': self.records}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(lines[-1], {'rows': 5, 'created': 2, 'failed': 3})
+        self.assertEqual([line['row'] for line in lines[:-1]], [3, 4, 5])
+        self.assertEqual(lines[0]['errors'], {'date': ['Vaccination date cannot be in the future.']})
+        self.assertEqual(sorted(lines[1]['errors']), ['date', 'pet', 'vaccine'])
+        self.assertEqual(
+            list(Vaccinated.objects.order_by('date').values_list('vaccine_id', 'remarks')),
+            [(self.rabies.id, None), (self.rabies.id, 'Drive')],
+        )
+
+    def test_numeric_names_do_not_shadow_ids(self):
+        shadow = Vaccine.objects.create(name=str(self.rabies.id))
+        by_name = Vaccine.objects.create(name='9999')
+        importer = VaccinationImport()
+        errors = list(importer.run([
+            {'pet': self.pet.id, 'vaccine': self.rabies.id, 'date': '2025-01-10'},
+            {'pet': self.pet.id, 'vaccine': str(shadow.id), 'date': '2025-01-11'},
+            {'pet': self.pet.id, 'vaccine': '9999', 'date': '2025-01-12'},
+        ]))
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            list(Vaccinated.objects.order_by('date').values_list('vaccine_id', flat=True)),
+            [self.rabies.id, shadow.id, by_name.id],
+        )
+
+    def test_endpoint_requires_staff_or_vet(self):
+        session = self.client.session
+        session['user_id'] = self.owner.id
+        session.save()
+        response = self.client.post('/api/vaccinations/bulk/', {'records': self.records}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_command_reads_jsonl(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source, errors = os.path.join(directory, 'drive.jsonl'), os.path.join(directory, 'errors.jsonl')
+        with open(source, 'w') as f:
+            f.write('\n'.join(json.dumps(record) for record in self.records[:2]) + '\n{broken\n')
+        out = io.StringIO()
+        call_command('import_vaccinations', source, errors=errors, stdout=out)
+        summary = json.loads(out.getvalue())
+        self.assertEqual((summary['rows'], summary['created'], summary['failed']), (3, 2, 1))
+        with open(errors) as f:
+            self.assertEqual(json.loads(f.read())['row'], 3)
+
+
+class OnboardingImportTest(TestCase):
+    FIELDS = ['owner_email', 'owner_full_name', 'owner_password', 'owner_image', 'pet_name', 'pet_breed', 'pet_color', 'pet_birth_date', 'pet_image']
+
+    def setUp(self):
+        User.objects.create(email='staff@example.com', full_name='Staff', role='staff')
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        Image.new('RGB', (8, 8), 'red').save(os.path.join(self.root, 'mali.png'))
+        self.storage = MemoryStorage()
+        swap = minio_service.use_client(self.storage)
+        swap.__enter__()
+        self.addCleanup(swap.__exit__, None, None, None)
+
+    def write_csv(self, rows):
+        path = os.path.join(self.root, 'owners.csv')
+        with open(path, 'w', newline='') as f:
+            f.write(','.join(self.FIELDS) + '\n')
+            for row in rows:
+                f.write(','.join(row) + '\n')
+        return path
+
+    def run_import(self, path, **options):
+        out = io.StringIO()
+        call_command(
+            'import_onboarding', path, image_root=self.root, chunk_size=2, hash_workers=1,
+            errors=os.path.join(self.root, 'errors.jsonl'), stdout=out, **options,
+        )
+        return json.loads(out.getvalue())
+
+    def test_import_and_rerun(self):
+        self.storage.make_bucket(minio_service.bucket_name)
+        path = self.write_csv([
+            ['ann@example.com', 'Ann', 'secret-1', '', 'Mali', 'Bangkaew', 'White', '2020-01-01', 'mali.png'],
+            ['ann@example.com', '', '', '', 'Tiger', 'Siamese', 'Cream', '2021-05-01', ''],
+            ['bob@example.com', 'Bob', '', '', '', '', '', '', ''],
+            ['not-an-email', 'Nobody', '', '', '', '', '', '', ''],
+            ['staff@example.com', 'Staff', '', '', 'Rex', 'Mixed', 'Black', '2019-01-01', ''],
+            ['cat@example.com', 'Cat', '', '', 'Future', 'Mixed', 'Black', '2999-01-01', 'missing.png'],
+        ])
+        summary = self.run_import(path)
+        self.assertEqual(
+            {key: summary[key] for key in ('rows', 'owners_created', 'pets_created', 'images_uploaded', 'failed', 'finished')},
+            {'rows': 6, 'owners_created': 2, 'pets_created': 2, 'images_uploaded': 1, 'failed': 3, 'finished': True},
+        )
+        ann = User.objects.get(email='ann@example.com')
+        self.assertTrue(ann.check_password('secret-1'))
+        self.assertEqual(ann.role, 'client')
+        self.assertFalse(is_password_usable(User.objects.get(email='bob@example.com').password))
+        self.assertEqual(sorted(ann.pets.values_list('name', flat=True)), ['Mali', 'Tiger'])
+        mali = ann.pets.get(name='Mali')
+        self.assertEqual(self.storage.get_object(minio_service.bucket_name, mali.image_key).headers['Content-Type'], 'image/png')
+        with open(os.path.join(self.root, 'errors.jsonl')) as f:
+            errors = [json.loads(line) for line in f]
+        self.assertEqual([error['row'] for error in errors], [4, 5, 6])
+        self.assertEqual(sorted(errors[2]['errors']), ['pet_birth_date', 'pet_image'])
+
+        summary = self.run_import(path)
+        self.assertEqual((summary['resumed_from'], summary['pets_created']), (6, 2))
+        self.assertEqual(Pet.objects.count(), 2)
+
+    def test_shared_image_file_gets_a_key_per_row(self):
+        self.storage.make_bucket(minio_service.bucket_name)
+        path = self.write_csv([
+            ['ann@example.com', 'Ann', '', 'mali.png', 'Mali', 'Bangkaew', 'White', '2020-01-01', 'mali.png'],
+            ['ann@example.com', '', '', '', 'Tiger', 'Siamese', 'Cream', '2021-05-01', 'mali.png'],
+        ])
+        self.assertEqual(self.run_import(path)['images_uploaded'], 3)
+        ann = User.objects.get(email='ann@example.com')
+        mali, tiger = ann.pets.order_by('name')
+        self.assertEqual(len({ann.image_key, mali.image_key, tiger.image_key}), 3)
+        self.assertTrue(minio_service.delete_image(mali.image_key))
+        for key in (ann.image_key, tiger.image_key):
+            self.assertEqual(self.storage.get_object(minio_service.bucket_name, key).headers['Content-Type'], 'image/png')
+
+    def test_resumes_after_failed_upload(self):
+        path = self.write_csv([
+            ['ann@example.com', 'Ann', '', '', 'Tiger', 'Siamese', 'Cream', '2021-05-01', ''],
+            ['ann@example.com', '', '', '', 'Milo', 'Mixed', 'Black', '2021-05-01', ''],
+            ['bob@example.com', 'Bob', '', '', 'Mali', 'Bangkaew', 'White', '2020-01-01', 'mali.png'],
+        ])
+        # No bucket yet, so the second chunk's upload fails.
+        with self.assertRaisesRegex(CommandError, 'Rows up to 2 are committed'):
+            self.run_import(path)
+        self.assertEqual(ImportCheckpoint.objects.get().rows_done, 2)
+        self.assertEqual(Pet.objects.count(), 2)
+
+        self.storage.make_bucket(minio_service.bucket_name)
+        summary = self.run_import(path)
+        self.assertEqual((summary['resumed_from'], summary['owners_created'], summary['pets_created']), (2, 2, 3))
+        self.assertEqual(Pet.objects.count(), 3)
+
+    @override_settings(ONBOARDING_HASH_WORKERS=1)
+    def test_staff_api(self):
+        client_user = User.objects.create(email='owner@example.com', full_name='Owner')
+        rows = [
+            {'owner_email': 'dee@example.com', 'owner_full_name': 'Dee', 'pet_name': 'Mali', 'pet_breed': 'Bangkaew',
+             'pet_color': 'White', 'pet_birth_date': '2020-01-01'},
+            {'owner_email': 'eve@example.com', 'owner_fullname': 'Eve'},
+        ]
+        upload = SimpleUploadedFile('owners.jsonl', '\n'.join(json.dumps(row) for row in rows).encode())
+        session = self.client.session
+        session['user_id'] = client_user.id
+        session.save()
+        self.assertEqual(self.client.post('/api/users/import/', {'file': upload}).status_code, 403)
+
+        session['user_id'] = User.objects.get(role='staff').id
+        session.save()
+        upload.seek(0)
+        response = self.client.post('/api/users/import/', {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(lines[0], {'row': 2, 'errors': {'non_field_errors': ['Unknown columns: owner_fullname.']}})
+        self.assertEqual((lines[-1]['owners_created'], lines[-1]['pets_created'], lines[-1]['failed']), (1, 1, 1))
+        self.assertTrue(lines[-1]['checkpoint'].startswith('onboarding:sha256:'))
+
+
+class DayRangeQueryTest(TestCase):
+    # Plans captured on SQLite and PostgreSQL live in fixtures/explain/, one
+    # file per backend; the SQLite ones only stand in for the Postgres plans
+    # this targets. On other backends the test only checks that the
+    # composite index is chosen.
+    PLAN_VENDORS = ('sqlite', 'postgresql')
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def fixture_plan(self, name):
+        path = os.path.join(os.path.dirname(__file__), 'fixtures', 'explain', f'{name}.{connection.vendor}.txt')
+        with open(path) as f:
+            return self.normalize(f.read())
+
+    def normalize(self, plan):
+        # Drop SQLite's node ids and Postgres' cost estimates, which shift
+        # with unrelated query and statistics changes.
+        return [
+            re.sub(r'  \(cost=[^)]*\)', '', re.sub(r'^\d+ \d+ \d+ ', '', line)).rstrip()
+            for line in plan.strip().splitlines()
+        ]
+
+    def test_day_range_is_half_open_in_clinic_time(self):
+        start, end = day_range(date(2026, 1, 5))
+        self.assertEqual(start.isoformat(), '2026-01-05T00:00:00+07:00')
+        self.assertEqual(end.isoformat(), '2026-01-06T00:00:00+07:00')
+
+    def test_reminder_query_seeks_status_and_date(self):
+        plan = self.plan(due_reminders(date(2026, 1, 5)))
+        self.assertIn('appointment_status_date_idx', plan)
+        if connection.vendor in self.PLAN_VENDORS:
+            self.assertEqual(self.normalize(plan), self.fixture_plan('due_reminders'))
+            # The old date__date filter could only use the status prefix.
+            legacy = self.plan(Appointment.objects.filter(status='confirmed', date__date=date(2026, 1, 5)))
+            self.assertEqual(self.normalize(legacy), self.fixture_plan('date_cast'))
+
+    def test_postgres_seeks_date_only_without_cast(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('PostgreSQL plan')
+        plan = self.plan(due_reminders(date(2026, 1, 5)))
+        self.assertRegex(plan, r'Index Scan using appointment_status_date_idx.*\n\s+Index Cond: .*date >= .*date < ')
+        # With the cast, the date can only be checked row by row.
+        legacy = self.plan(Appointment.objects.filter(status='confirmed', date__date=date(2026, 1, 5)))
+        self.assertRegex(legacy, r"Filter: .*::date = '2026-01-05'::date")
+        self.assertNotRegex(legacy, r'Index Cond: .*date')
+
+
+class AppointmentRankTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(email='owner@example.com', full_name='Owner')
+        self.pet = Pet.objects.create(user=self.owner, name='Mali', breed='Bangkaew', color='White', birth_date=date(2020, 1, 1))
+
+    def test_rank_follows_status_even_on_bulk_update(self):
+        when = timezone.make_aware(datetime(2026, 1, 5, 10, 30))
+        for status in ('rejected', 'completed', 'booked', 'confirmed', 'cancelled'):
+            Appointment.objects.create(user=self.owner, pet=self.pet, purpose='Check-up', date=when, status=status)
+        ordered = Appointment.objects.order_by('status_rank', 'date').values_list('status', flat=True)
+        self.assertEqual(list(ordered), Appointment.STATUS_ORDER)
+
+        Appointment.objects.filter(status='booked').update(status='rejected')
+        self.assertEqual(list(Appointment.objects.filter(status='rejected').values_list('status_rank', flat=True)), [5, 5])
+
+    def test_role_lists_are_read_in_index_order(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('plan text is SQLite specific')
+        for queryset in (
+            Appointment.objects.all(),
+            Appointment.objects.filter(user=self.owner),
+            Appointment.objects.filter(assigned_vet=self.owner),
+        ):
+            plan = queryset.order_by('status_rank', 'date').explain()
+            self.assertIn('_rank_date_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+@override_settings(API_PAGE_SIZE=4)
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(email='staff@example.com', full_name='Staff', role='staff')
+        owner = User.objects.create(email='owner@example.com', full_name='Owner')
+        pet = Pet.objects.create(user=owner, name='Mali', breed='Bangkaew', color='White', birth_date=date(2020, 1, 1))
+        vaccine = Vaccine.objects.create(name='Rabies')
+        base = timezone.make_aware(datetime(2026, 1, 5, 10, 0))
+        for i in range(11):
+            # Repeated statuses and dates so the id tie-breaker matters.
+            status = ('booked', 'confirmed', 'completed')[i % 3]
+            Appointment.objects.create(user=owner, pet=pet, purpose='Check-up', date=base + timedelta(hours=i % 2), status=status)
+            Vaccinated.objects.create(pet=pet, vaccine=vaccine, date=date(2026, 1, 1 + i % 3))
+        session = self.client.session
+        session['user_id'] = self.staff.id
+        session.save()
+
+    def walk(self, url):
+        ids, cursor, query_counts = [], None, set()
+        while True:
+            response = self.client.get(url, {'cursor': cursor} if cursor else {})
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            query_counts.add(response['X-Query-Count'])
+            cursor = response.data['next_cursor']
+            if not cursor:
+                return ids, query_counts
+
+    def test_appointment_pages_follow_status_rank_date_id(self):
+        ids, query_counts = self.walk('/api/appointments/')
+        expected = list(Appointment.objects.order_by('status_rank', 'date', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(query_counts), 1)
+
+    def test_vaccination_pages_follow_date_desc_id(self):
+        ids, _ = self.walk('/api/vaccinations/')
+        expected = list(Vaccinated.objects.order_by('-date', 'id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get('/api/appointments/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_on_boolean_key_round_trips(self):
+        User.objects.create(email='inactive@example.com', full_name='Inactive', active=False)
+        ids, cursor = [], None
+        while True:
+            request = RequestFactory().get('/', {'page_size': 1, **({'cursor': cursor} if cursor else {})})
+            rows, cursor = keyset_page(User.objects.all(), ['-active', 'id'], request)
+            ids += [row.id for row in rows]
+            if not cursor:
+                break
+        self.assertEqual(ids, list(User.objects.order_by('-active', 'id').values_list('id', flat=True)))
+        # A boolean only stands for a BooleanField key, and only booleans do.
+        for values in ([1, ids[0]], [True, True]):
+            request = RequestFactory().get('/', {'cursor': encode_cursor(values)})
+            with self.assertRaises(InvalidCursor):
+                keyset_page(User.objects.all(), ['-active', 'id'], request)
+
+    def test_cursor_with_null_or_wrong_length_is_rejected(self):
+        date_value = timezone.make_aware(datetime(2026, 1, 5, 10, 0))
+        for values in ([1, None, 5], [1, date_value], [1, date_value, 5, 6], [1, [date_value.isoformat()], 5], [True, date_value, 5]):
+            response = self.client.get('/api/appointments/', {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400, values)
+
+
+class AppointmentDetailQueryTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(email='staff@example.com', full_name='Staff', role='staff')
+        vet = User.objects.create(email='vet@example.com', full_name='Vet', role='vet')
+        owner = User.objects.create(email='owner@example.com', full_name='Owner')
+        self.pet = Pet.objects.create(user=owner, name='Mali', breed='Bangkaew', color='White', birth_date=date(2020, 1, 1))
+        self.appointment = Appointment.objects.create(
+            user=owner, pet=self.pet, assigned_vet=vet, purpose='Check-up',
+            date=timezone.make_aware(datetime(2026, 1, 5, 10, 0)), status='completed',
+        )
+        session = self.client.session
+        session['user_id'] = self.staff.id
+        session.save()
+
+    def add_treatments(self, count):
+        for i in range(count):
+            vaccine = Vaccine.objects.create(name=f'Vaccine {i}')
+            Treatment.objects.create(appointment=self.appointment, service=Service.objects.create(title='getVaccine'), vaccine=vaccine)
+            Treatment.objects.create(appointment=self.appointment, service=Service.objects.create(title=f'Service {i}'))
+            Vaccinated.objects.create(pet=self.pet, vaccine=vaccine, date=date(2026, 1, 1))
+
+    def test_query_count_is_flat_in_treatments(self):
+        url = f'/api/appointments/{self.appointment.id}/'
+        self.add_treatments(1)
+        small = self.client.get(url)
+        self.add_treatments(5)
+        large = self.client.get(url)
+        self.assertEqual(large.status_code, 200)
+        self.assertEqual(large.data['total_treatments'], 12)
+        self.assertEqual(large.data['total_vaccinations'], 6)
+        self.assertEqual(small['X-Query-Count'], large['X-Query-Count'])
+        treatments = large.data['treatments']
+        self.assertEqual((treatments[0]['service'], treatments[0]['vaccine']), ('getVaccine', 'Vaccine 0'))
+        self.assertEqual((treatments[1]['service'], treatments[1]['vaccine']), ('Service 0', None))
+        self.assertEqual(large.data['assigned_vet']['full_name'], 'Vet')
+
+    def test_owner_and_vet_sign_only_thumbnails(self):
+        User.objects.filter(role__in=['client', 'vet']).update(image_key='users/face.jpg')
+        with mock.patch.object(minio_service, 'get_image_url', return_value='https://img/x') as get_image_url:
+            response = self.client.get(f'/api/appointments/{self.appointment.id}/')
+        signed = [call.args[0] for call in get_image_url.call_args_list]
+        self.assertNotIn('users/face.jpg', signed)
+        self.assertEqual(signed.count(variant_key('users/face.jpg', 'thumb')), 2)
+        for key in ('user', 'assigned_vet'):
+            self.assertEqual(
+                set(response.data[key]), {'id', 'email', 'full_name', 'phone_number', 'role', 'image_thumb_url'},
+            )
+
+
+class BenchmarkCommandTest(TestCase):
+    def test_seed_then_bench(self):
+        out = io.StringIO()
+        call_command('seed_clinic', clients=4, vets=2, staff=1, years=1, end_date=date(2026, 1, 31), stdout=out)
+        counts = json.loads(out.getvalue())
+        self.assertEqual((counts['users'], counts['pets'], counts['appointments']), (7, 8, 32))
+        self.assertEqual(Appointment.objects.count(), 32)
+
+        out = io.StringIO()
+        call_command('bench_endpoints', requests=2, warmup=0, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['endpoints']), {
+            'appointment_list', 'appointment_list_vet', 'appointment_list_client', 'appointment_detail',
+            'pet_list', 'pet_list_client', 'pet_detail', 'vaccination_list', 'user_history',
+        })
+        for name, result in report['endpoints'].items():
+            self.assertEqual(result['status'], {'200': 2}, name)
+
+
+class UserListTest(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create(email='staff@example.com', full_name='Staff', role='staff')
+        for i, name in enumerate(['Anong', 'Arthit', 'Boonmee', 'Chai', 'Apinya']):
+            User.objects.create(email=f'{name.lower()}@example.com', full_name=name, phone_number=f'08100000{i}', image_key=f'users/{i}.jpg')
+        User.objects.create(email='inactive@example.com', full_name='Aree', active=False)
+        session = self.client.session
+        session['user_id'] = self.staff.id
+        session.save()
+
+    def test_only_the_current_page_is_signed(self):
+        with mock.patch.object(minio_service, 'get_image_url', return_value='https://img/x') as get_image_url:
+            response = self.client.get('/api/users/client/', {'page_size': 2})
+        self.assertEqual([row['full_name'] for row in response.data['results']], ['Anong', 'Apinya'])
+        self.assertIsNotNone(response.data['next_cursor'])
+        # image_url and image_thumb_url for each of the two rows
+        self.assertEqual(get_image_url.call_count, 4)
+
+    def test_cursor_walks_every_page(self):
+        # The /api/users/ ordering starts on the boolean active column.
+        for url in ('/api/users/', '/api/users/client/'):
+            ids, cursor = [], None
+            with mock.patch.object(minio_service, 'get_image_url', return_value=None):
+                while True:
+                    response = self.client.get(url, {'page_size': 2, **({'cursor': cursor} if cursor else {})})
+                    self.assertEqual(response.status_code, 200)
+                    ids += [row['id'] for row in response.data['results']]
+                    cursor = response.data['next_cursor']
+                    if not cursor:
+                        break
+            expected = User.objects.all() if url == '/api/users/' else User.objects.filter(role='client', active=True)
+            self.assertEqual(sorted(ids), sorted(expected.values_list('id', flat=True)))
+            self.assertEqual(len(ids), len(set(ids)))
+
+    def test_prefix_search_and_filters(self):
+        with mock.patch.object(minio_service, 'get_image_url', return_value=None):
+            by_name = self.client.get('/api/users/', {'search': 'a', 'role': 'client', 'active': 'true'})
+            by_phone = self.client.get('/api/users/client/', {'search': '081000003'})
+            everyone = self.client.get('/api/users/', {'search': 'a'})
+        self.assertEqual([row['full_name'] for row in by_name.data['results']], ['Anong', 'Apinya', 'Arthit'])
+        self.assertEqual([row['full_name'] for row in by_phone.data['results']], ['Chai'])
+        # Active users first, then role and name.
+        self.assertEqual([row['full_name'] for row in everyone.data['results']], ['Anong', 'Apinya', 'Arthit', 'Aree'])
@@ -0,0 +1,66 @@
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class RequestTimings:
+    # Per-request counters. Installed as a connection execute_wrapper it
+    # counts and times every query; track() adds the time of other blocks
+    # (MinIO calls, response rendering) run on the same thread.
+    def __init__(self, keep_sql=False):
+        self.queries = 0
+        self.durations = {}
+        self.sql = [] if keep_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.add('db', elapsed)
+            if self.sql is not None:
+                self.sql.append((elapsed, sql))
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def milliseconds(self, total):
+        spent = {name: self.durations.get(name, 0.0) * 1000 for name in ('db', 'minio', 'render')}
+        spent['app'] = max(total * 1000 - sum(spent.values()), 0.0)
+        spent['total'] = total * 1000
+        return spent
+
+    def server_timing(self, total):
+        spent = self.milliseconds(total)
+        return ', '.join(
+            f'{name};dur={duration:.1f}' + (f';desc="{self.queries} queries"' if name == 'db' else '')
+            for name, duration in spent.items()
+        )
+
+
+@contextmanager
+def collect(timings):
+    previous = getattr(_local, 'timings', None)
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+@contextmanager
+def track(name):
+    # No-op outside a request (scheduler jobs, email workers, commands).
+    timings = getattr(_local, 'timings', None)
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     # User management
     path('users/', views.UserView.as_view(), name='user_list'),
+    path('users/import/', views.OnboardingImportView.as_view(), name='onboarding_import'),
     path('users/<int:user_id>/', views.UserDetailView.as_view(), name='user_detail'),
     path('users/<str:role>/', views.UserViewByRole.as_view(), name='user_list_by_role'),
     
@@ -17,6 +18,7 @@ urlpatterns = [
     
     # Vaccination records management
     path('vaccinations/', views.VaccinatedView.as_view(), name='vaccination_list_create'),
+    path('vaccinations/bulk/', views.VaccinatedBulkView.as_view(), name='vaccination_bulk_create'),
     path('vaccinations/<int:vaccination_id>/', views.VaccinatedDetailView.as_view(), name='vaccination_detail'),
     
     # Authentication
@@ -34,6 +36,9 @@ urlpatterns = [
     # Appointment
     path('appointments/', views.AppointmentView.as_view(), name='appointment'),
     path('appointments/book/', views.BookAppointmentView.as_view(), name='book_appointment'),
+    path('appointments/availability/', views.AvailabilityView.as_view(), name='appointment_availability'),
+    path('appointments/auto-assign/', views.AutoAssignView.as_view(), name='auto_assign_appointments'),
+    path('appointments/bulk-status/', views.BulkStatusView.as_view(), name='bulk_status_appointments'),
     path('appointments/<int:appointment_id>/', views.AppointmentDetailView.as_view(), name='view_appointment'),
 
     path('appointments/updatestatus/<int:appointment_id>/', views.UpdateStatusAppointmentView.as_view(), name='updatestatus_appointment'),
@@ -42,5 +47,9 @@ urlpatterns = [
     path('appointments/treatment/<int:appointment_id>/', views.UpdateTreatmentView.as_view(), name='treatment_appointment'),
 
     # Treatment history
-    path('treatments/<int:user_id>/', views.UserHistoryView.as_view(), name='treatment_list')
+    path('treatments/<int:user_id>/', views.UserHistoryView.as_view(), name='treatment_list'),
+
+    # Monitoring
+    path('health/', views.HealthView.as_view(), name='health'),
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
@@ -1,30 +1,61 @@
+import hashlib
+import io
+import json
+import os
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, JSONParser
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import transaction
-from django.db.models import Case, When, Value, IntegerField
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Prefetch, Q
+from django.http import HttpResponse, StreamingHttpResponse
+from datetime import date, timedelta
+from secrets import compare_digest
+from . import metrics
 from .models import *
 from .serializers import *
 from .services import *
+from .pagination import InvalidCursor, keyset_page
+from .assignment import auto_assign_many
+from .bulk import VaccinationImport, bulk_update_status, read_records
+from .onboarding import OnboardingError, OnboardingImport
+from .slots import SlotUnavailable, availability, slot_minutes
 
 """Pattrapol Yaowaraj 66070148"""
 
+def search_users(users, request):
+    # Prefix match on name, email or phone; each branch has an index
+    # (see migration 0008), a substring match could not use one.
+    search = request.GET.get('search', '').strip()
+    if search:
+        users = users.filter(
+            Q(full_name__istartswith=search) | Q(email__istartswith=search) | Q(phone_number__startswith=search)
+        )
+    return users
+
 class UserView(APIView):
     def get(self, request):
         try:
             user_service = get_user_service(request)
             user_service.check_authentication()
-            role = request.GET.get('roles')
+            role = request.GET.get('role') or request.GET.get('roles')
 
             if not user_service.is_staff():
                 return Response({'error': 'Staff access required'}, status=status.HTTP_403_FORBIDDEN)
 
-            users = User.objects.all().order_by('-active', 'role')
-            if role and (role == "client"):
-                users = users.filter(role='client')
+            users = User.objects.all()
+            if role:
+                users = users.filter(role=role)
+            active = request.GET.get('active')
+            if active in ('true', 'false'):
+                users = users.filter(active=(active == 'true'))
+            users, next_cursor = keyset_page(search_users(users, request), ['-active', 'role', 'full_name', 'id'], request)
+            # Only the rows on this page get their image URLs signed.
             serializer = UserSerializer(users, many=True)
-            return Response(serializer.data)
+            return Response({'results': serializer.data, 'next_cursor': next_cursor})
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except PermissionError as e:
             return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -74,7 +105,8 @@ class UserDetailView(APIView):
                         'phone_number': updated_user.phone_number,
                         'role': updated_user.role,
                         'active': updated_user.active,
-                        'image_url': updated_user.get_image_url()
+                        'image_url': updated_user.get_image_url(),
+                        'image_thumb_url': updated_user.get_image_thumb_url()
                     }
                 }, status=status.HTTP_200_OK)
             
@@ -136,7 +168,8 @@ class LoginView(APIView):
                     'email': user.email,
                     'full_name': user.full_name,
                     'role': user.role,
-                    'image_url': user.get_image_url()
+                    'image_url': user.get_image_url(),
+                    'image_thumb_url': user.get_image_thumb_url()
                 }
             }, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -162,6 +195,54 @@ class RegisterView(APIView):
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class OnboardingImportView(APIView):
+    # Staff: multipart upload of a CSV or JSONL "file" laid out as for
+    # import_onboarding ("format" defaults to the extension). Image paths
+    # resolve under ONBOARDING_IMAGE_ROOT. Progress is saved under
+    # "checkpoint", by default a digest of the file, so uploading the same
+    # file after a failure resumes it; "restart" starts over. Streams NDJSON
+    # like VaccinatedBulkView and ends with the summary, which has "error"
+    # if the import stopped early.
+    def post(self, request):
+        try:
+            user_service = get_user_service(request)
+            user_service.check_authentication()
+            if not user_service.is_staff():
+                return Response({'error': 'Staff access required'}, status=status.HTTP_403_FORBIDDEN)
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': 'Upload the rows as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+            fmt = request.data.get('format') or os.path.splitext(upload.name)[1].lstrip('.').lower()
+            if fmt not in ('csv', 'jsonl'):
+                return Response({'error': 'format must be csv or jsonl'}, status=status.HTTP_400_BAD_REQUEST)
+            checkpoint = request.data.get('checkpoint')
+            if not checkpoint:
+                digest = hashlib.sha256()
+                for block in upload.chunks():
+                    digest.update(block)
+                checkpoint = f'onboarding:sha256:{digest.hexdigest()}'
+            upload.seek(0)
+
+            importer = OnboardingImport(
+                checkpoint=checkpoint,
+                image_root=getattr(settings, 'ONBOARDING_IMAGE_ROOT', None),
+                restart=str(request.data.get('restart', '')).lower() in ('1', 'true', 'yes'),
+            )
+            rows = read_records(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''), fmt)
+
+            def lines():
+                summary = {}
+                try:
+                    for error in importer.run(rows):
+                        yield json.dumps(error) + '\n'
+                except OnboardingError as e:
+                    summary['error'] = str(e)
+                yield json.dumps({**importer.summary(), **summary, 'checkpoint': checkpoint}) + '\n'
+
+            return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+        except PermissionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
 class UserProfileView(APIView):
     def get(self, request):
         try:
@@ -404,7 +485,7 @@ class VaccinatedView(APIView):
             owner_id = request.GET.get('owner_id')
             date = request.GET.get('date')
 
-            queryset = Vaccinated.objects.select_related('pet', 'vaccine', 'pet__user').order_by('-date')
+            queryset = Vaccinated.objects.select_related('pet', 'vaccine', 'pet__user')
 
             if pet_id:
                 queryset = queryset.filter(pet_id=pet_id)
@@ -418,8 +499,11 @@ class VaccinatedView(APIView):
             if not user_service.is_staff() and not user_service.is_vet():
                 queryset = queryset.filter(pet__user_id=user_service.user_id)
             
-            serializer = VaccinatedListSerializer(queryset, many=True)
-            return Response(serializer.data)
+            vaccinations, next_cursor = keyset_page(queryset, ['-date', 'id'], request)
+            serializer = VaccinatedListSerializer(vaccinations, many=True)
+            return Response({'results': serializer.data, 'next_cursor': next_cursor})
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except PermissionError as e:
             return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
     
@@ -442,6 +526,36 @@ class VaccinatedView(APIView):
         except PermissionError as e:
             return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
 
+class VaccinatedBulkView(APIView):
+    # Staff/vet: {"records": [{pet, vaccine, date, remarks}, ...]}. Streams
+    # NDJSON: one {"row", "errors"} line per rejected record as its chunk
+    # is checked, then {"rows", "created", "failed"}. Valid records are
+    # saved even when others are rejected.
+    MAX_RECORDS = 10000
+
+    def post(self, request):
+        try:
+            user_service = get_user_service(request)
+            user_service.check_authentication()
+            if not user_service.is_staff() and not user_service.is_vet():
+                return Response({'error': 'Staff or vet access required to create vaccination records'}, status=status.HTTP_403_FORBIDDEN)
+            records = request.data.get('records') if isinstance(request.data, dict) else None
+            if not isinstance(records, list) or not records:
+                return Response({'error': 'records must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+            if len(records) > self.MAX_RECORDS:
+                return Response({'error': f'At most {self.MAX_RECORDS} records at a time; use import_vaccinations for files'}, status=status.HTTP_400_BAD_REQUEST)
+
+            importer = VaccinationImport()
+
+            def lines():
+                for error in importer.run(records):
+                    yield json.dumps(error) + '\n'
+                yield json.dumps(importer.summary()) + '\n'
+
+            return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+        except PermissionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
 class VaccinatedDetailView(APIView):
     def get(self, request, vaccination_id):
         try:
@@ -478,9 +592,12 @@ class UserViewByRole(APIView):
             users = User.objects.filter(active=True)
             if role in ['client', 'staff', 'vet']:
                 users = users.filter(role=role)
+                users, next_cursor = keyset_page(search_users(users, request), ['full_name', 'id'], request)
                 serializer = UserSerializer(users, many=True)
-                return Response(serializer.data)
+                return Response({'results': serializer.data, 'next_cursor': next_cursor})
             return Response({'error': f'Role {role} not found'}, status=status.HTTP_404_NOT_FOUND)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except PermissionError as e:
             return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -592,12 +709,13 @@ class BookAppointmentView(APIView):
                 request.data['user'] = user_service.get_user().id
             serializer = BookAppointmentSerializer(data=request.data, context={'request': request})
             if serializer.is_valid():
-                app = serializer.save()
-                email_service = EmailService()
-                if not app.assigned_vet:
-                    send_email_async(email_service.send_appointment_notification, app)
-                else:
-                    send_email_async(email_service.send_appointment_status_update, app, "confirmed")
+                with transaction.atomic():
+                    app = serializer.save()
+                    email_service = EmailService()
+                    if not app.assigned_vet:
+                        queue_email(email_service.send_appointment_notification, app)
+                    else:
+                        queue_email(email_service.send_appointment_status_update, app, "confirmed")
                 return Response(BookAppointmentSerializer(app).data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except PermissionError as e:
@@ -619,29 +737,136 @@ class BookAppointmentView(APIView):
         except PermissionError as e:
             return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
         
-class AppointmentView(APIView):
+class AvailabilityView(APIView):
+    # Free slots of one vet (?vet=) or every active vet between two clinic
+    # days, both inclusive (?from=&to=, default: the next seven days).
+    MAX_DAYS = 31
+
     def get(self, request):
         try:
             user_service = get_user_service(request)
             user_service.check_authentication()
-            if user_service.is_staff():
-                appointment = Appointment.objects.all().select_related('user')
-            elif user_service.is_vet():
-                appointment = Appointment.objects.filter(assigned_vet=user_service.get_user()).select_related('user')
+            try:
+                first_day = date.fromisoformat(request.GET['from']) if request.GET.get('from') else clinic_today()
+                last_day = date.fromisoformat(request.GET['to']) if request.GET.get('to') else first_day + timedelta(days=6)
+            except ValueError:
+                return Response({'error': 'from and to must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+            if not 0 <= (last_day - first_day).days < self.MAX_DAYS:
+                return Response({'error': f'to must be on or after from and at most {self.MAX_DAYS} days later'}, status=status.HTTP_400_BAD_REQUEST)
+            vets = User.objects.filter(role='vet', active=True).order_by('full_name', 'id')
+            vet_id = request.GET.get('vet')
+            if vet_id:
+                vets = vets.filter(id=vet_id) if vet_id.isdigit() else vets.none()
+            vets = list(vets.only('id', 'full_name'))
+            if vet_id and not vets:
+                return Response({'error': 'Veterinarian not found'}, status=status.HTTP_404_NOT_FOUND)
+            free = availability(vets, first_day, last_day)
+            return Response({
+                'from': first_day,
+                'to': last_day,
+                'slot_minutes': slot_minutes(),
+                'vets': [
+                    {'id': vet.id, 'full_name': vet.full_name, 'free_slots': free[vet.id]}
+                    for vet in vets
+                ],
+            })
+        except PermissionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+class AutoAssignView(APIView):
+    # Staff: confirm booked appointments with the least-loaded free vet,
+    # either {"appointments": [ids]} or every booked one on {"date": "YYYY-MM-DD"}.
+    MAX_APPOINTMENTS = 500
+
+    def post(self, request):
+        try:
+            user_service = get_user_service(request)
+            user_service.check_authentication()
+            if not user_service.is_staff():
+                return Response({'error': 'Staff access required'}, status=status.HTTP_403_FORBIDDEN)
+            appointments = Appointment.objects.select_related('user', 'pet')
+            ids, day = request.data.get('appointments'), request.data.get('date')
+            if ids is not None:
+                if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                    return Response({'error': 'appointments must be a list of ids'}, status=status.HTTP_400_BAD_REQUEST)
+                appointments = appointments.filter(id__in=ids)
+            elif day:
+                try:
+                    start, end = day_range(date.fromisoformat(day))
+                except (TypeError, ValueError):
+                    return Response({'error': 'date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+                appointments = appointments.filter(status='booked', date__gte=start, date__lt=end)
             else:
-                appointment = Appointment.objects.filter(user=user_service.get_user())
-            appointment = appointment.annotate(
-                status_order= Case(
-                    When(status='booked', then=Value(1)),
-                    When(status='confirmed', then=Value(2)),
-                    When(status='completed', then=Value(3)),
-                    When(status='cancelled', then=Value(4)),
-                    When(status='rejected', then=Value(5)),
-                    output_field=IntegerField(),
-                )
-            ).order_by('status_order', 'date')
-            serializer = AppointmentListSerializer(appointment, many=True)
-            return Response(serializer.data)
+                return Response({'error': 'Provide appointments or date'}, status=status.HTTP_400_BAD_REQUEST)
+            appointments = list(appointments.order_by('date', 'id')[:self.MAX_APPOINTMENTS + 1])
+            if len(appointments) > self.MAX_APPOINTMENTS:
+                return Response({'error': f'At most {self.MAX_APPOINTMENTS} appointments at a time'}, status=status.HTTP_400_BAD_REQUEST)
+
+            email_service = EmailService()
+            assigned, failed = auto_assign_many(
+                appointments,
+                on_assigned=lambda app: queue_email(email_service.send_appointment_status_update, app, 'booked'),
+            )
+            found = {app.id for app in appointments}
+            failed += [{'id': i, 'error': 'Appointment not found'} for i in ids or [] if i not in found]
+            return Response({'assigned': assigned, 'failed': failed})
+        except PermissionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+class BulkStatusView(APIView):
+    # Staff: {"updates": [{"id", "status", "assigned_vet"}, ...]} applied in
+    # one transaction; the response has one result per update, in order.
+    MAX_UPDATES = 500
+
+    def post(self, request):
+        try:
+            user_service = get_user_service(request)
+            user_service.check_authentication()
+            if not user_service.is_staff():
+                return Response({'error': 'Staff access required'}, status=status.HTTP_403_FORBIDDEN)
+            updates = request.data.get('updates') if isinstance(request.data, dict) else None
+            if not isinstance(updates, list) or not updates:
+                return Response({'error': 'updates must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+            if len(updates) > self.MAX_UPDATES:
+                return Response({'error': f'At most {self.MAX_UPDATES} updates at a time'}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                results = bulk_update_status(updates)
+            except SlotUnavailable as e:
+                # Another request took a slot after validation; nothing was applied.
+                return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+            return Response({
+                'updated': sum(1 for result in results if result['ok']),
+                'failed': sum(1 for result in results if not result['ok']),
+                'results': results,
+            })
+        except PermissionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+
+class AppointmentView(APIView):
+    def get(self, request):
+        try:
+            user_service = get_user_service(request)
+            user_service.check_authentication()
+            appointment = Appointment.objects.select_related('user', 'pet', 'assigned_vet')
+            if user_service.is_vet():
+                appointment = appointment.filter(assigned_vet=user_service.get_user())
+            elif not user_service.is_staff():
+                appointment = appointment.filter(user=user_service.get_user())
+            day = request.GET.get('date')
+            if day:
+                try:
+                    start, end = day_range(date.fromisoformat(day))
+                except ValueError:
+                    return Response({'error': 'date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+                appointment = appointment.filter(date__gte=start, date__lt=end)
+            appointment_status = request.GET.get('status')
+            if appointment_status:
+                appointment = appointment.filter(status__in=appointment_status.split(','))
+            appointments, next_cursor = keyset_page(appointment, ['status_rank', 'date', 'id'], request)
+            serializer = AppointmentListSerializer(appointments, many=True)
+            return Response({'results': serializer.data, 'next_cursor': next_cursor})
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except PermissionError as e:
             return Response({'error': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -653,38 +878,41 @@ class AppointmentDetailView(APIView):
             user_service = get_user_service(request)
             user_service.check_authentication()
             
-            appointment = Appointment.objects.get(id=appointment_id)
-            
-            if (user_service.is_client() and (appointment.user != user_service.get_user())):
+            # Owner, pet (+ owner), vet, treatments (+ service, vaccine) and the
+            # pet's vaccinations (+ vaccine) in four queries, whatever the size.
+            appointment = Appointment.objects.select_related('user', 'pet__user', 'assigned_vet').prefetch_related(
+                Prefetch('treatments', queryset=Treatment.objects.select_related('service', 'vaccine').order_by('id')),
+                Prefetch('pet__vaccinations', queryset=Vaccinated.objects.select_related('vaccine').order_by('-date')),
+            ).get(id=appointment_id)
+
+            if (user_service.is_client() and (appointment.user_id != user_service.user_id)):
                 return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
 
             serializer = AppointmentSerializer(appointment)
-            pet = Pet.objects.select_related('user').get(id=appointment.pet.id)
-            treatment = Treatment.objects.filter(appointment=appointment)
-            user = appointment.user
+            pet = appointment.pet
             assgned_vet = appointment.assigned_vet
-            vaccinations = Vaccinated.objects.filter(pet=pet).select_related('vaccine').order_by('-date')
-            owner_serializer = UserSerializer(user)
-            vet_serializer = UserSerializer(assgned_vet)
-            pet_serializer = PetSerializer(pet)
+            vaccinations = pet.vaccinations.all()
             vaccination_serializer = VaccinatedSerializer(vaccinations, many=True)
-            treatment_serializer = TreatmentSerializer(treatment, many=True)
-            treatment = treatment_serializer.data.copy()
-            for i in treatment:
-                i['service'] = Service.objects.get(id=i['service']).title
-                if i.get('vaccine'):
-                    i['vaccine'] = Vaccine.objects.get(id=i['vaccine']).name
+            treatments = [
+                {
+                    'id': treatment.id,
+                    'appointment': treatment.appointment_id,
+                    'description': treatment.description,
+                    'service': treatment.service.title if treatment.service else None,
+                    'vaccine': treatment.vaccine.name if treatment.vaccine else None,
+                }
+                for treatment in appointment.treatments.all()
+            ]
 
-            
             response_data = serializer.data.copy()
             # Vet view pet detail & vaccinate
-            response_data['pet'] = pet_serializer.data
-            response_data['user'] = owner_serializer.data
-            response_data['assigned_vet'] = vet_serializer.data if assgned_vet else None
+            response_data['pet'] = PetSerializer(pet).data
+            response_data['user'] = UserSummarySerializer(appointment.user).data
+            response_data['assigned_vet'] = UserSummarySerializer(assgned_vet).data if assgned_vet else None
             response_data['vaccinations'] = vaccination_serializer.data
             response_data['total_vaccinations'] = len(vaccination_serializer.data)
-            response_data['treatments'] = treatment_serializer.data
-            response_data['total_treatments'] = len(treatment_serializer.data)
+            response_data['treatments'] = treatments
+            response_data['total_treatments'] = len(treatments)
             # Client view Treatment 
             return Response(response_data)
         except Appointment.DoesNotExist:
@@ -702,10 +930,11 @@ class UpdateStatusAppointmentView(APIView):
             serializer = UpdateStatusSerializer(appointment, data=request.data, partial=True, context={'user_service': user_service})
 
             if serializer.is_valid():
-                app = serializer.save()
-                
-                email_service = EmailService()
-                send_email_async(email_service.send_appointment_status_update, app, appointment.status)
+                old_status = appointment.status
+                with transaction.atomic():
+                    app = serializer.save()
+                    email_service = EmailService()
+                    queue_email(email_service.send_appointment_status_update, app, old_status)
                 
                 return Response(UpdateStatusSerializer(app).data)
 
@@ -775,4 +1004,47 @@ class UserHistoryView(APIView):
         except Treatment.DoesNotExist:
             return Response({'error': 'Treatment not found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class HealthView(APIView):
+    # Readiness check; the first call also initialises the storage client.
+    # Unauthenticated, so failures are only logged here: error messages can
+    # carry hostnames and connection strings.
+    def get(self, request):
+        checks = {}
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            checks['database'] = 'ok'
+        except Exception as e:
+            print(f"Health check: database unavailable: {str(e)}")
+            checks['database'] = 'error'
+        try:
+            minio_service.warmup()
+            checks['storage'] = 'ok'
+        except Exception as e:
+            print(f"Health check: storage unavailable: {str(e)}")
+            checks['storage'] = 'error'
+        healthy = all(value == 'ok' for value in checks.values())
+        return Response(
+            {'status': 'ok' if healthy else 'error', **checks},
+            status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+class MetricsView(APIView):
+    # Prometheus text format for every worker process sharing METRICS_DIR.
+    # With METRICS_TOKEN set, scrapers must send "Authorization: Bearer <token>".
+    def get(self, request):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        if token and not compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+        counters, histograms, gauges = metrics.registry.collect()
+        outbox = dict.fromkeys(OutboxMessage.OutboxStatus.values, 0)
+        for row in OutboxMessage.objects.order_by().values('status').annotate(total=Count('id')):
+            outbox[row['status']] = row['total']
+        for outbox_status, total in outbox.items():
+            gauges[('petcare_outbox_messages', (('status', outbox_status),))] = total
+        return HttpResponse(
+            metrics.render(counters, histograms, gauges),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )